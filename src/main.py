@@ -1,117 +1,298 @@
-from queries.internal import get_measurements, get_measurements_by_station_and_date, get_ozone_episodes, get_measurements_with_linked_data, get_aggregated_statistics
-
-def main():
-    # print("=" * 80)
-    # print("PRUEBA 1: Mediciones básicas (primeras 10)")
-    # print("=" * 80)
-    # data = get_measurements()
-    # for d in data[:10]:
-    #     print(d)
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 2: Filtrar por estación '11'")
-    # print("=" * 80)
-    # data_by_station = get_measurements_by_station_and_date(estacion="11")
-    # print(f"Total de mediciones encontradas: {len(data_by_station)}")
-    # for d in data_by_station[:3]:
-    #     print(f"\nEstación: {d['estacion']}, Fecha: {d['fecha']}, Magnitud: {d['magnitud']}")
-    #     print(f"  Punto Muestreo: {d['puntoMuestreo']}")
-    #     # Mostrar solo primeras 6 horas para no saturar
-    #     print(f"  H01-H06: {d['H01']}, {d['H02']}, {d['H03']}, {d['H04']}, {d['H05']}, {d['H06']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 3: Filtrar por fecha específica") #Si no esta la fecha dentro del dataset devuelve 0
-    # print("=" * 80)
-    # data_by_date = get_measurements_by_station_and_date(fecha="2025-05-08T00:00:00Z")
-    # print(f"Total de mediciones encontradas: {len(data_by_date)}")
-    # for d in data_by_date[:3]:
-    #     print(f"\nEstación: {d['estacion']}, Fecha: {d['fecha']}, Magnitud: {d['magnitud']}")
-    #     print(f"  H01-H06: {d['H01']}, {d['H02']}, {d['H03']}, {d['H04']}, {d['H05']}, {d['H06']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 4: Filtrar por estación Y fecha")
-    # print("=" * 80)
-    # data_combined = get_measurements_by_station_and_date(estacion="8", fecha="2025-05-08T00:00:00Z") # Si fecha o estación no estan en el dataset devuelve 0
-    # print(f"Total de mediciones encontradas: {len(data_combined)}")
-    # for d in data_combined:
-    #     print(f"\nEstación: {d['estacion']}, Fecha: {d['fecha']}, Magnitud: {d['magnitud']}")
-    #     print(f"  Todas las horas disponibles:")
-    #     horas = [f"H{i:02d}: {d[f'H{i:02d}']}" for i in range(1, 25) if d[f'H{i:02d}'] is not None]
-    #     print(f"  {', '.join(horas[:12])}")  # Primera mitad del día
-    #     print(f"  {', '.join(horas[12:])}")  # Segunda mitad del día
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 5: Episodios de ozono (todos)")
-    # print("=" * 80)
-    # ozone_episodes = get_ozone_episodes()
-    # print(f"Total de episodios encontrados: {len(ozone_episodes)}")
-    # for ep in ozone_episodes:
-    #     print(f"\n Fecha inicio: {ep['fecha_inicio']}")
-    #     print(f" Fecha fin: {ep['fecha_fin']}")
-    #     print(f"  Escenario: {ep['escenario']}")
-    #     print(f"  Medida población: {ep['medida_poblacion']}")
-    #     print(f"  URI: {ep['episodio_uri']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 6: Episodios de ozono filtrados por fecha")
-    # print("=" * 80)
-    # ozone_filtered = get_ozone_episodes(fecha_inicio="2025-05-08T00:00:00Z")
-    # print(f"Total de episodios desde 2025-05-08: {len(ozone_filtered)}")
-    # for ep in ozone_filtered:
-    #     print(f"\n {ep['fecha_inicio']} → {ep['fecha_fin']}")
-    #     print(f"  {ep['escenario']}")
-    #     print(f"  {ep['medida_poblacion']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 7: Mediciones con Linked Data (owl:sameAs) - Primeras 10")
-    # print("=" * 80)
-    # ## Salen datos con la misma URI para Wikidata, habria que mirar reconcilacion con otra propiedad
-    # ## Magnitud 12 (NO₂) → debería enlazar a Wikidata de dióxido de nitrógeno
-    # ## Magnitud 20 (SO₂) → debería enlazar a Wikidata de dióxido de azufre
-    # ## Magnitud 7 (O₃) → debería enlazar a Wikidata de ozono
-    # ## Magnitud 10 (partículas) → debería enlazar a Wikidata de material particulado
-    # ## etc.
-    # linked_data = get_measurements_with_linked_data(limit=10)
-    # print(f"Total de mediciones con enlaces: {len(linked_data)}")
-    # for ld in linked_data:
-    #     print(f"\nEstación: {ld['estacion']}, Fecha: {ld['fecha']}, Magnitud: {ld['magnitud']}")
-    #     print(f"  Punto Muestreo: {ld['punto_muestreo']}")
-    #     print(f"  Enlace Wikidata: {ld['enlace_wikidata']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 8: Linked Data filtrado por estación '36'")
-    # print("=" * 80)
-    # linked_station = get_measurements_with_linked_data(estacion="36", limit=5)
-    # print(f"Total de mediciones de estación 36 con enlaces: {len(linked_station)}")
-    # for ld in linked_station:
-    #     print(f"\nFecha: {ld['fecha']}, Magnitud: {ld['magnitud']}")
-    #     print(f"  URI local: {ld['medicion_uri']}")
-    #     print(f"  URI Wikidata: {ld['enlace_wikidata']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 9: Estadísticas Agregadas (todas)")
-    # print("=" * 80)
-    # stats = get_aggregated_statistics()
-    # print(f"Total de agrupaciones: {len(stats)}")
-    # for s in stats[:10]:  # Mostrar primeras 10
-    #     print(f"\nEstación: {s['estacion']}, Magnitud: {s['magnitud']}")
-    #     print(f"  Total mediciones: {s['total_mediciones']}")
-    #     print(f"  Promedio: {s['promedio']}")
-    #     print(f"  Máximo: {s['maximo']}")
-    #     print(f"  Mínimo: {s['minimo']}")
-    
-    # print("\n" + "=" * 80)
-    # print("PRUEBA 10: Estadísticas Agregadas por estación '11'")
-    # print("=" * 80)
-    # stats_11 = get_aggregated_statistics(estacion="11")
-    # print(f"Total de magnitudes en estación 11: {len(stats_11)}")
-    # for s in stats_11:
-    #     print(f"\nMagnitud: {s['magnitud']}")
-    #     print(f"  Total mediciones: {s['total_mediciones']}")
-    #     print(f"  Promedio: {s['promedio']}")
-    #     print(f"  Máximo: {s['maximo']}")
-    #     print(f"  Mínimo: {s['minimo']}")
-
-# Si se descomenta alguna de las pruebas hay que quitar el tab de la siguiente línea, si no da error
-    if __name__ == "__main__":
-        main()
+"""
+Interfaz de línea de comandos de BeSafe.
+
+Uso (desde la raíz del proyecto):
+    python src/main.py --help
+    python src/main.py stations --solo-enlaces
+    python src/main.py measurements --estacion 11 --formato csv > estacion11.csv
+    python src/main.py stats --magnitud 10 | jq .promedio
+    python src/main.py top --magnitud 8 -k 3 --criterio max_diario
+    python src/main.py alerts --una-vez
+
+Los módulos pesados (rdflib, pandas, pyarrow) se importan dentro de cada
+subcomando, así que --help y los comandos que no tocan el grafo arrancan
+sin cargarlos. La salida es JSON Lines (por defecto) o CSV, fila a fila.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+
+def write_rows(rows, formato="jsonl", out=None):
+    """
+    Escribe filas (dicts o registros tipo diccionario) en stdout según se generan.
+
+    Args:
+        rows (iterable): Filas a escribir
+        formato (str): "jsonl" o "csv"
+        out (file, optional): Destino (por defecto sys.stdout)
+
+    Returns:
+        int: Número de filas escritas
+    """
+    out = out or sys.stdout
+    writer = None
+    n = 0
+    for row in rows:
+        row = dict(row)
+        if formato == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        n += 1
+    out.flush()
+    return n
+
+
+def cmd_stations(args):
+    from queries.links import ESTACION_LINKS
+
+    if args.solo_enlaces:
+        estaciones = sorted(ESTACION_LINKS, key=int)
+    else:
+        from queries.internal import get_available_stations
+        estaciones = get_available_stations()
+
+    return ({"estacion": e, "link_estacion": ESTACION_LINKS.get(e)} for e in estaciones)
+
+
+def cmd_measurements(args):
+    from queries.internal import get_measurements_by_station_and_date
+
+    return get_measurements_by_station_and_date(estacion=args.estacion, fecha=args.fecha, estrategia=args.estrategia)
+
+
+def cmd_episodes(args):
+    from queries.internal import get_ozone_episodes, search_ozone_episodes
+
+    if args.buscar or args.escenario:
+        return search_ozone_episodes(
+            texto=args.buscar or "", escenario=args.escenario, prefijo=not args.exacta,
+            fecha_inicio=args.desde, fecha_fin=args.hasta,
+        )
+    return get_ozone_episodes(fecha_inicio=args.desde, fecha_fin=args.hasta)
+
+
+def cmd_stats(args):
+    from queries.internal import get_aggregated_statistics
+
+    return get_aggregated_statistics(
+        estacion=args.estacion,
+        magnitud=args.magnitud,
+        fecha=args.fecha,
+        usar_vistas=not args.sparql,
+        workers=args.workers,
+        excluir_anomalias=args.excluir_anomalias,
+    )
+
+
+def cmd_anomalies(args):
+    from utils.anomalies import anomaly_flags, anomaly_rows
+    from utils.measurements import measurement_frame
+    from utils.rdf_loader import GRAPH_STORE
+
+    # Mediciones y marcas de la misma versión del grafo
+    with GRAPH_STORE.pin():
+        df = measurement_frame(clase=args.clase)
+        motivos = anomaly_flags(args.clase)
+    rows = anomaly_rows(df, motivos)
+    if args.estacion:
+        rows = [r for r in rows if r["estacion"] == args.estacion]
+    return rows
+
+
+def cmd_top(args):
+    from queries.internal import get_top_stations
+
+    return get_top_stations(
+        args.magnitud,
+        k=args.k,
+        criterio=args.criterio,
+        fecha_inicio=args.desde,
+        fecha_fin=args.hasta,
+    )
+
+
+def cmd_alerts(args):
+    from utils.alert_evaluator import AlertEvaluator
+
+    evaluador = AlertEvaluator(state_path=args.estado, salida=args.salida)
+    if args.una_vez:
+        return evaluador.tick()
+    # Proceso de larga duración: cada transición debe salir en cuanto se produce
+    sys.stdout.reconfigure(line_buffering=True)
+    return evaluador.watch(intervalo=args.intervalo)
+
+
+def cmd_partitions(args):
+    from utils.rdf_loader import graph_partitions, load_graph
+
+    # Las particiones sin fecha (desde None) van al final de su clase
+    particiones = sorted(
+        graph_partitions(load_graph()),
+        key=lambda p: (p["clase"], p["desde"] is None, p["desde"] or 0),
+    )
+    return ({**p, "id": str(p["id"])} for p in particiones)
+
+
+def cmd_export(args):
+    from utils.export import export_parquet
+
+    totales = export_parquet(out_dir=args.out)
+    return ({"clase": clase, "filas": n, "directorio": args.out} for clase, n in totales.items())
+
+
+def _bench_cases():
+    # (nombre, función sin argumentos) de cada consulta que se mide
+    from queries import internal
+
+    return [
+        ("get_measurements", internal.get_measurements),
+        ("get_measurements_by_station_and_date[estrategia=pivot]",
+         lambda: internal.get_measurements_by_station_and_date(estrategia="pivot")),
+        ("get_measurements_by_station_and_date[estrategia=optional]",
+         lambda: internal.get_measurements_by_station_and_date(estrategia="optional")),
+        ("get_measurements_by_station_and_date[estacion=11,estrategia=pivot]",
+         lambda: internal.get_measurements_by_station_and_date(estacion="11", estrategia="pivot")),
+        ("get_measurements_by_station_and_date[estacion=11,estrategia=optional]",
+         lambda: internal.get_measurements_by_station_and_date(estacion="11", estrategia="optional")),
+        ("get_ozone_episodes", internal.get_ozone_episodes),
+        ("search_ozone_episodes[texto=sms]", lambda: internal.search_ozone_episodes("sms")),
+        ("get_measurements_with_linked_data", internal.get_measurements_with_linked_data),
+        ("get_aggregated_statistics[vistas]", lambda: internal.get_aggregated_statistics()),
+        ("get_aggregated_statistics[sparql]", lambda: internal.get_aggregated_statistics(usar_vistas=False)),
+        ("get_aggregated_statistics[paralelo]", lambda: internal.get_aggregated_statistics(workers=os.cpu_count())),
+        ("get_aggregated_statistics[sin_anomalias]", lambda: internal.get_aggregated_statistics(excluir_anomalias=True)),
+        ("get_top_stations[magnitud=8,criterio=ultimo]", lambda: internal.get_top_stations("8")),
+        ("get_top_stations[magnitud=8,criterio=media]", lambda: internal.get_top_stations("8", criterio="media")),
+        ("get_available_stations", internal.get_available_stations),
+        ("get_available_magnitudes", internal.get_available_magnitudes),
+    ]
+
+
+def cmd_bench(args):
+    from queries.cache import QUERY_CACHE
+
+    if args.ingesta:
+        from utils.turtle_stream import compare_ingest
+
+        yield from compare_ingest(repeticiones=args.repeticiones)
+        return
+
+    # Sin --cache se mide el coste real de cada consulta, no el de la caché
+    QUERY_CACHE.enabled = args.cache
+    for nombre, funcion in _bench_cases():
+        if args.consulta and args.consulta not in nombre:
+            continue
+        tiempos = []
+        for _ in range(args.repeticiones):
+            t0 = time.perf_counter()
+            filas = funcion()
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        yield {
+            "consulta": nombre,
+            "repeticiones": args.repeticiones,
+            "min_ms": round(min(tiempos), 2),
+            "media_ms": round(sum(tiempos) / len(tiempos), 2),
+            "filas": len(filas),
+        }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="besafe", description="Consultas BeSafe sobre el RDF local")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    # Opciones comunes a todos los subcomandos
+    comun = argparse.ArgumentParser(add_help=False)
+    comun.add_argument("--formato", choices=["jsonl", "csv"], default="jsonl",
+                       help="Formato de salida (default: jsonl)")
+
+    p = sub.add_parser("stations", parents=[comun], help="Estaciones disponibles y su enlace a Wikidata")
+    p.add_argument("--solo-enlaces", action="store_true",
+                   help="Solo las estaciones de ESTACION_LINKS (no carga el grafo)")
+    p.set_defaults(func=cmd_stations)
+
+    p = sub.add_parser("measurements", parents=[comun], help="Mediciones con sus 24 horas")
+    p.add_argument("--estacion", help='ID de la estación (ej: "11")')
+    p.add_argument("--fecha", help='Fecha ISO (ej: "2025-05-08T00:00:00Z")')
+    p.add_argument("--estrategia", choices=["pivot", "optional"], default="pivot",
+                   help="Cómo recuperar las 24 horas (default: pivot)")
+    p.set_defaults(func=cmd_measurements)
+
+    p = sub.add_parser("episodes", parents=[comun], help="Episodios de ozono")
+    p.add_argument("--desde", help="Fecha ISO de inicio")
+    p.add_argument("--hasta", help="Fecha ISO de fin")
+    p.add_argument("--buscar", help="Palabras del escenario o de las medidas (ej: \"sms\")")
+    p.add_argument("--escenario", help="Solo episodios de este escenario")
+    p.add_argument("--exacta", action="store_true", help="Palabras exactas, sin buscar por prefijo")
+    p.set_defaults(func=cmd_episodes)
+
+    p = sub.add_parser("stats", parents=[comun], help="Estadísticas agregadas por estación y magnitud")
+    p.add_argument("--estacion")
+    p.add_argument("--magnitud")
+    p.add_argument("--fecha")
+    p.add_argument("--sparql", action="store_true", help="Forzar la consulta SPARQL en vez de las vistas")
+    p.add_argument("--workers", type=int, help="Agregar en paralelo con este número de procesos")
+    p.add_argument("--excluir-anomalias", action="store_true",
+                   help="No contar las horas marcadas como sospechosas (ceros, picos, valores atascados)")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("anomalies", parents=[comun], help="Horas marcadas como sospechosas por el detector")
+    p.add_argument("--estacion")
+    p.add_argument("--clase", choices=["MedicionAire", "MedicionMeteorologica"], default="MedicionAire")
+    p.set_defaults(func=cmd_anomalies)
+
+    p = sub.add_parser("top", parents=[comun], help="Estaciones con los valores más altos de una magnitud")
+    p.add_argument("--magnitud", required=True, help='Código de magnitud (ej: "8")')
+    p.add_argument("-k", type=int, default=5, help="Número de estaciones (default: 5)")
+    p.add_argument("--criterio", choices=["ultimo", "max_diario", "media"], default="ultimo",
+                   help="Último valor horario, máximo diario o media en la ventana (default: ultimo)")
+    p.add_argument("--desde", help="Primer día de la ventana (fecha ISO)")
+    p.add_argument("--hasta", help="Último día de la ventana (fecha ISO)")
+    p.set_defaults(func=cmd_top)
+
+    p = sub.add_parser("alerts", parents=[comun], help="Evaluar el semáforo sobre las horas nuevas y emitir los cambios de nivel")
+    p.add_argument("--una-vez", action="store_true", help="Evaluar una vez y salir (por defecto se queda vigilando el TTL)")
+    p.add_argument("--intervalo", type=float, default=60.0, help="Segundos entre comprobaciones (default: 60)")
+    p.add_argument("--estado", default="data/alertas-estado.json",
+                   help="Fichero con la última hora evaluada de cada serie (default: data/alertas-estado.json)")
+    p.add_argument("--salida", help="Añadir también las transiciones a este fichero JSON Lines")
+    p.set_defaults(func=cmd_alerts)
+
+    p = sub.add_parser("partitions", parents=[comun], help="Grafos con nombre (clase y mes) en que se reparte el dataset")
+    p.set_defaults(func=cmd_partitions)
+
+    p = sub.add_parser("export", parents=[comun], help="Exportar las mediciones a Parquet particionado")
+    p.add_argument("--out", default="data/parquet", help="Directorio de salida (default: data/parquet)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("bench", parents=[comun], help="Medir el tiempo de cada consulta")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--consulta", help="Solo las consultas cuyo nombre contenga este texto")
+    p.add_argument("--cache", action="store_true", help="Medir pasando por la caché de resultados")
+    p.add_argument("--ingesta", action="store_true",
+                   help="Comparar la ingesta de mediciones con rdflib y en streaming (tripletas/s y pico de memoria)")
+    p.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        write_rows(args.func(args), formato=args.formato)
+    except BrokenPipeError:
+        # La salida se cortó (ej: | head): no es un error. Redirigimos stdout a
+        # /dev/null para que Python no falle al vaciarlo al salir
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import contextlib
+import io
+import multiprocessing
+import queue
+import time
+
+from rdflib.plugins.sparql.algebra import pprintAlgebra, translateQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.plugins.sparql.parser import parseQuery
+
+from queries.internal import PREFIX
+from utils.rdf_loader import load_graph
+
+DEFAULT_TIMEOUT = 10        # segundos de reloj por consulta
+DEFAULT_MAX_ROWS = 1000
+DEFAULT_MAX_MEMORY_MB = 1024
+CHUNK_SIZE = 100            # filas por envío del proceso hijo a la interfaz
+LOAD_TIMEOUT = 120          # margen para cargar el grafo en el proceso hijo
+LATIDO = 0.5                # segundos sin eventos tras los que se emite ("espera", s)
+
+EXAMPLE_QUERY = PREFIX + """
+SELECT ?estacion ?magnitud ?h12
+WHERE {
+    ?m a vocab:MedicionAire ;
+       vocab:estacion ?estacion ;
+       vocab:magnitud ?magnitud ;
+       vocab:H12 ?h12 .
+    FILTER (?h12 > 50)
+}
+ORDER BY DESC(?h12)
+"""
+
+
+def explain_query(query):
+    """
+    Analiza y traduce una consulta SPARQL sin ejecutarla.
+
+    Returns:
+        dict: {"algebra": texto del plan, "fases": {"parse_ms", "algebra_ms"}}
+    """
+    t0 = time.perf_counter()
+    parsed = parseQuery(query)
+    t1 = time.perf_counter()
+    translated = translateQuery(parsed)
+    t2 = time.perf_counter()
+
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        pprintAlgebra(translated)
+
+    return {
+        "algebra": salida.getvalue(),
+        "fases": {"parse_ms": (t1 - t0) * 1000, "algebra_ms": (t2 - t1) * 1000},
+    }
+
+
+def _limit_memory(max_memory_mb):
+    # Límite = memoria que ya ocupa el proceso (heredada del padre con fork) + max_memory_mb
+    try:
+        import resource
+    except ImportError:  # Windows: sin límite de memoria, solo timeout
+        return
+    actual = 0
+    try:
+        with open("/proc/self/statm") as f:
+            actual = int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        pass
+    limite = actual + int(max_memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+
+def _term(valor):
+    return str(valor) if valor is not None else None
+
+
+def _child(query, max_rows, max_memory_mb, salida, graph=None):
+    """Proceso hijo: carga el grafo, ejecuta la consulta y envía las filas por trozos."""
+    try:
+        t0 = time.perf_counter()
+        g = graph if graph is not None else load_graph()
+        _limit_memory(max_memory_mb)
+        salida.put(("fase", ("carga_ms", (time.perf_counter() - t0) * 1000)))
+
+        t0 = time.perf_counter()
+        parsed = parseQuery(query)
+        salida.put(("fase", ("parse_ms", (time.perf_counter() - t0) * 1000)))
+
+        t0 = time.perf_counter()
+        translated = translateQuery(parsed)
+        salida.put(("fase", ("algebra_ms", (time.perf_counter() - t0) * 1000)))
+
+        t0 = time.perf_counter()
+        res = evalQuery(g, translated, {})
+        tipo = res["type_"]
+        if tipo == "SELECT":
+            variables = [str(v) for v in res["vars_"]]
+            filas = ([_term(b.get(v)) for v in res["vars_"]] for b in res["bindings"])
+        elif tipo == "ASK":
+            variables = ["ask"]
+            filas = iter([[res["askAnswer"]]])
+        else:  # CONSTRUCT / DESCRIBE
+            variables = ["s", "p", "o"]
+            filas = ([_term(s), _term(p), _term(o)] for s, p, o in res["graph"])
+        salida.put(("columnas", variables))
+
+        trozo = []
+        n = 0
+        primera = None
+        for fila in filas:
+            if n == max_rows:
+                salida.put(("truncado", max_rows))
+                break
+            if primera is None:
+                primera = (time.perf_counter() - t0) * 1000
+                salida.put(("fase", ("primera_fila_ms", primera)))
+            trozo.append(fila)
+            n += 1
+            if len(trozo) == CHUNK_SIZE:
+                salida.put(("filas", trozo))
+                trozo = []
+        if trozo:
+            salida.put(("filas", trozo))
+
+        salida.put(("fase", ("evaluacion_ms", (time.perf_counter() - t0) * 1000)))
+        salida.put(("fin", n))
+    except MemoryError:
+        salida.put(("error", f"La consulta superó el límite de memoria ({max_memory_mb} MB)"))
+    except Exception as e:  # errores de sintaxis, tipos no soportados...
+        salida.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class GuardedQuery:
+    """
+    Ejecuta una consulta SPARQL ad-hoc en un proceso aparte, con límites.
+
+    - timeout: tiempo de reloj máximo desde que el grafo está cargado
+    - max_rows: se dejan de leer filas al llegar al límite
+    - max_memory_mb: memoria adicional que puede reservar el proceso hijo (RLIMIT_AS, en Unix)
+
+    Iterar sobre el objeto devuelve eventos (tipo, dato) según llegan:
+    ("fase", (nombre, ms)), ("columnas", [...]), ("filas", [[...], ...]),
+    ("truncado", n), ("espera", segundos), ("timeout", segundos),
+    ("timeout_carga", segundos), ("error", mensaje), ("fin", n_filas).
+    Mientras la consulta no produce nada se emite ("espera", segundos desde el
+    inicio) cada LATIDO segundos, para que quien itera pueda refrescar la interfaz
+    (y Streamlit interrumpir el script si el usuario pulsa Cancelar).
+    cancel() (o cerrar el iterador) mata el proceso hijo inmediatamente.
+    """
+
+    def __init__(self, query, timeout=DEFAULT_TIMEOUT, max_rows=DEFAULT_MAX_ROWS,
+                 max_memory_mb=DEFAULT_MAX_MEMORY_MB, graph=None):
+        self.query = query
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_memory_mb = max_memory_mb
+        self.graph = graph
+        self._proceso = None
+
+    def cancel(self):
+        if self._proceso is not None and self._proceso.is_alive():
+            self._proceso.kill()
+            self._proceso.join()
+
+    def __iter__(self):
+        # Con fork el hijo hereda el grafo ya cargado sin serializarlo
+        metodos = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        graph = self.graph if ctx.get_start_method() == "fork" else None
+
+        salida = ctx.Queue()
+        self._proceso = ctx.Process(
+            target=_child,
+            args=(self.query, self.max_rows, self.max_memory_mb, salida, graph),
+            daemon=True,
+        )
+        self._proceso.start()
+
+        inicio = ultimo = time.monotonic()
+        limite = inicio + LOAD_TIMEOUT
+        cargando = True
+        try:
+            while True:
+                try:
+                    tipo, dato = salida.get(timeout=max(0.0, min(0.2, limite - time.monotonic())))
+                except queue.Empty:
+                    ahora = time.monotonic()
+                    if ahora >= limite:
+                        self.cancel()
+                        yield ("timeout_carga", LOAD_TIMEOUT) if cargando else ("timeout", self.timeout)
+                        return
+                    if not self._proceso.is_alive() and salida.empty():
+                        yield ("error", f"El proceso de la consulta terminó inesperadamente (código {self._proceso.exitcode})")
+                        return
+                    if ahora - ultimo >= LATIDO:
+                        ultimo = ahora
+                        yield ("espera", round(ahora - inicio, 1))
+                    continue
+
+                if tipo == "fase" and dato[0] == "carga_ms":
+                    # El grafo ya está cargado: desde aquí corre el timeout de la consulta
+                    limite = time.monotonic() + self.timeout
+                    cargando = False
+                ultimo = time.monotonic()
+                yield (tipo, dato)
+                if tipo in ("fin", "error"):
+                    return
+        finally:
+            self.cancel()
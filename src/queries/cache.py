@@ -0,0 +1,199 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from utils.profiling import current_profiler
+from utils.rdf_loader import GRAPH_STORE, graph_version
+
+# Tamaño máximo en memoria (MB) y directorio opcional para persistir en disco
+DEFAULT_MAX_MB = float(os.environ.get("BESAFE_CACHE_MB", "64"))
+DEFAULT_DISK_DIR = os.environ.get("BESAFE_CACHE_DIR") or None
+
+
+class QueryCache:
+    """
+    Caché de resultados de consultas, con expulsión LRU limitada en bytes.
+
+    La clave es (id de la consulta, parámetros normalizados, versión del grafo),
+    así que un cambio en el dataset invalida automáticamente todo lo anterior.
+    El tamaño de cada entrada se mide con el tamaño de su pickle. Si se indica
+    disk_dir, las entradas también se guardan en disco y sobreviven a reinicios.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, disk_dir=DEFAULT_DISK_DIR):
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = disk_dir
+        self.enabled = True
+        self._entries = OrderedDict()  # clave -> (valor, bytes)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    # --- API ---------------------------------------------------------------
+
+    def get_or_compute(self, query_id, params, compute):
+        """
+        Devuelve el resultado cacheado de (query_id, params) para la versión actual
+        del grafo, o lo calcula con compute() y lo guarda. Con la recarga en caliente
+        activa, la versión se fija durante toda la llamada (GRAPH_STORE.pin), así que
+        el resultado siempre se guarda bajo la versión con la que se calculó.
+        """
+        if not self.enabled:
+            return compute()
+
+        with GRAPH_STORE.pin() as snapshot:
+            if snapshot is not None and not GRAPH_STORE.is_latest(snapshot):
+                # Consulta anidada en una versión ya sustituida: no se cachea ni
+                # se invalida la caché de la versión nueva
+                return compute()
+            return self._get_or_compute(query_id, params, compute)
+
+    def _get_or_compute(self, query_id, params, compute):
+        version = graph_version()
+        key = (query_id, params, version)
+
+        with self._lock:
+            if version != self._version:
+                self._invalidate(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._metrics["hits"] += 1
+                return self._entries[key][0]
+
+        value = self._read_disk(key)
+        if value is not None:
+            with self._lock:
+                self._metrics["disk_hits"] += 1
+            self._store(key, value, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), write_disk=False)
+            return value
+
+        with self._lock:
+            self._metrics["misses"] += 1
+        value = compute()
+        self._store(key, value, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), write_disk=True)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Métricas de uso: aciertos, fallos, expulsiones, entradas y bytes ocupados."""
+        with self._lock:
+            return {
+                **self._metrics,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "graph_version": self._version,
+            }
+
+    # --- Interno -----------------------------------------------------------
+
+    def _invalidate(self, version):
+        # Llamar con el lock cogido
+        if self._version is not None:
+            self._metrics["invalidations"] += 1
+            self._purge_disk(keep_version=version)
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+
+    def _store(self, key, value, data, write_disk):
+        size = len(data)
+        if size > self.max_bytes:
+            return  # no cabe: no se cachea
+
+        with self._lock:
+            if key[2] != self._version:
+                return  # el grafo cambió mientras se calculaba
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._metrics["evictions"] += 1
+
+        if write_disk:
+            self._write_disk(key, data)
+
+    def _disk_path(self, key):
+        query_id, params, version = key
+        digest = hashlib.sha256(repr((query_id, params)).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.disk_dir, f"{version}-{digest}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _purge_disk(self, keep_version):
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl") and not name.startswith(f"{keep_version}-"):
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+
+
+# Caché compartida por todas las funciones de queries/internal.py
+QUERY_CACHE = QueryCache()
+
+
+def _describe(params):
+    # Parámetros de la llamada para el perfil, sin los que valen None
+    return ", ".join(f"{k}={v!r}" for k, v in params if v is not None)[:120]
+
+
+def cached_query(func):
+    """
+    Decorador: cachea el resultado de una función de consulta en QUERY_CACHE.
+    Los parámetros se normalizan con los valores por defecto de la función, así que
+    f() y f(estacion=None) comparten entrada. Los resultados se comparten entre
+    llamadas: tratarlos como de solo lectura. func.uncached llama sin caché.
+    En modo perfil (utils/profiling.py) se registra el tiempo de cada llamada.
+    """
+    signature = inspect.signature(func)
+    query_id = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = tuple(bound.arguments.items())
+        perfil = current_profiler()
+        if perfil is None:
+            return QUERY_CACHE.get_or_compute(query_id, params, lambda: func(*args, **kwargs))
+        t0 = time.perf_counter()
+        try:
+            return QUERY_CACHE.get_or_compute(query_id, params, lambda: func(*args, **kwargs))
+        finally:
+            perfil.record_call(func.__qualname__, _describe(params), time.perf_counter() - t0)
+
+    wrapper.uncached = func
+    return wrapper
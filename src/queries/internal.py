@@ -1,16 +1,29 @@
-from utils.rdf_loader import load_graph
+import pandas as pd
+from rdflib import Namespace
+
+from queries.cache import cached_query
+from queries.links import ESTACION_LINKS, MAGNITUD_LINKS
+from utils.anomalies import anomaly_flags, mask_anomalies
+from utils.episode_index import build_episode_index
+from utils.measurements import measurement_frame
+from utils.parallel import aggregate
+from utils.ranking import rank_stations
+from utils.rdf_loader import graph_index, load_graph, partition_view
+from utils.records import EpisodioOzono, Medicion
+from utils.views import load_views
 
 PREFIX = """
 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
 PREFIX vocab: <http://example.org/vocab#>
 """
 
+@cached_query
 def get_measurements():
     """
     Obtiene las primeras 200 mediciones de calidad del aire (solo hora H01).
     Consulta básica para verificar que el RDF se carga correctamente.
     """
-    g = load_graph()
+    g = partition_view(load_graph(), "MedicionAire")
 
     query = PREFIX + """
     SELECT ?estacion ?fecha ?magnitud ?valor
@@ -35,23 +48,40 @@ def get_measurements():
     return results
 
 
-def get_measurements_by_station_and_date(estacion=None, fecha=None):
+# Estrategias para recuperar las 24 horas de cada medición
+# - "pivot": un solo patrón ?m ?hora ?valor (restringido a H01..H24) y pivotado en Python
+# - "optional": 24 bloques OPTIONAL { ?m vocab:Hxx ?hxx } (versión original)
+# "pivot" es la opción por defecto: es más rápida (ver `python src/main.py bench --consulta estrategia`)
+ESTRATEGIAS_HORARIAS = ("pivot", "optional")
+
+VOCAB = Namespace("http://example.org/vocab#")
+HORAS_VALUES = " ".join(f"vocab:H{i:02d}" for i in range(1, 25))
+
+
+@cached_query
+def get_measurements_by_station_and_date(estacion=None, fecha=None, estrategia="pivot"):
     """
     Obtiene mediciones de calidad del aire filtradas por estación y/o fecha.
     
     Args:
         estacion (str, optional): ID de la estación (ej: "11", "102")
         fecha (str, optional): Fecha en formato ISO (ej: "2025-07-07T00:00:00Z")
+        estrategia (str, optional): Cómo recuperar las horas: "pivot" (default) u "optional"
     
     Returns:
-        list: Lista de diccionarios con las mediciones y todas las horas (H01-H24)
+        list: Lista de Medicion (acceso tipo diccionario) con las mediciones y todas las horas (H01-H24)
     
     Ejemplos:
         get_measurements_by_station_and_date(estacion="11")
         get_measurements_by_station_and_date(fecha="2025-07-07T00:00:00Z")
         get_measurements_by_station_and_date(estacion="11", fecha="2025-07-07T00:00:00Z")
     """
-    g = load_graph()
+    if estrategia not in ESTRATEGIAS_HORARIAS:
+        raise ValueError(f"Estrategia desconocida: {estrategia!r} (opciones: {ESTRATEGIAS_HORARIAS})")
+
+    # Solo las particiones de MedicionAire que contienen esa fecha
+    dia = _parse_fecha(fecha) if fecha else None
+    g = partition_view(load_graph(), "MedicionAire", dia, dia)
     
     # Construir filtros dinámicos
     filters = []
@@ -61,7 +91,14 @@ def get_measurements_by_station_and_date(estacion=None, fecha=None):
         filters.append(f'?fecha = "{fecha}"^^xsd:dateTime')
     
     filter_clause = "FILTER (" + " && ".join(filters) + ")" if filters else ""
-    
+
+    if estrategia == "pivot":
+        return _measurements_pivot(g, filter_clause)
+    return _measurements_optional(g, filter_clause)
+
+
+def _measurements_optional(g, filter_clause):
+    """Versión original: 24 OPTIONAL encadenados (uno por hora)."""
     query = PREFIX + """
     PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
     
@@ -108,25 +145,86 @@ def get_measurements_by_station_and_date(estacion=None, fecha=None):
     
     results = []
     for row in g.query(query):
-        # Construir diccionario con todas las horas
-        measurement = {
-            "estacion": str(row.estacion),
-            "fecha": str(row.fecha),
-            "magnitud": str(row.magnitud),
-            "puntoMuestreo": str(row.puntoMuestreo) if row.puntoMuestreo else None,
-        }
-        
-        # Añadir valores horarios (convertir a float si existen)
+        # Valores horarios (convertir a float si existen)
+        horas = []
         for i in range(1, 25):
-            hora_var = f"h{i:02d}"
-            hora_value = getattr(row, hora_var, None)
-            measurement[f"H{i:02d}"] = float(hora_value) if hora_value else None
-        
-        results.append(measurement)
+            hora_value = getattr(row, f"h{i:02d}", None)
+            horas.append(float(hora_value) if hora_value else None)
+
+        # Registro compacto con acceso tipo diccionario (ver utils/records.py)
+        results.append(Medicion(
+            estacion=str(row.estacion),
+            fecha=str(row.fecha),
+            magnitud=str(row.magnitud),
+            puntoMuestreo=str(row.puntoMuestreo) if row.puntoMuestreo else None,
+            horas=horas,
+        ))
     
     return results
 
 
+
+
+def _measurements_pivot(g, filter_clause):
+    """
+    Recupera todas las horas con un único patrón ?m ?propiedad ?valor (restringido a
+    H01..H24 y puntoMuestreo) y las pivota en una sola pasada. La subconsulta aplica
+    filtros, orden y LIMIT sobre las mediciones (no sobre las filas hora a hora),
+    igual que la versión con OPTIONAL.
+    """
+    query = PREFIX + """
+    PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+
+    SELECT ?m ?estacion ?fecha ?magnitud ?propiedad ?valor
+    WHERE {
+        {
+            SELECT ?m ?estacion ?fecha ?magnitud
+            WHERE {
+                ?m a vocab:MedicionAire ;
+                   vocab:estacion ?estacion ;
+                   vocab:fecha ?fecha ;
+                   vocab:magnitud ?magnitud .
+
+                """ + filter_clause + """
+            }
+            ORDER BY ?fecha ?estacion ?magnitud
+            LIMIT 500
+        }
+        OPTIONAL {
+            VALUES ?propiedad { """ + HORAS_VALUES + """ vocab:puntoMuestreo }
+            ?m ?propiedad ?valor
+        }
+    }
+    """
+
+    # Pivotar: una entrada por medición con sus 24 horas
+    columna = {VOCAB[f"H{i:02d}"]: i - 1 for i in range(1, 25)}
+    punto_muestreo = VOCAB.puntoMuestreo
+    mediciones = {}
+    for m, estacion, fecha, magnitud, propiedad, valor in g.query(query):
+        medicion = mediciones.get(m)
+        if medicion is None:
+            medicion = mediciones[m] = [estacion, fecha, magnitud, None, [None] * 24]
+        if propiedad == punto_muestreo:
+            medicion[3] = valor
+        elif propiedad is not None:
+            medicion[4][columna[propiedad]] = float(valor) if valor else None
+
+    # Mismo orden que ORDER BY ?fecha ?estacion ?magnitud
+    ordenadas = sorted(mediciones.values(), key=lambda m: (m[1].toPython(), str(m[0]), str(m[2])))
+    return [
+        Medicion(
+            estacion=str(estacion),
+            fecha=str(fecha),
+            magnitud=str(magnitud),
+            puntoMuestreo=str(punto) if punto else None,
+            horas=horas,
+        )
+        for estacion, fecha, magnitud, punto, horas in ordenadas
+    ]
+
+
+@cached_query
 def get_ozone_episodes(fecha_inicio=None, fecha_fin=None):
     """
     Obtiene episodios de ozono (activaciones del protocolo por alta contaminación).
@@ -136,14 +234,19 @@ def get_ozone_episodes(fecha_inicio=None, fecha_fin=None):
         fecha_fin (str, optional): Filtrar hasta esta fecha (formato ISO)
     
     Returns:
-        list: Lista de diccionarios con información de cada episodio de ozono
+        list: Lista de EpisodioOzono (acceso tipo diccionario) con información de cada episodio de ozono
     
     Ejemplos:
         get_ozone_episodes()  # Todos los episodios
         get_ozone_episodes(fecha_inicio="2025-07-08T00:00:00Z")
         get_ozone_episodes(fecha_inicio="2025-07-01T00:00:00Z", fecha_fin="2025-07-31T23:59:59Z")
     """
-    g = load_graph()
+    g = partition_view(
+        load_graph(),
+        "EpisodioOzono",
+        _parse_fecha(fecha_inicio) if fecha_inicio else None,
+        _parse_fecha(fecha_fin) if fecha_fin else None,
+    )
     
     # Construir filtros dinámicos, considerando que las fechas son opcionales, evitando crear 4 consultas separadas
     filters = []
@@ -176,84 +279,53 @@ def get_ozone_episodes(fecha_inicio=None, fecha_fin=None):
     
     results = []
     for row in g.query(query):
-        results.append({
-            "episodio_uri": str(row.episodio),
-            "fecha_inicio": str(row.fechaInicio),
-            "fecha_fin": str(row.fechaFin),
-            "escenario": str(row.escenario) if row.escenario else None,
-            "medida_poblacion": str(row.medidaPoblacion) if row.medidaPoblacion else None,
-        })
+        results.append(EpisodioOzono(
+            episodio_uri=str(row.episodio),
+            fecha_inicio=str(row.fechaInicio),
+            fecha_fin=str(row.fechaFin),
+            escenario=str(row.escenario) if row.escenario else None,
+            medida_poblacion=str(row.medidaPoblacion) if row.medidaPoblacion else None,
+        ))
     
     return results
 
-# Enlaces de magnitudes (gases) a Wikidata
-MAGNITUD_LINKS = {
-    "1":  "https://www.wikidata.org/wiki/Q5282",     # SO2
-    "6":  "https://www.wikidata.org/wiki/Q2025",     # CO
-    "7":  "https://www.wikidata.org/wiki/Q207843",   # NO
-    "8":  "https://www.wikidata.org/wiki/Q207895",   # NO2
-    "9":  "https://www.wikidata.org/wiki/Q48035980", # PM10
-    "10": "https://www.wikidata.org/wiki/Q48035814", # PM2.5
-    "12": "https://www.wikidata.org/wiki/Q36933",    # O3
-    "14": "https://www.wikidata.org/wiki/Q2270",     # Benceno
-}
-
-# Enlaces de estaciones a Wikidata (las que has pasado)
-ESTACION_LINKS = {
-
-    "1":  "https://www.wikidata.org/wiki/Q8841582",      # Pº. Recoletos (001)
-    "2":  "https://www.wikidata.org/wiki/Q7203711",      # Glta. de Carlos V (002)
-    "4":  "https://www.wikidata.org/wiki/Q776249",       # Plaza España (004)
-    "6":  "https://www.wikidata.org/wiki/Q52084168",     # Pza. Dr. Marañón (006)
-    "7":  "https://www.wikidata.org/wiki/Q16620302",     # Pza. M. de Salamanca (007)
-    "8":  "https://www.wikidata.org/wiki/Q5397501",      # Escuelas Aguirre (008)
-    "9":  "https://www.wikidata.org/wiki/Q30148071",     # Pza. Luca de Tena (009)
-    "11": "https://www.wikidata.org/wiki/Q30467128",     # Av. Ramón y Cajal (011)
-    "12": "https://www.wikidata.org/wiki/Q2056869",      # Pza. Manuel Becerra (012)
-    "14": "https://www.wikidata.org/wiki/Q136805046",    # Pza. Fdez. Ladreda (014)
-    "15": "https://www.wikidata.org/wiki/Q2463399",      # Pza. Castilla (015)
-    "16": "https://www.wikidata.org/wiki/Q2481371",      # Arturo Soria (016)
-    "17": "https://www.wikidata.org/wiki/Q2480338",      # Villaverde Alto (017)
-    "19": "https://www.wikidata.org/wiki/Q136805075",    # Huerta Castañeda (019)
-    "21": "https://www.wikidata.org/wiki/Q26791536",     # Pza. Cristo Rey (021)
-    "22": "https://www.wikidata.org/wiki/Q26737156",     # Pº. Pontones (022)
-    "23": "https://www.wikidata.org/wiki/Q2424746",      # Final C/ Alcalá (023)
-    "24": "https://www.wikidata.org/wiki/Q568579",       # Casa de Campo (024)
-    "25": "https://www.wikidata.org/wiki/Q5847173",      # Santa Eugenia (025)
-    "26": "https://www.wikidata.org/wiki/Q136805083",    # Urb. Embajada (Barajas) (026)
-    "27": "https://www.wikidata.org/wiki/Q2474414",      # Barajas (027)
-    "35": "https://www.wikidata.org/wiki/Q6080406",      # Plaza del Carmen (035)
-    "36": "https://www.wikidata.org/wiki/Q2076109",      # Moratalaz (036)
-    "38": "https://www.wikidata.org/wiki/Q2420839",      # Cuatro Caminos (038)
-    "39": "https://www.wikidata.org/wiki/Q2463533",      # Barrio del Pilar (039)
-    "40": "https://www.wikidata.org/wiki/Q5548317",      # Vallecas (040)
-    "47": "https://www.wikidata.org/wiki/Q2479775",      # Méndez Álvaro (047)
-    "48": "https://www.wikidata.org/wiki/Q1473674",      # Pº. Castellana (048)
-    "49": "https://www.wikidata.org/wiki/Q2056874",      # Retiro (049)
-    "50": "https://www.wikidata.org/wiki/Q2463399",      # Pza. Castilla (050) — igual que 15
-    "54": "https://www.wikidata.org/wiki/Q3847485",      # Ensanche de Vallecas (054)
-    "55": "https://www.wikidata.org/wiki/Q136805083",    # Urb. Embajada (Barajas) (055) — igual que 26
-    "56": "https://www.wikidata.org/wiki/Q782113",       # Plaza Elíptica (056)
-    "57": "https://www.wikidata.org/wiki/Q3076623",      # Sanchinarro (057)
-    "58": "https://www.wikidata.org/wiki/Q3314337",      # El Pardo (058)
-    "59": "https://www.wikidata.org/wiki/Q1583169",      # Juan Carlos I (059)
-    "60": "https://www.wikidata.org/wiki/Q608766",       # Tres Olivos (060)
-    "102": "https://www.wikidata.org/wiki/Q56191300",    # J.M.D. Moratalaz
-    "103": "https://www.wikidata.org/wiki/Q56190652",    # J.M.D. Villaverde
-    "104": "https://www.wikidata.org/wiki/Q136805096",   # E.D.A.R. La China
-    "106": "https://www.wikidata.org/wiki/Q136804907",   # Centro Mpal. De Acústica
-    "107": "https://www.wikidata.org/wiki/Q56190091",    # J.M.D. Hortaleza
-    "108": "https://www.wikidata.org/wiki/Q2058663",     # Peñagrande
-    "109": "https://www.wikidata.org/wiki/Q56164429",    # J.M.D. Chamberí
-    "110": "https://www.wikidata.org/wiki/Q56164302",    # J.M.D. Centro
-    "111": "https://www.wikidata.org/wiki/Q56192459",    # J.M.D. Chamartín
-    "112": "https://www.wikidata.org/wiki/Q56191978",    # J.M.D. Vallecas 1
-    "113": "https://www.wikidata.org/wiki/Q56191848",    # J.M.D. Vallecas 2
-    "114": "https://www.wikidata.org/wiki/Q4043800",     # Matadero 01
-    "115": "https://www.wikidata.org/wiki/Q105776403",   # Matadero 02
-}
+
+def get_episode_index():
+    """
+    Índice invertido de los episodios de ozono (utils/episode_index.py) sobre su
+    escenario y medidas para la población. Se construye una vez por versión del
+    grafo y va con ella (el vigilante de recarga lo precalcula), así que no se cachea.
+
+    Returns:
+        EpisodeIndex: con .search(), .facets() y .medidas(episodio_uri)
+    """
+    return graph_index("episodios", build_episode_index)
+
+
+@cached_query
+def search_ozone_episodes(texto="", escenario=None, prefijo=True, fecha_inicio=None, fecha_fin=None):
+    """
+    Busca episodios de ozono por palabras del escenario o de las medidas para la
+    población, sin distinguir tildes ni mayúsculas (ej: "sms", "pagina web").
+
+    Args:
+        texto (str, optional): Palabras a buscar; deben aparecer todas ("" = todos)
+        escenario (str, optional): Filtrar por escenario (faceta)
+        prefijo (bool, optional): Cada palabra encuentra también las que empiezan por ella (default: True)
+        fecha_inicio (str, optional): Filtrar desde esta fecha (formato ISO)
+        fecha_fin (str, optional): Filtrar hasta esta fecha (formato ISO)
+
+    Returns:
+        list: Lista de EpisodioOzono, como get_ozone_episodes
+
+    Ejemplos:
+        search_ozone_episodes("sms")
+        search_ozone_episodes("recomendaciones", escenario="1")
+    """
+    return get_episode_index().search(texto, escenario, prefijo, fecha_inicio, fecha_fin)
 
 
+@cached_query
 def get_measurements_with_linked_data(estacion=None, magnitud=None, limit=100):
     """
     Obtiene mediciones de calidad del aire junto con sus enlaces a recursos externos (owl:sameAs).
@@ -267,7 +339,7 @@ def get_measurements_with_linked_data(estacion=None, magnitud=None, limit=100):
     Returns:
         list[dict]: mediciones + enlaces
     """
-    g = load_graph()
+    g = partition_view(load_graph(), "MedicionAire")
 
     # Construir filtros dinámicos (igual que versión original)
     filters = []
@@ -327,15 +399,106 @@ def get_measurements_with_linked_data(estacion=None, magnitud=None, limit=100):
 
 
 
-def get_aggregated_statistics(estacion=None, magnitud=None, fecha=None):
+def _parse_fecha(fecha):
+    """Convierte una fecha ISO en Timestamp UTC (None si no se puede interpretar)."""
+    try:
+        ts = pd.Timestamp(fecha)
+    except ValueError:
+        return None
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _format_statistics(estacion, magnitud, total, suma, maximo, minimo):
+    # Mismo formato (y mismas conversiones) que las filas de la consulta SPARQL
+    promedio = suma / total
+    return {
+        "estacion": estacion,
+        "magnitud": magnitud,
+        "total_mediciones": int(total) if total else 0,
+        "promedio": round(float(promedio), 2) if promedio else None,
+        "maximo": float(maximo) if maximo else None,
+        "minimo": float(minimo) if minimo else None,
+    }
+
+
+def _aggregated_statistics_parallel(estacion=None, magnitud=None, fecha=None, workers=None, excluir_anomalias=False):
+    """
+    Misma salida que get_aggregated_statistics calculada con utils/parallel.py:
+    las mediciones se reparten por estación entre varios procesos.
+    Con excluir_anomalias las horas sospechosas (utils/anomalies.py) no cuentan.
+    """
+    df = measurement_frame()
+    if excluir_anomalias:
+        # Marcas calculadas al ingerir la versión, sobre todas las series (sin cortar su historia)
+        df = mask_anomalies(df, anomaly_flags())
+    mask = pd.Series(True, index=df.index)
+    if estacion:
+        mask &= df["estacion"] == estacion
+    if magnitud:
+        mask &= df["magnitud"] == magnitud
+    if fecha:
+        ts = _parse_fecha(fecha)
+        if ts is None:
+            return None
+        mask &= df["fecha"] == ts
+
+    grupos = aggregate(df[mask], by=("estacion", "magnitud"), columnas=["H01"], workers=workers)
+    return [
+        _format_statistics(row.estacion, row.magnitud, row.n_valores, row.suma, row.maximo, row.minimo)
+        for row in grupos.itertuples(index=False)
+    ]
+
+
+def _aggregated_statistics_from_views(estacion=None, magnitud=None, fecha=None):
+    """
+    Misma salida que la consulta SPARQL de get_aggregated_statistics, pero leyendo
+    la vista diaria materializada. Devuelve None si los filtros no se pueden
+    resolver con la vista (se usa entonces la consulta SPARQL).
+    """
+    diario = load_views()["diario"]
+
+    mask = diario["n_h01"] > 0  # la consulta SPARQL exige vocab:H01
+    if estacion:
+        mask &= diario["estacion"] == estacion
+    if magnitud:
+        mask &= diario["magnitud"] == magnitud
+    if fecha:
+        ts = _parse_fecha(fecha)
+        if ts is None:
+            return None
+        mask &= diario["fecha"] == ts
+
+    grupos = diario[mask].groupby(["estacion", "magnitud"], sort=True).agg(
+        total_mediciones=("n_h01", "sum"),
+        suma=("suma_h01", "sum"),
+        maximo=("max_h01", "max"),
+        minimo=("min_h01", "min"),
+    )
+
+    return [
+        _format_statistics(estacion_val, magnitud_val, row.total_mediciones, row.suma, row.maximo, row.minimo)
+        for (estacion_val, magnitud_val), row in grupos.iterrows()
+    ]
+
+
+@cached_query
+def get_aggregated_statistics(estacion=None, magnitud=None, fecha=None, usar_vistas=True, workers=None,
+                              excluir_anomalias=False):
     """
     Obtiene estadísticas agregadas de calidad del aire (promedio, máximo, mínimo, conteo).
     Demuestra el uso de funciones de agregación en SPARQL: AVG, MAX, MIN, COUNT.
+    Por defecto se resuelve con la vista diaria materializada (utils/views.py), que da
+    el mismo resultado sin recorrer el grafo; usar_vistas=False fuerza la consulta SPARQL.
+    Con workers se recalcula desde las mediciones repartiendo por estación entre procesos.
+    Con excluir_anomalias se recalcula desde las mediciones sin las horas sospechosas.
     
     Args:
         estacion (str, optional): ID de la estación para filtrar (ej: "11", "36")
         magnitud (str, optional): Código de magnitud para filtrar (ej: "10", "12")
         fecha (str, optional): Fecha para filtrar (formato ISO)
+        usar_vistas (bool, optional): Leer de las vistas materializadas si es posible (default: True)
+        workers (int, optional): Número de procesos para la agregación en paralelo
+        excluir_anomalias (bool, optional): Descartar ceros, picos y valores atascados (default: False)
     
     Returns:
         list: Lista de diccionarios con estadísticas agregadas por estación y magnitud
@@ -345,7 +508,18 @@ def get_aggregated_statistics(estacion=None, magnitud=None, fecha=None):
         get_aggregated_statistics(estacion="11")  # Estadísticas de una estación
         get_aggregated_statistics(magnitud="10")  # Estadísticas de una magnitud
     """
-    g = load_graph()
+    if workers or excluir_anomalias:
+        results = _aggregated_statistics_parallel(estacion, magnitud, fecha, workers or 1, excluir_anomalias)
+        if results is not None:
+            return results
+
+    if usar_vistas:
+        results = _aggregated_statistics_from_views(estacion, magnitud, fecha)
+        if results is not None:
+            return results
+
+    dia = _parse_fecha(fecha) if fecha else None
+    g = partition_view(load_graph(), "MedicionAire", dia, dia)
     
     # Construir filtros dinámicos
     filters = []
@@ -394,6 +568,36 @@ def get_aggregated_statistics(estacion=None, magnitud=None, fecha=None):
     return results
 
 
+@cached_query
+def get_top_stations(magnitud, k=5, criterio="ultimo", fecha_inicio=None, fecha_fin=None):
+    """
+    Ranking de las k estaciones con valores más altos de una magnitud ("peores estaciones").
+    Se calcula sobre la vista diaria materializada con un montículo de tamaño k
+    (utils/ranking.py), sin ordenar todas las estaciones.
+
+    Args:
+        magnitud (str): Código de magnitud (ej: "8", "12")
+        k (int, optional): Número de estaciones (default: 5)
+        criterio (str, optional): "ultimo" (último valor horario), "max_diario" (máximo
+                                  horario en la ventana) o "media" (media en la ventana)
+        fecha_inicio (str, optional): Primer día de la ventana (formato ISO)
+        fecha_fin (str, optional): Último día de la ventana (formato ISO)
+
+    Returns:
+        list: Lista de diccionarios {posicion, estacion, magnitud, valor, fecha, hora, alerta}
+
+    Ejemplos:
+        get_top_stations("8")  # NO2: estaciones con el último valor horario más alto
+        get_top_stations("12", k=3, criterio="max_diario")
+    """
+    inicio = _parse_fecha(fecha_inicio) if fecha_inicio else None
+    fin = _parse_fecha(fecha_fin) if fecha_fin else None
+    if (fecha_inicio and inicio is None) or (fecha_fin and fin is None):
+        return []
+    return rank_stations(load_views()["diario"], magnitud, criterio, k, inicio, fin)
+
+
+@cached_query
 def get_available_stations():
     """
     Obtiene la lista de estaciones únicas disponibles en el dataset,
@@ -402,7 +606,7 @@ def get_available_stations():
       - Estaciones presentes en el diccionario ESTACION_LINKS
     Devuelve una lista de IDs de estaciones ordenadas numéricamente.
     """
-    g = load_graph()
+    g = partition_view(load_graph(), "MedicionAire")
 
     query = PREFIX + """
     SELECT DISTINCT ?estacion
@@ -430,6 +634,7 @@ def get_available_stations():
 
 
 
+@cached_query
 def get_available_magnitudes():
     """
     Obtiene la lista de magnitudes (contaminantes) únicas disponibles en el dataset.
@@ -438,7 +643,7 @@ def get_available_magnitudes():
     Returns:
         list: Lista de códigos de magnitud ordenados numéricamente
     """
-    g = load_graph()
+    g = partition_view(load_graph(), "MedicionAire")
     
     query = PREFIX + """
     SELECT DISTINCT ?magnitud
@@ -27,3 +27,45 @@ def fetch_wikidata_stations():
         })
 
     return results
+
+
+def fetch_station_coordinates(qids):
+    """
+    Obtiene etiqueta y coordenadas (P625) de una lista concreta de entidades de Wikidata.
+    A diferencia de fetch_wikidata_stations, no busca por municipio: consulta
+    solo los QIDs que le pasamos (los de ESTACION_LINKS).
+
+    Args:
+        qids (iterable[str]): Identificadores de Wikidata (ej: "Q8841582")
+
+    Returns:
+        dict: {qid: {"label", "lat", "lon"}} solo para las entidades con coordenadas
+    """
+    endpoint = SPARQLWrapper("https://query.wikidata.org/sparql")
+
+    values = " ".join(f"wd:{qid}" for qid in sorted(set(qids)))
+    query = """
+    SELECT ?item ?itemLabel ?lat ?lon WHERE {
+      VALUES ?item { """ + values + """ }
+      ?item wdt:P625 ?coord .
+      SERVICE wikibase:label { bd:serviceParam wikibase:language "es". }
+      BIND(geof:latitude(?coord) AS ?lat)
+      BIND(geof:longitude(?coord) AS ?lon)
+    }
+    """
+
+    endpoint.setQuery(query)
+    endpoint.setReturnFormat(JSON)
+    data = endpoint.query().convert()
+
+    results = {}
+    for r in data["results"]["bindings"]:
+        qid = r["item"]["value"].rsplit("/", 1)[-1]
+        # Si una entidad tiene varias coordenadas nos quedamos con la primera
+        results.setdefault(qid, {
+            "label": r["itemLabel"]["value"],
+            "lat": float(r["lat"]["value"]),
+            "lon": float(r["lon"]["value"]),
+        })
+
+    return results
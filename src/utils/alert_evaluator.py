@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.alerts import NIVELES, classify_alerts
+from utils.anomalies import anomaly_flags, mask_anomalies
+from utils.measurements import HORAS, measurement_frame
+from utils.rdf_loader import GRAPH_STORE, graph_version
+
+STATE_PATH = "data/alertas-estado.json"
+EVENTS_PATH = "data/alertas-transiciones.jsonl"
+
+# Fin del intervalo de cada hora: H01 = fecha + 1 h, ..., H24 = fecha + 24 h (en ns)
+_DESPLAZAMIENTO = np.arange(1, len(HORAS) + 1, dtype=np.int64) * 3_600_000_000_000
+
+
+class AlertEvaluator:
+    """
+    Evaluador incremental del semáforo de alertas.
+
+    Guarda por cada (estación, magnitud) la última hora ya evaluada (marca de agua)
+    y el nivel de alerta en que quedó. En cada tick solo se clasifican las horas
+    posteriores a la marca y se emiten las transiciones de nivel
+    (ej: 🟢 BUENO -> 🟠 ALTO). El estado se guarda en disco tras cada tick, así
+    que al reiniciar se continúa donde se dejó sin volver a evaluar el histórico.
+
+    Solo se evalúan las magnitudes con semáforo (NIVELES). Las horas sin dato no
+    mueven la marca; si llegan más tarde que una hora posterior ya evaluada, se ignoran.
+    Una serie nueva empieza a evaluarse desde la marca más antigua de las existentes.
+
+    Sin frame, tick() no hace nada si la versión del grafo es la ya evaluada y, si
+    ha cambiado, solo toma del índice de mediciones (ordenado por fecha) los días
+    posteriores a la marca más antigua, localizados con búsqueda binaria. Las horas
+    marcadas por el detector de anomalías (anomaly_flags) cuentan como horas sin dato:
+    un pico aislado o un sensor atascado no disparan transiciones.
+    """
+
+    def __init__(self, state_path=STATE_PATH, salida=EVENTS_PATH):
+        """
+        Args:
+            state_path (str): Fichero JSON con las marcas de agua y niveles
+            salida (str | queue.Queue | None): Fichero JSON Lines donde añadir las
+                                               transiciones, cola (se usa .put) o None
+        """
+        self.state_path = state_path
+        self.salida = salida
+        self._lock = threading.Lock()
+        self._version = None  # versión del grafo evaluada por el último tick sin frame
+        self._series = self._load_state()  # (estacion, magnitud) -> [marca ns, alerta]
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding="utf-8") as f:
+            estado = json.load(f)
+        self._version = estado.get("version")
+        return {
+            (s["estacion"], s["magnitud"]): [pd.Timestamp(s["hasta"]).value, s["alerta"]]
+            for s in estado["series"]
+        }
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        series = [
+            {"estacion": e, "magnitud": m, "hasta": pd.Timestamp(marca, tz="UTC").isoformat(), "alerta": alerta}
+            for (e, m), (marca, alerta) in sorted(self._series.items())
+        ]
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self._version, "series": series}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def state(self):
+        """Nivel actual de cada serie: {(estacion, magnitud): {"hasta": ISO, "alerta": ...}}."""
+        with self._lock:
+            return {
+                clave: {"hasta": pd.Timestamp(marca, tz="UTC").isoformat(), "alerta": alerta}
+                for clave, (marca, alerta) in self._series.items()
+            }
+
+    def tick(self, frame=None):
+        """
+        Evalúa las horas nuevas y emite las transiciones.
+
+        Args:
+            frame (DataFrame, optional): Mediciones (measurement_frame), completas o solo
+                                         las recién ingeridas, tal cual (sin descartar
+                                         anomalías). Por defecto, las del dataset posteriores
+                                         a las marcas, sin las horas sospechosas (nada si
+                                         no ha cambiado)
+
+        Returns:
+            list: Transiciones [{"estacion", "magnitud", "hora", "valor", "desde", "hacia"}, ...]
+                  en orden cronológico por serie (desde=None la primera vez que se ve una serie)
+        """
+        version = None
+        if frame is None:
+            # La versión se lee antes que las mediciones: si cambia entre medias, el
+            # siguiente tick vuelve a mirar (las marcas evitan repetir transiciones)
+            version = graph_version()
+            if version == self._version:
+                return []
+
+        with self._lock:
+            if version is not None:
+                frame = self._pending_clean()
+            transiciones = self._evaluate(frame)
+            if version is not None:
+                self._version = version
+            self._save_state()
+        self._emit(transiciones)
+        return transiciones
+
+    def _pending_clean(self):
+        # Mediciones y marcas de la misma versión del grafo
+        with GRAPH_STORE.pin():
+            completo = measurement_frame()
+            motivos = anomaly_flags()
+        pendiente = self._pending(completo)
+        # _pending devuelve un sufijo (iloc): las marcas se recortan igual
+        return mask_anomalies(pendiente, motivos[len(completo) - len(pendiente):])
+
+    def _pending(self, frame):
+        # measurement_frame() viene ordenado por fecha: los días que pueden tener horas
+        # posteriores a la marca más antigua son un sufijo, sin recorrer el resto
+        if not self._series or len(frame) == 0:
+            return frame
+        marca_min = min(marca for marca, _ in self._series.values())
+        fechas = frame["fecha"].to_numpy(dtype="datetime64[ns]").view("i8")
+        return frame.iloc[np.searchsorted(fechas, marca_min - _DESPLAZAMIENTO[-1], side="right"):]
+
+    def _evaluate(self, frame):
+        frame = frame[frame["magnitud"].isin(list(NIVELES))]
+        fechas = frame["fecha"].to_numpy(dtype="datetime64[ns]").view("i8")
+
+        # Descarte rápido (vectorizado) de los días anteriores a todas las marcas
+        if self._series and len(frame):
+            marca_min = min(marca for marca, _ in self._series.values())
+            recientes = fechas + _DESPLAZAMIENTO[-1] > marca_min
+            frame, fechas = frame[recientes], fechas[recientes]
+        if len(frame) == 0:
+            return []
+
+        claves = list(zip(frame["estacion"].to_numpy(), frame["magnitud"].to_numpy()))
+        marcas = np.array([self._series.get(c, (np.iinfo(np.int64).min,))[0] for c in claves], dtype=np.int64)
+        horas = fechas[:, None] + _DESPLAZAMIENTO
+        valores = frame[HORAS].to_numpy(dtype=float)
+        filas, columnas = np.nonzero(~np.isnan(valores) & (horas > marcas[:, None]))
+        if len(filas) == 0:
+            return []
+
+        # Clasificación vectorizada de las horas nuevas, agrupadas por magnitud
+        nuevas = valores[filas, columnas]
+        magnitudes = frame["magnitud"].to_numpy()[filas]
+        alertas = np.empty(len(filas), dtype=object)
+        for magnitud in np.unique(magnitudes):
+            sel = magnitudes == magnitud
+            alertas[sel] = classify_alerts(magnitud, nuevas[sel])
+
+        # Recorrido, serie a serie y en orden cronológico, solo de las horas nuevas
+        instantes = horas[filas, columnas]
+        serie = frame.groupby(["estacion", "magnitud"], sort=False).ngroup().to_numpy()[filas]
+        transiciones = []
+        for i in np.lexsort((instantes, serie)):
+            clave = claves[filas[i]]
+            marca, anterior = self._series.get(clave, (None, None))
+            if marca is not None and instantes[i] <= marca:
+                continue  # medición repetida de la misma serie y hora
+            if alertas[i] != anterior:
+                transiciones.append({
+                    "estacion": clave[0],
+                    "magnitud": clave[1],
+                    "hora": pd.Timestamp(instantes[i], tz="UTC").isoformat(),
+                    "valor": float(nuevas[i]),
+                    "desde": anterior,
+                    "hacia": alertas[i],
+                })
+            self._series[clave] = [int(instantes[i]), alertas[i]]
+        return transiciones
+
+    def _emit(self, transiciones):
+        if not transiciones or self.salida is None:
+            return
+        if hasattr(self.salida, "put"):
+            for t in transiciones:
+                self.salida.put(t)
+            return
+        with open(self.salida, "a", encoding="utf-8") as f:
+            for t in transiciones:
+                f.write(json.dumps(t, ensure_ascii=False) + "\n")
+
+    def watch(self, intervalo=60.0, parar=None):
+        """
+        Bucle de evaluación: hace un tick cada vez que cambia el dataset (graph_version)
+        y devuelve las transiciones según se producen, hasta que se active parar.
+
+        Args:
+            intervalo (float): Segundos entre comprobaciones
+            parar (threading.Event, optional): Evento para terminar el bucle
+        """
+        parar = parar or threading.Event()
+        version = None
+        while not parar.is_set():
+            actual = graph_version()
+            if actual != version:
+                yield from self.tick()
+                version = actual
+            parar.wait(intervalo)
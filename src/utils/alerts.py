@@ -1,24 +1,50 @@
+import numpy as np
+
+# Umbrales del semáforo por magnitud, de mayor a menor: [(umbral, etiqueta), ...]
+# El primero de cada lista es el umbral de superación (nivel más alto)
+NIVELES = {
+    "8": [(200, "🔴 MUY ALTO"), (100, "🟠 ALTO")],        # NO2
+    "12": [(180, "🔴 MUY ALTO"), (120, "🟠 PRECAUCIÓN")],  # O3
+    "9": [(50, "🔴 MALO")],                               # PM10
+}
+
+
 def classify_alert(magnitud, valor):
-    if magnitud == "8":  # NO2
-        if valor >= 200:
-            return "🔴 MUY ALTO"
-        elif valor >= 100:
-            return "🟠 ALTO"
-        else:
-            return "🟢 BUENO"
-
-    if magnitud == "12":  # O3
-        if valor >= 180:
-            return "🔴 MUY ALTO"
-        elif valor >= 120:
-            return "🟠 PRECAUCIÓN"
-        else:
-            return "🟢 BUENO"
-
-    if magnitud == "9":  # PM10
-        if valor >= 50:
-            return "🔴 MALO"
-        else:
-            return "🟢 BUENO"
-
-    return "⚪ SIN DATOS"
+    niveles = NIVELES.get(magnitud)
+    if niveles is None:
+        return "⚪ SIN DATOS"
+
+    for umbral, etiqueta in niveles:
+        if valor >= umbral:
+            return etiqueta
+    return "🟢 BUENO"
+
+
+def classify_alerts(magnitud, valores):
+    """classify_alert para un array de valores de la misma magnitud, sin bucle en Python."""
+    valores = np.asarray(valores, dtype=float)
+    niveles = NIVELES.get(magnitud)
+    if niveles is None:
+        return np.full(len(valores), "⚪ SIN DATOS", dtype=object)
+
+    condiciones = [valores >= umbral for umbral, _ in niveles]
+    return np.select(condiciones, [etiqueta for _, etiqueta in niveles], default="🟢 BUENO").astype(object)
+
+
+def exceedance_threshold(magnitud):
+    """Umbral a partir del cual una hora cuenta como superación (None si la magnitud no tiene semáforo)."""
+    niveles = NIVELES.get(magnitud)
+    return niveles[0][0] if niveles else None
+
+
+# Colores RGB para pintar cada nivel del semáforo (ej: en el mapa con pydeck)
+ALERT_COLORS = {
+    "🔴": [215, 48, 39],
+    "🟠": [252, 141, 89],
+    "🟢": [26, 152, 80],
+    "⚪": [170, 170, 170],
+}
+
+
+def alert_color(alerta):
+    return ALERT_COLORS.get(alerta[:1], ALERT_COLORS["⚪"])
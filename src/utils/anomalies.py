@@ -0,0 +1,313 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.measurements import HORAS, measurement_frame
+from utils.rdf_loader import graph_index, register_index
+
+# Motivos de sospecha (códigos int8 en las matrices de marcas; 0 = valor normal)
+NORMAL, CERO, PICO, CONSTANTE = 0, 1, 2, 3
+MOTIVOS = {CERO: "cero", PICO: "pico", CONSTANTE: "constante"}
+
+ALPHA = 0.3             # peso de la última hora en la media/varianza exponencial
+Z_MAX = 5.0             # |z| a partir del cual una hora es un pico
+DESV_MIN = 3.0          # desviación mínima: evita z enormes en series casi planas
+MIN_HISTORIA = 6        # horas observadas antes de juzgar picos y ceros
+CERO_MEDIA_MIN = 10.0   # un 0 es sospechoso si la serie venía por encima de esto...
+Z_CERO = 3.0            # ...y a más de Z_CERO desviaciones (un cero rara vez es real)
+HORAS_CONSTANTE = 8     # horas seguidas con el mismo valor para considerarlo atascado
+CONSTANTE_MIN = 10.0    # por debajo, valores repetidos son normales (resolución del sensor)
+
+
+class AnomalyDetector:
+    """
+    Detector de lecturas sospechosas en streaming, una serie por (estación, magnitud).
+
+    Cada serie guarda un estado de tamaño fijo: media y varianza exponenciales (EWMA),
+    último valor, horas seguidas con ese valor, horas observadas y un pico pendiente.
+    - cero: cae a 0 desde una serie con media >= CERO_MEDIA_MIN y a más de Z_CERO desviaciones
+    - constante: repite el mismo valor (>= CONSTANTE_MIN) HORAS_CONSTANTE horas o más
+    - pico: se aleja más de Z_MAX desviaciones de la media y la hora siguiente vuelve
+      a la normalidad. Una subida que se mantiene (un episodio real) no es un pico:
+      el valor pendiente se acepta y la media se adapta. Por eso los picos se
+      confirman con una hora de retraso.
+
+    El estado vive en arrays de numpy indexados por serie, así que update() procesa
+    una hora de todas las estaciones a la vez con operaciones vectorizadas.
+    """
+
+    def __init__(self, alpha=ALPHA, z_max=Z_MAX, min_historia=MIN_HISTORIA, horas_constante=HORAS_CONSTANTE):
+        self.alpha = alpha
+        self.z_max = z_max
+        self.min_historia = min_historia
+        self.horas_constante = horas_constante
+        self._series = {}  # (estacion, magnitud) -> índice en los arrays de estado
+        self._estado = {
+            "media": np.zeros(0),
+            "var": np.zeros(0),
+            "ultimo": np.zeros(0),
+            "repeticiones": np.zeros(0, dtype=np.int64),
+            "n": np.zeros(0, dtype=np.int64),
+            "pendiente": np.zeros(0),
+            "etiqueta": np.zeros(0, dtype=np.int64),
+        }
+
+    def __len__(self):
+        return len(self._series)
+
+    def series_ids(self, estaciones, magnitudes):
+        """Índice de estado de cada (estación, magnitud); las series nuevas se crean vacías."""
+        ids = np.empty(len(estaciones), dtype=np.int64)
+        for i, clave in enumerate(zip(estaciones, magnitudes)):
+            indice = self._series.get(clave)
+            if indice is None:
+                indice = self._series[clave] = len(self._series)
+            ids[i] = indice
+        self._grow(len(self._series))
+        return ids
+
+    def _grow(self, n):
+        actual = len(self._estado["media"])
+        if n <= actual:
+            return
+        extra = max(n, 2 * actual, 64) - actual
+        for nombre, datos in self._estado.items():
+            relleno = np.nan if nombre in ("ultimo", "pendiente") else 0
+            self._estado[nombre] = np.concatenate([datos, np.full(extra, relleno, dtype=datos.dtype)])
+
+    def update(self, estaciones, magnitudes, valores, etiquetas=None):
+        """
+        Procesa una hora de varias series (cada serie como mucho una vez por llamada).
+
+        Args:
+            estaciones, magnitudes (sequence): Serie de cada valor
+            valores (array): Valor horario de cada serie (NaN = sin dato: no cambia nada)
+            etiquetas (array of int, optional): Identificador de cada valor (ej: su posición);
+                                                se devuelve si ese valor se confirma como pico
+
+        Returns:
+            tuple: (motivos, picos)
+                   motivos: código de cada valor (NORMAL, CERO o CONSTANTE)
+                   picos: etiquetas de valores anteriores confirmados ahora como pico
+        """
+        return self.update_ids(self.series_ids(estaciones, magnitudes), valores, etiquetas)
+
+    def update_ids(self, ids, valores, etiquetas=None):
+        """Como update(), con los índices ya resueltos por series_ids()."""
+        e = self._estado
+        v = np.asarray(valores, dtype=float)
+        etiquetas = np.arange(len(v)) if etiquetas is None else np.asarray(etiquetas, dtype=np.int64)
+        motivos = np.zeros(len(v), dtype=np.int8)
+        obs = ~np.isnan(v)
+        ids, v, etiquetas = ids[obs], v[obs], etiquetas[obs]
+
+        # 1. Resolver el pico pendiente de la hora anterior con el valor actual
+        pendiente = e["pendiente"][ids]
+        hay_pendiente = ~np.isnan(pendiente)
+        vuelve = np.abs(v - e["media"][ids]) <= self.z_max * self._desviacion(ids)
+        picos = e["etiqueta"][ids[hay_pendiente & vuelve]]
+        aceptado = hay_pendiente & ~vuelve  # la subida se mantiene: era un valor real
+        self._learn(ids[aceptado], pendiente[aceptado])
+        e["pendiente"][ids] = np.nan
+
+        # 2. Clasificar el valor actual
+        media = e["media"][ids]
+        desv = self._desviacion(ids)
+        madura = e["n"][ids] >= self.min_historia
+        repeticiones = np.where(v == e["ultimo"][ids], e["repeticiones"][ids] + 1, 1)
+        candidato = madura & (np.abs(v - media) > self.z_max * desv)
+
+        marcas = np.zeros(len(v), dtype=np.int8)
+        marcas[(repeticiones >= self.horas_constante) & (np.abs(v) >= CONSTANTE_MIN)] = CONSTANTE
+        marcas[madura & (v == 0) & (media >= CERO_MEDIA_MIN) & (media > Z_CERO * desv)] = CERO
+        motivos[obs] = marcas
+
+        # Los candidatos a pico quedan pendientes; solo los valores normales actualizan
+        # la media (un cero o un valor atascado no deben arrastrarla)
+        pend = candidato & (marcas == NORMAL)
+        e["pendiente"][ids[pend]] = v[pend]
+        e["etiqueta"][ids[pend]] = etiquetas[pend]
+        normal = ~pend & (marcas == NORMAL)
+        self._learn(ids[normal], v[normal])
+        e["ultimo"][ids] = v
+        e["repeticiones"][ids] = repeticiones
+        return motivos, picos
+
+    def _desviacion(self, ids):
+        return np.sqrt(np.maximum(self._estado["var"][ids], DESV_MIN ** 2))
+
+    def _learn(self, ids, x):
+        # Actualización EWMA de media y varianza
+        e = self._estado
+        media = e["media"][ids]
+        delta = x - media
+        primera = e["n"][ids] == 0
+        e["media"][ids] = np.where(primera, x, media + self.alpha * delta)
+        e["var"][ids] = np.where(primera, 0.0, (1 - self.alpha) * (e["var"][ids] + self.alpha * delta ** 2))
+        e["n"][ids] += 1
+
+
+def detect_anomalies(frame, detector=None):
+    """
+    Pasa las mediciones por el detector en orden cronológico, hora a hora.
+
+    Args:
+        frame (DataFrame): Resultado de measurement_frame
+        detector (AnomalyDetector, optional): Detector con estado previo (ej: de una ingesta
+                                             anterior); si no, se crea uno nuevo
+
+    Returns:
+        ndarray: Códigos de motivo, forma (filas de frame, 24), alineados con frame[HORAS]
+    """
+    detector = detector or AnomalyDetector()
+    motivos = np.zeros((len(frame), len(HORAS)), dtype=np.int8)
+    if len(frame):
+        _feed(detector, frame, np.arange(len(frame)), motivos)
+    return motivos
+
+
+def _feed(detector, frame, filas_motivos, motivos):
+    # Pasa frame por el detector escribiendo en motivos[filas_motivos[i]] las marcas
+    # de la fila i. Las etiquetas de pico son posiciones en motivos, así que un pico
+    # pendiente de una llamada anterior se marca en su fila aunque ya no esté en frame
+    valores = frame[HORAS].to_numpy(dtype=float)
+    ids = detector.series_ids(frame["estacion"].to_numpy(), frame["magnitud"].to_numpy())
+    fechas = frame["fecha"].to_numpy(dtype="datetime64[ns]").view("i8")
+    # Si una serie tuviera dos mediciones el mismo día, van en lotes distintos
+    ocurrencia = pd.Series(ids).groupby([ids, fechas]).cumcount().to_numpy()
+    orden = np.lexsort((ocurrencia, fechas))
+
+    n_horas = len(HORAS)
+    planos = motivos.reshape(-1)  # etiqueta de cada valor = fila de motivos * 24 + hora
+    lotes = np.flatnonzero(np.diff(fechas[orden]) | np.diff(ocurrencia[orden])) + 1
+    for filas in np.split(orden, lotes):
+        destino = filas_motivos[filas]
+        for h in range(n_horas):
+            actuales, picos = detector.update_ids(ids[filas], valores[filas, h], destino * n_horas + h)
+            motivos[destino, h] = actuales
+            planos[picos] = PICO
+
+
+def anomaly_flags(clase="MedicionAire"):
+    """
+    Marcas del detector para measurement_frame(clase=clase) de la versión actual
+    del grafo, fila a fila. Se calculan una vez por versión, al ingerirla (el
+    vigilante de recarga las precalcula antes de publicarla), y se comparten:
+    el array es de solo lectura. El detector sigue vivo entre versiones y solo
+    procesa las mediciones nuevas (ver IncrementalFlags).
+
+    Returns:
+        ndarray: Códigos de motivo, forma (filas, 24), alineados con measurement_frame(clase=clase)[HORAS]
+    """
+    return graph_index(f"anomalias/{clase}", lambda grafo: _flags(clase))
+
+
+class IncrementalFlags:
+    """
+    Marcas de anomalías de una clase de medición que se mantienen entre versiones
+    del dataset: el detector (estado fijo por serie) no se reinicia y cada serie
+    guarda una marca de agua con la última fecha procesada, como AlertEvaluator.
+    Al llegar una versión nueva solo las mediciones posteriores a la marca de su
+    serie pasan por el detector; las ya vistas conservan sus marcas (un pico
+    pendiente al final de la versión anterior se confirma en su fila original).
+
+    Las mediciones que llegan con fecha anterior a la marca de su serie, o las ya
+    vistas cuyos valores cambian, no se reevalúan. El estado vive en memoria del
+    proceso: tras reiniciar, la primera versión recorre el histórico una vez.
+    """
+
+    def __init__(self, detector=None):
+        self.detector = detector or AnomalyDetector()
+        self._marcas = {}  # (estacion, magnitud) -> fecha (ns) de la última medición procesada
+        # (estacion, magnitud, fecha, ocurrencia): ocurrencia distingue dos mediciones del mismo día
+        self._claves = pd.MultiIndex.from_arrays([[], [], [], []], names=["estacion", "magnitud", "fecha", "ocurrencia"])
+        self._motivos = np.zeros((0, len(HORAS)), dtype=np.int8)  # una fila por medición vista
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._claves)
+
+    def flags(self, frame):
+        """
+        Returns:
+            ndarray: Códigos de motivo (solo lectura), forma (filas de frame, 24)
+        """
+        with self._lock:
+            estaciones = frame["estacion"].to_numpy()
+            magnitudes = frame["magnitud"].to_numpy()
+            fechas = frame["fecha"].to_numpy(dtype="datetime64[ns]").view("i8")
+            ocurrencia = frame.groupby(["estacion", "magnitud", "fecha"], sort=False).cumcount().to_numpy()
+            claves = pd.MultiIndex.from_arrays([estaciones, magnitudes, fechas, ocurrencia], names=self._claves.names)
+
+            posiciones = self._claves.get_indexer(claves) if len(self._claves) else np.full(len(frame), -1)
+            nuevas = np.flatnonzero(posiciones == -1)
+            primera = len(self._claves)
+            if len(nuevas):
+                self._claves = self._claves.append(claves[nuevas])
+                self._motivos = np.concatenate([self._motivos, np.zeros((len(nuevas), len(HORAS)), dtype=np.int8)])
+                posiciones[nuevas] = primera + np.arange(len(nuevas))
+
+            # Solo pasan por el detector las nuevas posteriores a la marca de su serie
+            minimo = np.iinfo(np.int64).min
+            marca = np.array([self._marcas.get(s, minimo) for s in zip(estaciones[nuevas], magnitudes[nuevas])],
+                             dtype=np.int64)
+            procesar = nuevas[fechas[nuevas] > marca]
+            if len(procesar):
+                _feed(self.detector, frame.iloc[procesar], posiciones[procesar], self._motivos)
+                for s, f in zip(zip(estaciones[procesar], magnitudes[procesar]), fechas[procesar].tolist()):
+                    if f > self._marcas.get(s, minimo):
+                        self._marcas[s] = f
+
+            motivos = self._motivos[posiciones]  # copia: la versión publicada no cambia
+            motivos.setflags(write=False)
+            return motivos
+
+
+# Estado incremental por clase, compartido por todas las versiones del grafo
+_INCREMENTAL = {}
+_INCREMENTAL_LOCK = threading.Lock()
+
+
+def _flags(clase):
+    # Sobre el índice de mediciones de la misma versión (ver graph_index)
+    with _INCREMENTAL_LOCK:
+        incremental = _INCREMENTAL.setdefault(clase, IncrementalFlags())
+    return incremental.flags(measurement_frame(clase=clase))
+
+
+def mask_anomalies(frame, motivos=None):
+    """Copia de las mediciones con las horas sospechosas a NaN (como si no hubiera dato)."""
+    if motivos is None:
+        motivos = detect_anomalies(frame)
+    limpio = frame.copy()
+    limpio[HORAS] = np.where(motivos != NORMAL, np.nan, frame[HORAS].to_numpy(dtype=float))
+    return limpio
+
+
+def anomaly_rows(frame, motivos=None):
+    """
+    Horas marcadas como sospechosas, una fila por hora.
+
+    Returns:
+        list: [{"estacion", "magnitud", "fecha", "hora", "valor", "motivo"}, ...]
+    """
+    if motivos is None:
+        motivos = detect_anomalies(frame)
+    filas, horas = np.nonzero(motivos)
+    valores = frame[HORAS].to_numpy(dtype=float)
+    return [
+        {
+            "estacion": frame["estacion"].iat[i],
+            "magnitud": frame["magnitud"].iat[i],
+            "fecha": frame["fecha"].iat[i].isoformat(),
+            "hora": HORAS[h],
+            "valor": float(valores[i, h]),
+            "motivo": MOTIVOS[int(motivos[i, h])],
+        }
+        for i, h in zip(filas.tolist(), horas.tolist())
+    ]
+
+
+# Se marcan al ingerir cada versión: el vigilante las precalcula antes de publicarla
+register_index("anomalias/MedicionAire", lambda grafo: _flags("MedicionAire"))
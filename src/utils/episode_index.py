@@ -0,0 +1,170 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+import pandas as pd
+from rdflib import RDF, Namespace
+
+from utils.rdf_loader import load_graph, partition_view, register_index
+from utils.records import EpisodioOzono
+
+VOCAB = Namespace("http://example.org/vocab#")
+
+# Palabras demasiado frecuentes para servir de búsqueda
+STOPWORDS = frozenset({"a", "al", "de", "del", "el", "en", "la", "las", "los", "o", "para", "por", "y"})
+
+_PALABRA = re.compile(r"\w+")
+
+
+def fold(texto):
+    """Normaliza texto para buscar: minúsculas y sin tildes ni diéresis (ej: "PÁGINA" -> "pagina")."""
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenize(texto):
+    return [t for t in _PALABRA.findall(fold(texto)) if t not in STOPWORDS]
+
+
+def _utc(fecha):
+    # Igual que _parse_fecha de internal.py: sin zona se toma como UTC
+    try:
+        ts = pd.Timestamp(fecha)
+    except ValueError:
+        return None
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+class EpisodeIndex:
+    """
+    Índice invertido sobre el escenario y las medidas para la población de los
+    episodios de ozono. Cada término normalizado (fold) apunta a la lista ordenada
+    de episodios que lo contienen; los términos se guardan ordenados para buscar
+    por prefijo con bisect. Las medidas se indexan una a una, tal como vienen en
+    el RDF, sin concatenarlas ni volver a partirlas.
+    """
+
+    def __init__(self, episodios, medidas):
+        """
+        Args:
+            episodios (list): EpisodioOzono, de más reciente a más antiguo
+            medidas (list): Tupla de medidas para la población de cada episodio
+        """
+        self.episodios = episodios
+        self._medidas = {e.episodio_uri: m for e, m in zip(episodios, medidas)}
+
+        postings = {}
+        for i, (episodio, textos) in enumerate(zip(episodios, medidas)):
+            terminos = set()
+            for texto in (episodio.escenario or "", *textos):
+                terminos.update(tokenize(texto))
+            for termino in terminos:
+                postings.setdefault(termino, []).append(i)
+        self._postings = postings
+        self._terminos = sorted(postings)
+
+        self._escenarios = {}
+        for i, episodio in enumerate(episodios):
+            self._escenarios.setdefault(episodio.escenario, []).append(i)
+
+    def __len__(self):
+        return len(self.episodios)
+
+    def medidas(self, episodio_uri):
+        """Medidas para la población de un episodio, por separado."""
+        return self._medidas.get(episodio_uri, ())
+
+    def _match(self, termino, prefijo):
+        if not prefijo:
+            return set(self._postings.get(termino, ()))
+        encontrados = set()
+        i = bisect_left(self._terminos, termino)
+        while i < len(self._terminos) and self._terminos[i].startswith(termino):
+            encontrados.update(self._postings[self._terminos[i]])
+            i += 1
+        return encontrados
+
+    def _ids(self, texto="", escenario=None, prefijo=True):
+        ids = None
+        for termino in tokenize(texto):
+            coincidencias = self._match(termino, prefijo)
+            ids = coincidencias if ids is None else ids & coincidencias
+            if not ids:
+                return []
+        if escenario is not None:
+            del_escenario = set(self._escenarios.get(escenario, ()))
+            ids = del_escenario if ids is None else ids & del_escenario
+        return sorted(ids) if ids is not None else list(range(len(self.episodios)))
+
+    def search(self, texto="", escenario=None, prefijo=True, fecha_inicio=None, fecha_fin=None):
+        """
+        Episodios que contienen todas las palabras del texto (sin distinguir tildes
+        ni mayúsculas). Con prefijo=True cada palabra también encuentra las que
+        empiezan por ella (ej: "recomenda" -> "recomendaciones").
+
+        Args:
+            texto (str): Palabras a buscar ("" = todos los episodios)
+            escenario (str, optional): Solo los episodios de este escenario
+            prefijo (bool): Buscar por prefijo (default: True) o por palabra exacta
+            fecha_inicio, fecha_fin (str, optional): Mismos filtros que get_ozone_episodes
+                                                     (una fecha sin zona se toma como UTC)
+
+        Returns:
+            list: EpisodioOzono, de más reciente a más antiguo
+        """
+        inicio = _utc(fecha_inicio) if fecha_inicio else None
+        fin = _utc(fecha_fin) if fecha_fin else None
+        resultado = []
+        for i in self._ids(texto, escenario, prefijo):
+            episodio = self.episodios[i]
+            if inicio is not None and _utc(episodio.fecha_inicio) < inicio:
+                continue
+            if fin is not None and _utc(episodio.fecha_fin) > fin:
+                continue
+            resultado.append(episodio)
+        return resultado
+
+    def facets(self, episodios=None):
+        """Número de episodios por escenario (de todos o de un resultado de search)."""
+        if episodios is None:
+            return {e: len(ids) for e, ids in sorted(self._escenarios.items(), key=lambda kv: str(kv[0]))}
+        return dict(sorted(Counter(e.escenario for e in episodios).items(), key=lambda kv: str(kv[0])))
+
+
+def build_episode_index(g=None):
+    """
+    Construye el índice de episodios recorriendo directamente sus tripletas.
+
+    Returns:
+        EpisodeIndex
+    """
+    if g is None:
+        g = load_graph()
+    g = partition_view(g, "EpisodioOzono")
+
+    filas = []
+    for episodio in g.subjects(RDF.type, VOCAB.EpisodioOzono):
+        inicio = g.value(episodio, VOCAB.inicio)
+        fin = g.value(episodio, VOCAB.fin)
+        if inicio is None or fin is None:
+            continue  # igual que get_ozone_episodes, que exige inicio y fin
+        escenario = g.value(episodio, VOCAB.escenario)
+        medidas = tuple(sorted(str(m) for m in g.objects(episodio, VOCAB.medidaPoblacion)))
+        filas.append((inicio.toPython(), episodio, inicio, fin, escenario, medidas))
+
+    filas.sort(key=lambda f: f[0], reverse=True)
+    episodios = [
+        EpisodioOzono(
+            episodio_uri=str(episodio),
+            fecha_inicio=str(inicio),
+            fecha_fin=str(fin),
+            escenario=str(escenario) if escenario else None,
+            medida_poblacion=" | ".join(medidas) if medidas else None,
+        )
+        for _, episodio, inicio, fin, escenario, medidas in filas
+    ]
+    return EpisodeIndex(episodios, [f[5] for f in filas])
+
+
+register_index("episodios", build_episode_index)
@@ -0,0 +1,144 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from utils.measurements import HORAS, measurement_frame
+from utils.turtle_stream import ingest_measurements
+
+EXPORT_DIR = "data/parquet"
+
+# Un dataset por clase de medición, con el mismo esquema en ambos
+# (para MedicionMeteorologica la columna magnitud es vocab:variable)
+CLASES = {
+    "MedicionAire": "medicion_aire",
+    "MedicionMeteorologica": "medicion_meteorologica",
+}
+
+SCHEMA = pa.schema(
+    [
+        ("estacion", pa.string()),
+        ("magnitud", pa.string()),
+        ("fecha", pa.timestamp("us", tz="UTC")),
+        ("puntoMuestreo", pa.string()),
+    ]
+    + [(h, pa.float32()) for h in HORAS]
+    + [("mes", pa.string())]
+)
+
+# Particionado estilo Hive: <dataset>/mes=2025-05/magnitud=10/part-0.parquet
+PARTITIONING = ds.partitioning(
+    pa.schema([("mes", pa.string()), ("magnitud", pa.string())]),
+    flavor="hive",
+)
+
+# Grupos de filas pequeños = estadísticas min/max más finas para el filtrado
+ROWS_PER_GROUP = 4096
+
+
+def export_parquet(out_dir=EXPORT_DIR, g=None):
+    """
+    Exporta MedicionAire y MedicionMeteorologica a Parquet particionado por mes y magnitud.
+    Dentro de cada partición las filas van ordenadas por estación y fecha, para que
+    las estadísticas de cada row group permitan descartar bloques al filtrar.
+
+    Args:
+        out_dir (str): Directorio de salida (se crea un subdirectorio por clase)
+        g (Graph, optional): Grafo ya cargado (si no, el TTL se lee en streaming,
+                             sin construir el grafo: ver utils/turtle_stream.py)
+
+    Returns:
+        dict: {clase: número de filas exportadas}
+    """
+    frames = ingest_measurements(clases=tuple(CLASES)).frames() if g is None else None
+    totales = {}
+    for clase, subdir in CLASES.items():
+        df = frames[clase] if frames is not None else measurement_frame(g, clase)
+        # assign crea otro DataFrame: el de measurement_frame puede ser el índice
+        # compartido del snapshot (utils/rdf_loader.py) y no se debe modificar
+        df = df.assign(mes=df["fecha"].dt.strftime("%Y-%m"))
+        df = df.sort_values(["mes", "magnitud", "estacion", "fecha"], ignore_index=True)
+
+        table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+        destino = os.path.join(out_dir, subdir)
+        # Se escribe aparte y se sustituye el export anterior entero: así no quedan
+        # particiones (mes, magnitud) que ya no existen en los datos
+        tmp_dir = f"{destino}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        ds.write_dataset(
+            table,
+            tmp_dir,
+            format="parquet",
+            partitioning=PARTITIONING,
+            max_rows_per_group=ROWS_PER_GROUP,
+            min_rows_per_group=min(ROWS_PER_GROUP, max(len(df), 1)),
+        )
+        _swap_dir(tmp_dir, destino)
+        totales[clase] = len(df)
+    return totales
+
+
+def _swap_dir(nuevo, destino):
+    # Cambio de directorio en dos renombrados: el hueco entre ambos es mínimo
+    # y el contenido anterior se borra después
+    viejo = f"{destino}.old-{os.getpid()}"
+    if os.path.exists(destino):
+        os.replace(destino, viejo)
+    os.replace(nuevo, destino)
+    shutil.rmtree(viejo, ignore_errors=True)
+
+
+def _timestamp(fecha):
+    ts = pd.Timestamp(fecha)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return pa.scalar(ts, type=pa.timestamp("us", tz="UTC"))
+
+
+def read_parquet(path=EXPORT_DIR, clase="MedicionAire", estacion=None, magnitud=None,
+                 fecha_inicio=None, fecha_fin=None, columns=None):
+    """
+    Lee mediciones exportadas con export_parquet empujando los filtros al escaneo:
+    mes y magnitud descartan particiones completas y estación/fecha descartan
+    row groups a partir de sus estadísticas, sin tocar el RDF.
+
+    Args:
+        path (str): Directorio raíz del export
+        clase (str): "MedicionAire" o "MedicionMeteorologica"
+        estacion (str, optional): ID de la estación (ej: "11")
+        magnitud (str, optional): Código de magnitud (ej: "10")
+        fecha_inicio (str, optional): Desde esta fecha, inclusive (formato ISO)
+        fecha_fin (str, optional): Hasta esta fecha, inclusive (formato ISO)
+        columns (list, optional): Columnas a leer (por defecto todas)
+
+    Returns:
+        pyarrow.Table: Filas que cumplen los filtros (usar .to_pandas() si hace falta)
+
+    Ejemplos:
+        read_parquet(estacion="11", fecha_inicio="2025-05-01T00:00:00Z")
+        read_parquet(clase="MedicionMeteorologica", magnitud="83").to_pandas()
+    """
+    dataset = ds.dataset(os.path.join(path, CLASES[clase]), format="parquet",
+                         partitioning=PARTITIONING)
+
+    filtros = []
+    if estacion:
+        filtros.append(ds.field("estacion") == estacion)
+    if magnitud:
+        filtros.append(ds.field("magnitud") == magnitud)
+    if fecha_inicio:
+        inicio = _timestamp(fecha_inicio)
+        # El filtro por mes poda directorios; el de fecha, row groups
+        filtros.append(ds.field("mes") >= inicio.as_py().strftime("%Y-%m"))
+        filtros.append(ds.field("fecha") >= inicio)
+    if fecha_fin:
+        fin = _timestamp(fecha_fin)
+        filtros.append(ds.field("mes") <= fin.as_py().strftime("%Y-%m"))
+        filtros.append(ds.field("fecha") <= fin)
+
+    expresion = None
+    for f in filtros:
+        expresion = f if expresion is None else expresion & f
+
+    return dataset.to_table(columns=columns, filter=expresion)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from rdflib import Namespace, RDF
+
+from utils.rdf_loader import graph_index, load_graph, partition_view, register_index
+
+VOCAB = Namespace("http://example.org/vocab#")
+
+HORAS = [f"H{i:02d}" for i in range(1, 25)]
+
+# Predicado -> columna del DataFrame. Las mediciones meteorológicas usan
+# vocab:variable en lugar de vocab:magnitud (en los CSV de Madrid ambas son
+# la columna MAGNITUD), así que las dos van a la misma columna.
+_COLUMNAS = {
+    VOCAB.estacion: "estacion",
+    VOCAB.magnitud: "magnitud",
+    VOCAB.variable: "magnitud",
+    VOCAB.fecha: "fecha",
+    VOCAB.puntoMuestreo: "puntoMuestreo",
+}
+_COLUMNAS.update({VOCAB[h]: h for h in HORAS})
+
+
+def measurement_frame(g=None, clase="MedicionAire", desde=None, hasta=None):
+    """
+    Carga todas las mediciones de una clase en un DataFrame (una fila por medición).
+    Recorre las tripletas directamente en vez de lanzar una consulta SPARQL,
+    por lo que sirve como base para cálculos precomputados. Solo se recorren
+    las particiones de esa clase (y de esa ventana de fechas, si se indica).
+
+    Sin grafo ni ventana, el resultado es un índice de la versión actual del grafo
+    (se calcula una vez por versión y se comparte: tratarlo como de solo lectura).
+
+    Args:
+        g (Graph, optional): Grafo ya cargado (si no, el de la versión actual)
+        clase (str): "MedicionAire" o "MedicionMeteorologica"
+        desde, hasta (datetime, optional): Solo las particiones que solapan esta ventana;
+                                           las filas fuera de ella también se descartan
+
+    Returns:
+        DataFrame: columnas estacion, magnitud, fecha (datetime UTC), puntoMuestreo, H01..H24
+    """
+    if g is None:
+        if desde is None and hasta is None:
+            return graph_index(f"mediciones/{clase}", lambda grafo: measurement_frame(grafo, clase))
+        g = load_graph()
+    g = partition_view(g, clase, desde, hasta)
+
+    filas = []
+    for m in g.subjects(RDF.type, VOCAB[clase]):
+        fila = {}
+        for p, o in g.predicate_objects(m):
+            columna = _COLUMNAS.get(p)
+            if columna is not None:
+                fila[columna] = o.toPython()
+        filas.append(fila)
+
+    df = pd.DataFrame(filas, columns=["estacion", "magnitud", "fecha", "puntoMuestreo"] + HORAS)
+    df["fecha"] = pd.to_datetime(df["fecha"], utc=True)
+    df[HORAS] = df[HORAS].astype(float)
+    if desde is not None:
+        df = df[df["fecha"] >= desde]
+    if hasta is not None:
+        df = df[df["fecha"] <= hasta]
+    return df.sort_values(["fecha", "estacion", "magnitud"], ignore_index=True)
+
+
+# El vigilante de recarga en caliente lo precalcula antes de publicar cada versión
+register_index("mediciones/MedicionAire", measurement_frame)
+
+
+def station_summary(df):
+    """
+    Resume cada medición diaria en su último valor horario y su media.
+
+    Args:
+        df (DataFrame): Resultado de measurement_frame
+
+    Returns:
+        DataFrame: columnas estacion, magnitud, dia (YYYY-MM-DD),
+                   ultimo, hora_ultimo (1-24), media, maximo
+    """
+    valores = df[HORAS].to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    n_validos = validos.sum(axis=1)
+    tiene_datos = n_validos > 0
+
+    # Última hora con dato: primera posición válida recorriendo al revés
+    idx_ultimo = valores.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+    ultimo = valores[np.arange(len(valores)), idx_ultimo]
+
+    suma = np.where(validos, valores, 0.0).sum(axis=1)
+    maximo = np.where(validos, valores, -np.inf).max(axis=1)
+
+    resumen = pd.DataFrame({
+        "estacion": df["estacion"].to_numpy(),
+        "magnitud": df["magnitud"].to_numpy(),
+        "dia": df["fecha"].dt.strftime("%Y-%m-%d").to_numpy(),
+        "ultimo": np.where(tiene_datos, ultimo, np.nan),
+        "hora_ultimo": np.where(tiene_datos, idx_ultimo + 1, 0),
+        "media": np.where(tiene_datos, suma / np.maximum(n_validos, 1), np.nan),
+        "maximo": np.where(tiene_datos, maximo, np.nan),
+    })
+    return resumen
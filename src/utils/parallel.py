@@ -0,0 +1,225 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.measurements import HORAS
+
+# Arrays compartidos del proceso trabajador (se enganchan una vez por proceso)
+_shared = {}
+
+# Puntos del resumen de cuantiles de cada grupo en cada partición: lo que se envía
+# al proceso padre no crece con los datos
+SKETCH_SIZE = 128
+
+
+def exact_sum(valores):
+    """
+    Suma exacta de valores como expansión [s, r1, r2, ...] de floats no solapados.
+    math.fsum de la expansión (o de la concatenación de varias) es la suma
+    correctamente redondeada, así que el resultado no depende del orden ni de
+    cómo se hayan repartido los valores entre particiones.
+    """
+    terminos = []
+    resto = np.asarray(valores, dtype=float)
+    while True:
+        s = math.fsum(resto)
+        if s == 0.0 or not math.isfinite(s):
+            if s != 0.0:
+                terminos.append(s)
+            return terminos
+        terminos.append(s)
+        resto = np.append(resto, -s)
+
+
+def quantile_sketch(datos, tamano=SKETCH_SIZE):
+    """
+    Resumen de tamaño fijo de unos valores para estimar cuantiles: los valores
+    ordenados se reparten en como mucho `tamano` tramos de rangos consecutivos
+    y de cada tramo se guarda su mediana y cuántos valores tiene. Con
+    `tamano` valores o menos cada tramo es un valor y el resumen es exacto.
+
+    Returns:
+        tuple: (medianas, pesos) como arrays de numpy
+    """
+    ordenados = np.sort(np.asarray(datos, dtype=float))
+    if len(ordenados) <= tamano:
+        return ordenados, np.ones(len(ordenados), dtype=np.int64)
+    tramos = np.array_split(ordenados, tamano)
+    return np.array([np.median(t) for t in tramos]), np.array([len(t) for t in tramos], dtype=np.int64)
+
+
+def merge_quantiles(resumenes, n, minimo, maximo, cuantiles):
+    """
+    Cuantiles (interpolación lineal, como np.quantile) a partir de los resúmenes
+    de varias particiones. Cada punto se coloca en el rango central de su tramo;
+    si todos los resúmenes son exactos, el resultado es el de np.quantile.
+    El error de rango es como mucho medio tramo por partición.
+    """
+    valores = np.concatenate([v for v, _ in resumenes])
+    pesos = np.concatenate([p for _, p in resumenes])
+    orden = np.argsort(valores, kind="stable")
+    valores, pesos = valores[orden], pesos[orden]
+    rangos = np.cumsum(pesos) - (pesos + 1) / 2
+    rangos = np.r_[0, rangos, n - 1]
+    valores = np.r_[minimo, valores, maximo]
+    return {q: float(np.interp(q * (n - 1), rangos, valores)) for q in cuantiles}
+
+
+def _partial_aggregates(valores, grupos, inicio, fin, cuantiles):
+    """
+    Agregados parciales de las filas [inicio, fin) (ordenadas por grupo).
+
+    Returns:
+        list: [(grupo, n, minimo, maximo, expansión de la suma, quantile_sketch o None)]
+    """
+    v = valores[inicio:fin]
+    g = grupos[inicio:fin]
+    if len(g) == 0:
+        return []
+
+    cortes = np.flatnonzero(np.diff(g)) + 1
+    parciales = []
+    for a, b in zip(np.r_[0, cortes], np.r_[cortes, len(g)]):
+        datos = v[a:b].ravel()
+        datos = datos[~np.isnan(datos)]
+        if len(datos) == 0:
+            continue
+        parciales.append((
+            int(g[a]),
+            len(datos),
+            float(datos.min()),
+            float(datos.max()),
+            exact_sum(datos),
+            quantile_sketch(datos) if cuantiles else None,
+        ))
+    return parciales
+
+
+def _attach(nombre_valores, forma_valores, nombre_grupos, n_grupos):
+    # Inicializador de cada proceso: vista sin copia sobre la memoria compartida
+    shm_v = shared_memory.SharedMemory(name=nombre_valores)
+    shm_g = shared_memory.SharedMemory(name=nombre_grupos)
+    _shared["shm"] = (shm_v, shm_g)
+    _shared["valores"] = np.ndarray(forma_valores, dtype=np.float64, buffer=shm_v.buf)
+    _shared["grupos"] = np.ndarray((n_grupos,), dtype=np.int64, buffer=shm_g.buf)
+
+
+def _worker(tramos, cuantiles):
+    parciales = []
+    for inicio, fin in tramos:
+        parciales.extend(_partial_aggregates(_shared["valores"], _shared["grupos"], inicio, fin, cuantiles))
+    return parciales
+
+
+def _merge(parciales, cuantiles):
+    """Fusiona los parciales de todos los trabajadores por grupo."""
+    fusion = {}
+    for grupo, n, minimo, maximo, suma, resumen in parciales:
+        if grupo not in fusion:
+            fusion[grupo] = [n, minimo, maximo, list(suma), [resumen]]
+            continue
+        acc = fusion[grupo]
+        acc[0] += n
+        acc[1] = min(acc[1], minimo)
+        acc[2] = max(acc[2], maximo)
+        acc[3].extend(suma)
+        acc[4].append(resumen)
+
+    filas = {}
+    for grupo, (n, minimo, maximo, suma, resumenes) in fusion.items():
+        total = math.fsum(suma)
+        fila = {"n_valores": n, "suma": total, "media": total / n, "maximo": maximo, "minimo": minimo}
+        if cuantiles:
+            for q, valor in merge_quantiles(resumenes, n, minimo, maximo, cuantiles).items():
+                fila[f"q{q:g}"] = valor
+        filas[grupo] = fila
+    return filas
+
+
+def aggregate(frame, by=("estacion", "magnitud"), columnas=HORAS, workers=None,
+              particion="estacion", cuantiles=()):
+    """
+    Agrega los valores horarios por grupo repartiendo el trabajo entre varios procesos.
+
+    Las filas se ordenan por partición (estación o estación × mes) y grupo, y los
+    valores se copian una sola vez a memoria compartida: cada proceso lee su tramo
+    sin copias y devuelve conteo, mínimo, máximo, suma exacta y (si se piden
+    cuantiles) un resumen de tamaño fijo (quantile_sketch), así que lo que vuelve
+    al proceso padre no crece con los datos. Las particiones no dependen de
+    workers: el resultado es exactamente el mismo que con workers=1. Los cuantiles
+    son exactos mientras cada grupo tenga como mucho SKETCH_SIZE valores por
+    partición; si no, son una aproximación (ver merge_quantiles).
+
+    Args:
+        frame (DataFrame): Resultado de measurement_frame
+        by (tuple): Columnas de agrupación (ej: ("estacion", "magnitud", "mes"))
+        columnas (list): Columnas horarias a agregar (ej: ["H01"] o HORAS)
+        workers (int, optional): Procesos; None = os.cpu_count(), 1 = sin procesos
+        particion (str): "estacion" o "estacion_mes"
+        cuantiles (tuple): Cuantiles a calcular (ej: (0.5, 0.95))
+
+    Returns:
+        DataFrame: columnas de by + n_valores, suma, media, maximo, minimo[, q0.5, ...]
+                   ordenado por las columnas de by
+    """
+    workers = workers or os.cpu_count() or 1
+    by = list(by)
+
+    df = frame
+    if "mes" in by or particion == "estacion_mes":
+        df = df.assign(mes=df["fecha"].dt.strftime("%Y-%m"))
+
+    claves_particion = ["estacion"] if particion == "estacion" else ["estacion", "mes"]
+    codigo_particion = df.groupby(claves_particion, sort=True).ngroup().to_numpy()
+    agrupado = df.groupby(by, sort=True)
+    codigo_grupo = agrupado.ngroup().to_numpy()
+    claves = agrupado.size().index.to_frame(index=False)  # fila i = grupo con código i
+
+    orden = np.lexsort((codigo_grupo, codigo_particion))
+    valores = np.ascontiguousarray(df[list(columnas)].to_numpy(dtype=np.float64)[orden])
+    grupos = np.ascontiguousarray(codigo_grupo[orden].astype(np.int64))
+    particiones = codigo_particion[orden]
+
+    cortes = np.flatnonzero(np.diff(particiones)) + 1
+    tramos = list(zip(np.r_[0, cortes].tolist(), np.r_[cortes, len(particiones)].tolist()))
+
+    if workers == 1 or len(tramos) <= 1:
+        parciales = []
+        for inicio, fin in tramos:
+            parciales.extend(_partial_aggregates(valores, grupos, inicio, fin, cuantiles))
+    else:
+        parciales = _run_shared(valores, grupos, tramos, workers, cuantiles)
+
+    filas = _merge(parciales, cuantiles)
+    resultado = pd.DataFrame.from_dict(filas, orient="index").sort_index()
+    return claves.iloc[resultado.index].reset_index(drop=True).join(resultado.reset_index(drop=True))
+
+
+def _run_shared(valores, grupos, tramos, workers, cuantiles):
+    shm_v = shared_memory.SharedMemory(create=True, size=max(valores.nbytes, 1))
+    shm_g = shared_memory.SharedMemory(create=True, size=max(grupos.nbytes, 1))
+    try:
+        np.ndarray(valores.shape, dtype=np.float64, buffer=shm_v.buf)[:] = valores
+        np.ndarray(grupos.shape, dtype=np.int64, buffer=shm_g.buf)[:] = grupos
+
+        # Varios lotes por proceso para repartir bien estaciones de distinto tamaño
+        lotes = [lote for lote in np.array_split(np.arange(len(tramos)), workers * 4) if len(lote)]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(shm_v.name, valores.shape, shm_g.name, len(grupos)),
+        ) as pool:
+            futuros = [pool.submit(_worker, [tramos[i] for i in lote], cuantiles) for lote in lotes]
+            parciales = []
+            for futuro in futuros:
+                parciales.extend(futuro.result())
+        return parciales
+    finally:
+        shm_v.close()
+        shm_v.unlink()
+        shm_g.close()
+        shm_g.unlink()
@@ -0,0 +1,227 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from datetime import datetime, timezone
+
+# Modo perfil: BESAFE_PROFILE=1 perfila todas las ejecuciones de la app;
+# BESAFE_PROFILE=url solo las que llevan ?perfil=1 en la URL. Sin la variable,
+# el parámetro de la URL se ignora (cualquier visitante podría activarlo)
+PROFILE_ENV = "BESAFE_PROFILE"
+PROFILE_PATH = os.environ.get("BESAFE_PROFILE_FILE", "data/perfil-app.jsonl")
+
+TOP_ASIGNACIONES = 10  # líneas de código que más memoria han reservado en la ejecución
+# Profundidad de pila guardada por tracemalloc en cada reserva. Con 1 cada reserva se
+# atribuye a la línea que la hizo (a menudo dentro de rdflib o pandas); con más, a la
+# línea más interna del proyecto (src/ o streamlit_app/), pero el trazado es más lento
+FRAMES = int(os.environ.get("BESAFE_PROFILE_FRAMES", "1"))
+
+_PROYECTO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Perfilador activo en la ejecución actual (cada sesión de Streamlit corre en su hilo)
+_actual = contextvars.ContextVar("perfil", default=None)
+
+# Perfiles en curso en todo el proceso: tracemalloc se para cuando no queda ninguno
+# (débil: un perfil de una ejecución que falló y nadie referencia deja de contar)
+_activos = weakref.WeakSet()
+_lock = threading.Lock()
+_trazado_propio = False  # tracemalloc lo arrancó este módulo (no hay que respetar otra traza)
+
+
+def profiling_enabled(query_params=None):
+    """True si hay que perfilar la ejecución según BESAFE_PROFILE y el parámetro ?perfil= de la URL."""
+    modo = os.environ.get(PROFILE_ENV, "").lower()
+    if modo in ("1", "true", "si", "sí"):
+        return True
+    if modo == "url":
+        return query_params is not None and query_params.get("perfil") in ("1", "true")
+    return False
+
+
+def current_profiler():
+    return _actual.get()
+
+
+def start_profiling(query_params=None):
+    """
+    Arranca el perfil de la ejecución si el modo perfil está activado.
+    Descarta el de una ejecución anterior que no llegara a terminar (ej: st.rerun).
+
+    Returns:
+        RerunProfiler | None
+    """
+    anterior = _actual.get()
+    if anterior is not None:
+        anterior.discard()
+    _actual.set(None)
+    if not profiling_enabled(query_params):
+        return None
+    return RerunProfiler().start()
+
+
+def _rss_mb():
+    # Memoria residente actual (Linux); si no, el pico del proceso
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _start_tracing(profiler):
+    global _trazado_propio
+    with _lock:
+        _activos.add(profiler)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(FRAMES)
+            _trazado_propio = True
+
+
+def _stop_tracing(profiler):
+    # Se para la traza al terminar el último perfil en curso, salvo que la
+    # arrancara otro código (ej: python -X tracemalloc)
+    global _trazado_propio
+    with _lock:
+        _activos.discard(profiler)
+        if not _activos and _trazado_propio:
+            tracemalloc.stop()
+            _trazado_propio = False
+
+
+class RerunProfiler:
+    """
+    Perfil de una ejecución (rerun) de la app: tiempo total, memoria residente,
+    mayores reservas de memoria según tracemalloc y tiempo de cada llamada a las
+    consultas de internal.py (las registra cached_query mientras está activo).
+
+    tracemalloc es global al proceso: con varias sesiones a la vez, las reservas
+    de una ejecución incluyen las de las otras. Trazar memoria también ralentiza
+    la app, por eso solo se activa en modo perfil y se para en cuanto no queda
+    ninguna ejecución perfilándose.
+    """
+
+    def __init__(self, salida=PROFILE_PATH, top=TOP_ASIGNACIONES):
+        self.salida = salida
+        self.top = top
+        self.llamadas = []
+        self._token = None
+
+    def start(self):
+        _start_tracing(self)
+        tracemalloc.reset_peak()
+        self._inicio = datetime.now(timezone.utc)
+        self._rss_inicio = _rss_mb()
+        self._memoria = tracemalloc.take_snapshot()
+        self._t0 = time.perf_counter()
+        self._token = _actual.set(self)
+        return self
+
+    def record_call(self, funcion, params, segundos):
+        self.llamadas.append({"funcion": funcion, "params": params, "ms": round(segundos * 1000, 2)})
+
+    def stop(self, pagina):
+        """
+        Termina el perfil, lo añade al fichero (JSON Lines) y lo devuelve.
+
+        Returns:
+            dict: {"pagina", "inicio", "wall_ms", "rss_mb", "rss_delta_mb", "traza_actual_kb",
+                   "traza_pico_kb", "asignaciones": [...], "llamadas": [...]}
+        """
+        wall = time.perf_counter() - self._t0
+        if self._token is not None:
+            _actual.reset(self._token)
+            self._token = None
+        actual, pico = tracemalloc.get_traced_memory()
+        diferencias = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        )).compare_to(self._memoria, "traceback" if tracemalloc.get_traceback_limit() > 1 else "lineno")
+        rss = _rss_mb()
+        _stop_tracing(self)
+
+        registro = {
+            "pagina": pagina,
+            "inicio": self._inicio.isoformat(),
+            "wall_ms": round(wall * 1000, 2),
+            "rss_mb": round(rss, 1),
+            "rss_delta_mb": round(rss - self._rss_inicio, 1),
+            "traza_actual_kb": round(actual / 1024, 1),
+            "traza_pico_kb": round(pico / 1024, 1),
+            "asignaciones": _by_project_line(diferencias, self.top),
+            "llamadas": self.llamadas,
+        }
+        self._dump(registro)
+        return registro
+
+    def discard(self):
+        """Abandona el perfil sin guardarlo (la ejecución no llegó a terminar)."""
+        self._token = None
+        _stop_tracing(self)
+
+    def _dump(self, registro):
+        if not self.salida:
+            return
+        os.makedirs(os.path.dirname(self.salida) or ".", exist_ok=True)
+        with open(self.salida, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def _by_project_line(diferencias, top):
+    # Agrupa las diferencias por la línea del proyecto desde la que se hizo la reserva
+    # (ej: la llamada de Home.py o internal.py, no la línea interna de rdflib)
+    lineas = {}
+    for d in diferencias:
+        frame = next((f for f in reversed(d.traceback) if f.filename.startswith(_PROYECTO)), d.traceback[-1])
+        if frame.filename.startswith(_PROYECTO):
+            fichero = os.path.relpath(frame.filename, _PROYECTO)
+        else:
+            fichero = frame.filename.split("site-packages" + os.sep)[-1]  # ej: rdflib/term.py
+        clave = f"{fichero}:{frame.lineno}"
+        kb, bloques = lineas.get(clave, (0.0, 0))
+        lineas[clave] = (kb + d.size_diff / 1024, bloques + d.count_diff)
+    mayores = sorted(lineas.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+    return [{"linea": clave, "kb": round(kb, 1), "bloques": bloques} for clave, (kb, bloques) in mayores if kb > 0]
+
+
+def summarize_profiles(path=PROFILE_PATH):
+    """
+    Resumen por página de los perfiles guardados, para ver qué vista es la lenta
+    o la que hace crecer la memoria.
+
+    Returns:
+        list: [{"pagina", "ejecuciones", "wall_media_ms", "wall_max_ms", "rss_max_mb",
+                "rss_crecimiento_mb", "consulta_mas_lenta", "consulta_max_ms"}, ...]
+    """
+    if not os.path.exists(path):
+        return []
+    paginas = {}
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                registro = json.loads(linea)
+                paginas.setdefault(registro["pagina"], []).append(registro)
+
+    resumen = []
+    for pagina, registros in paginas.items():
+        llamadas = [c for r in registros for c in r["llamadas"]]
+        lenta = max(llamadas, key=lambda c: c["ms"], default=None)
+        walls = [r["wall_ms"] for r in registros]
+        resumen.append({
+            "pagina": pagina,
+            "ejecuciones": len(registros),
+            "wall_media_ms": round(sum(walls) / len(walls), 2),
+            "wall_max_ms": max(walls),
+            "rss_max_mb": max(r["rss_mb"] for r in registros),
+            "rss_crecimiento_mb": round(sum(r["rss_delta_mb"] for r in registros), 1),
+            "consulta_mas_lenta": lenta["funcion"] if lenta else None,
+            "consulta_max_ms": lenta["ms"] if lenta else None,
+        })
+    return sorted(resumen, key=lambda r: r["wall_max_ms"], reverse=True)
@@ -0,0 +1,98 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from utils.alerts import classify_alert
+
+# Criterios de ordenación sobre la vista diaria
+CRITERIOS = ("ultimo", "max_diario", "media")
+
+_MIN_I8 = np.iinfo(np.int64).min
+
+
+def top_k(valores, k):
+    """
+    Índices de los k mayores valores (sin NaN), de mayor a menor.
+    Usa un montículo de tamaño k: O(n log k), sin ordenar todo el array.
+    A igualdad de valor queda primero el de menor índice.
+    """
+    valores = np.asarray(valores, dtype=float)
+    candidatos = np.flatnonzero(~np.isnan(valores))
+    return heapq.nlargest(k, candidatos.tolist(), key=valores.__getitem__)
+
+
+def rank_stations(diario, magnitud, criterio="ultimo", k=5, fecha_inicio=None, fecha_fin=None):
+    """
+    Top-k de estaciones de una magnitud sobre la vista diaria (utils/views.py).
+
+    Cada estación se reduce a un valor con operaciones vectorizadas por grupo
+    (sin ordenar ni agrupar con pandas) y las k mejores se eligen con top_k.
+
+    Args:
+        diario (DataFrame): Vista diaria (load_views()["diario"])
+        magnitud (str): Código de magnitud (ej: "8")
+        criterio (str): "ultimo" (último valor horario del último día con datos),
+                        "max_diario" (máximo horario de la ventana) o
+                        "media" (media de todas las horas de la ventana)
+        k (int): Número de estaciones
+        fecha_inicio, fecha_fin (Timestamp, optional): Ventana de días (inclusiva, UTC)
+
+    Returns:
+        list: [{"posicion", "estacion", "magnitud", "valor", "fecha", "hora", "alerta"}, ...]
+              fecha y hora indican de dónde sale el valor (None en "media");
+              alerta es el semáforo del valor horario (None en "media")
+    """
+    if criterio not in CRITERIOS:
+        raise ValueError(f"criterio debe ser uno de {CRITERIOS}")
+
+    fechas = diario["fecha"].to_numpy(dtype="datetime64[ns]").view("i8")
+    mask = (diario["magnitud"].to_numpy() == magnitud) & (diario["n_horas"].to_numpy() > 0)
+    if fecha_inicio is not None:
+        mask &= fechas >= fecha_inicio.value
+    if fecha_fin is not None:
+        mask &= fechas <= fecha_fin.value
+    filas = np.flatnonzero(mask)
+
+    # pd.factorize numera las estaciones por hash, sin ordenar
+    codigos, estaciones = pd.factorize(diario["estacion"].to_numpy()[filas])
+    fechas = fechas[filas]
+    n = len(estaciones)
+    fecha_valor = np.full(n, _MIN_I8)
+    hora = None
+
+    if criterio == "ultimo":
+        np.maximum.at(fecha_valor, codigos, fechas)
+        # Una fila por estación y día: la del último día de cada estación
+        sel = fechas == fecha_valor[codigos]
+        puntuacion = np.full(n, np.nan)
+        puntuacion[codigos[sel]] = diario["ultimo"].to_numpy(dtype=float)[filas[sel]]
+        hora = np.zeros(n, dtype=np.int64)
+        hora[codigos[sel]] = diario["hora_ultimo"].to_numpy()[filas[sel]]
+    elif criterio == "max_diario":
+        maximos = diario["maximo"].to_numpy(dtype=float)[filas]
+        puntuacion = np.full(n, -np.inf)
+        np.maximum.at(puntuacion, codigos, maximos)
+        # Último día en que se alcanzó el máximo de cada estación
+        sel = maximos == puntuacion[codigos]
+        np.maximum.at(fecha_valor, codigos[sel], fechas[sel])
+    else:
+        suma = np.zeros(n)
+        horas = np.zeros(n)
+        np.add.at(suma, codigos, diario["suma"].to_numpy(dtype=float)[filas])
+        np.add.at(horas, codigos, diario["n_horas"].to_numpy(dtype=float)[filas])
+        puntuacion = suma / horas
+
+    resultado = []
+    for posicion, i in enumerate(top_k(puntuacion, k), start=1):
+        valor = float(puntuacion[i])
+        resultado.append({
+            "posicion": posicion,
+            "estacion": estaciones[i],
+            "magnitud": magnitud,
+            "valor": round(valor, 2) if criterio == "media" else valor,
+            "fecha": pd.Timestamp(fecha_valor[i], tz="UTC").isoformat() if criterio != "media" else None,
+            "hora": f"H{int(hora[i]):02d}" if hora is not None else None,
+            "alerta": classify_alert(magnitud, valor) if criterio != "media" else None,
+        })
+    return resultado
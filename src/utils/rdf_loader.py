@@ -1,6 +1,367 @@
-from rdflib import Graph
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from rdflib import RDF, Dataset, Graph, Namespace
+from rdflib.graph import ReadOnlyGraphAggregate
+
+DATASET_PATH = "data/alertas-with-links.ttl"
+
+VOCAB = Namespace("http://example.org/vocab#")
+
+# Particiones (grafos con nombre)
+PARTICION = Namespace("urn:besafe:particion:")
+COMUN = PARTICION["comun"]  # recursos sin clase (ej: enlaces de estaciones)
+
+# Propiedades que sitúan un recurso en el tiempo (mediciones y episodios)
+_FECHAS = (VOCAB.fecha, VOCAB.inicio)
+
+
+class _TripleSink(Graph):
+    # Destino del parser que solo acumula las tripletas, sin indexarlas:
+    # se indexan una única vez, ya repartidas en su partición
+    def __init__(self):
+        super().__init__()
+        self.tripletas = []
+
+    def add(self, triple):
+        self.tripletas.append(triple)
+        return self
+
+
+class PartitionedDataset(Dataset):
+    """
+    Dataset con default_union y un grafo con nombre por partición. Los metadatos de
+    cada partición se guardan aquí, en Python, y no en el grafo por defecto: así
+    no aparecen en la unión que ven las consultas.
+    """
+
+    def __init__(self):
+        super().__init__(default_union=True)
+        self.particiones = {}  # id -> {"clase", "desde", "hasta", "triples"}
+
+
+def _partition_key(tripletas):
+    # (clase, fecha) de un recurso con rdf:type (fecha None si no tiene), o None si no tiene clase
+    clase = fecha = None
+    for _, p, o in tripletas:
+        if p == RDF.type:
+            clase = o
+        elif p in _FECHAS and fecha is None and isinstance(o.toPython(), datetime):
+            fecha = o.toPython()
+    return (clase, fecha) if clase is not None else None
+
+
+def parse_graph(path=None):
+    """
+    Parsea el TTL en un Dataset con un grafo con nombre por clase y mes
+    (ej: urn:besafe:particion:MedicionAire/2025-05). Los recursos de una clase sin
+    fecha van a su partición "sin-fecha" (ej: MedicionAire/sin-fecha) y los que no
+    tienen clase, a COMUN. Los metadatos de cada partición (clase, rango de fechas,
+    nº de tripletas) van en PartitionedDataset.particiones.
+    Con default_union, las consultas sobre el Dataset ven todas las particiones
+    juntas, como antes; partition_view() permite consultar solo las necesarias.
+    """
+    sink = _TripleSink()
+    sink.parse(path or DATASET_PATH, format="turtle")
+
+    por_sujeto = {}
+    for triple in sink.tripletas:
+        por_sujeto.setdefault(triple[0], []).append(triple)
+
+    ds = PartitionedDataset()
+    grafos = {}       # id de la partición -> grafo
+    particiones = {}  # id -> [clase, desde, hasta]
+    destino = []      # (grafo, tripletas del sujeto)
+    for tripletas in por_sujeto.values():
+        clave = _partition_key(tripletas)
+        if clave is None:
+            gid = COMUN
+        elif clave[1] is None:
+            clase = clave[0]
+            gid = PARTICION[f"{clase.split('#')[-1]}/sin-fecha"]
+            particiones.setdefault(gid, [clase, None, None])
+        else:
+            clase, fecha = clave
+            gid = PARTICION[f"{clase.split('#')[-1]}/{fecha:%Y-%m}"]
+            if gid in particiones:
+                meta = particiones[gid]
+                meta[1], meta[2] = min(meta[1], fecha), max(meta[2], fecha)
+            else:
+                particiones[gid] = [clase, fecha, fecha]
+        if gid not in grafos:
+            grafos[gid] = ds.graph(gid)
+        destino.append((grafos[gid], tripletas))
+
+    ds.addN((s, p, o, grafo) for grafo, tripletas in destino for s, p, o in tripletas)
+
+    ds.particiones = {
+        gid: {"clase": clase.split("#")[-1], "desde": desde, "hasta": hasta, "triples": len(grafos[gid])}
+        for gid, (clase, desde, hasta) in particiones.items()
+    }
+    return ds
+
+
+def graph_partitions(g):
+    """
+    Metadatos de las particiones de un Dataset cargado con load_graph.
+
+    Returns:
+        list: [{"id", "clase", "desde", "hasta", "triples"}, ...] (clase sin espacio
+              de nombres, ej: "MedicionAire"; desde/hasta como datetime, None en
+              las particiones sin fecha)
+    """
+    if not isinstance(g, PartitionedDataset):
+        return []
+    return [{"id": gid, **meta} for gid, meta in g.particiones.items()]
+
+
+def partition_view(g, clase, desde=None, hasta=None):
+    """
+    Grafo de solo lectura con las particiones de una clase cuyo rango de fechas
+    solapa [desde, hasta]. La partición sin fecha de la clase se incluye siempre (no
+    se puede descartar por fecha). Las consultas sobre él no recorren el resto del
+    dataset, tampoco COMUN. Si g no es un Dataset particionado, se devuelve tal cual.
+
+    Args:
+        g (Dataset): Resultado de load_graph
+        clase (str): "MedicionAire", "MedicionMeteorologica", "EpisodioOzono"...
+        desde, hasta (datetime, optional): Ventana de fechas (con zona horaria)
+    """
+    if not isinstance(g, PartitionedDataset):
+        return g
+    grafos = [
+        g.graph(p["id"])
+        for p in graph_partitions(g)
+        if p["clase"] == clase
+        and (
+            p["desde"] is None
+            or ((desde is None or p["hasta"] >= desde) and (hasta is None or p["desde"] <= hasta))
+        )
+    ]
+    if len(grafos) == 1:
+        return grafos[0]
+    return ReadOnlyGraphAggregate(grafos) if grafos else Graph()
+
+
+def dataset_version(path=None):
+    """Versión del fichero TTL en disco (cambia cuando se reescribe). Solo hace un stat."""
+    st = os.stat(path or DATASET_PATH)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+# Índices derivados del grafo que el vigilante precalcula antes de publicar una versión:
+# nombre -> función(grafo). Cada módulo registra los suyos con register_index()
+_INDICES = {}
+_CON_VERSION = set()  # índices cuya función recibe también la versión: función(grafo, version, dataset_path)
+
+# Versión cuyo índice se está construyendo en este hilo: un índice que depende de
+# otro (ej: las anomalías de las mediciones) lo pide con graph_index() y obtiene
+# el de la misma versión, aunque todavía no esté publicada
+_construyendo = threading.local()
+
+
+def register_index(nombre, construir, con_version=False):
+    """
+    Registra un índice derivado del grafo (ej: "episodios" -> build_episode_index).
+    Con con_version=True, construir recibe también la versión que se está
+    construyendo (la publicada todavía puede ser la anterior) y el TTL del que
+    procede: construir(grafo, version, dataset_path).
+    """
+    _INDICES[nombre] = construir
+    if con_version:
+        _CON_VERSION.add(nombre)
+
+
+class GraphSnapshot:
+    """
+    Una versión del dataset: el grafo y los índices calculados a partir de él.
+    No se modifica una vez publicada; los índices se calculan como mucho una vez.
+    """
+
+    def __init__(self, version, graph, path=None):
+        self.version = version
+        self.graph = graph
+        self.path = path or DATASET_PATH
+        self._indices = {}
+        self._lock = threading.RLock()
+
+    def index(self, nombre, construir=None):
+        """Índice de esta versión; se construye la primera vez que se pide."""
+        indice = self._indices.get(nombre)
+        if indice is None:
+            with self._lock:
+                indice = self._indices.get(nombre)
+                if indice is None:
+                    anterior = getattr(_construyendo, "snapshot", None)
+                    _construyendo.snapshot = self
+                    try:
+                        if construir is None and nombre in _CON_VERSION:
+                            indice = _INDICES[nombre](self.graph, self.version, self.path)
+                        else:
+                            indice = (construir or _INDICES[nombre])(self.graph)
+                        self._indices[nombre] = indice
+                    finally:
+                        _construyendo.snapshot = anterior
+        return indice
+
+
+class GraphStore:
+    """
+    Acceso al dataset cargado en memoria con recarga en caliente (read-copy-update).
+
+    Los lectores solo leen la referencia a la versión actual (GraphSnapshot): nunca
+    esperan ni ven una versión a medias. La nueva versión (grafo e índices) se
+    construye aparte y se publica cambiando esa referencia de una vez; las consultas
+    en curso terminan con la versión que tenían y las siguientes ven la nueva.
+
+    - Sin vigilante (CLI, scripts): cada acceso comprueba el fichero con un stat y,
+      si ha cambiado, recarga en ese momento (un solo hilo parsea; el resto espera).
+    - Con vigilante (start_watcher, la app web): un hilo en segundo plano parsea
+      y precalcula los índices registrados; los lectores no esperan nunca.
+    """
+
+    def __init__(self, path=None):
+        self.path = path  # None = DATASET_PATH
+        self._snapshot = None
+        self._carga = threading.Lock()
+        self._local = threading.local()
+        self._watcher = None
+        self._parar = None
+        self._metrics = {"recargas": 0, "errores": 0, "ultimo_error": None}
+
+    @property
+    def watching(self):
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def current(self):
+        """Versión actual del dataset (la fijada con pin() si se está dentro de uno)."""
+        fijada = getattr(self._local, "snapshot", None)
+        if fijada is not None:
+            return fijada
+        snapshot = self._snapshot
+        if snapshot is None or (not self.watching and snapshot.version != dataset_version(self.path)):
+            snapshot = self._reload()
+        return snapshot
+
+    def version(self):
+        """Versión servida: la de la versión publicada si hay vigilante, si no la del fichero."""
+        fijada = getattr(self._local, "snapshot", None)
+        if fijada is not None:
+            return fijada.version
+        snapshot = self._snapshot
+        if self.watching and snapshot is not None:
+            return snapshot.version
+        return dataset_version(self.path)
+
+    def is_latest(self, snapshot):
+        """True si snapshot sigue siendo la versión publicada."""
+        return snapshot is self._snapshot
+
+    @contextmanager
+    def pin(self):
+        """
+        Sección de lectura: dentro, load_graph(), graph_version() y los índices
+        ven siempre la misma versión aunque el vigilante publique otra o (sin
+        vigilante) el fichero cambie. Las secciones anidadas usan la ya fijada.
+        """
+        fijada = getattr(self._local, "snapshot", None)
+        if fijada is not None:
+            yield fijada
+            return
+        self._local.snapshot = snapshot = self.current()
+        try:
+            yield snapshot
+        finally:
+            self._local.snapshot = None
+
+    def _reload(self, precalcular=False):
+        with self._carga:
+            version = dataset_version(self.path)
+            actual = self._snapshot
+            if actual is not None and actual.version == version:
+                return actual  # otro hilo ya la cargó mientras se esperaba
+            nuevo = self._build(version, precalcular)
+            self._snapshot = nuevo  # publicación: un único cambio de referencia
+            self._metrics["recargas"] += 1
+            return nuevo
+
+    def _build(self, version, precalcular):
+        # Si el fichero cambia durante el parseo, se vuelve a parsear la versión nueva
+        while True:
+            graph = parse_graph(self.path)
+            despues = dataset_version(self.path)
+            if despues == version:
+                break
+            version = despues
+        snapshot = GraphSnapshot(version, graph, self.path)
+        if precalcular:
+            for nombre in list(_INDICES):
+                snapshot.index(nombre)
+        return snapshot
+
+    def start_watcher(self, intervalo=2.0):
+        """Arranca (una sola vez) el hilo que recarga el dataset cuando cambia el fichero."""
+        if self.watching:
+            return
+        self._parar = threading.Event()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(intervalo, self._parar), name="besafe-recarga", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._parar.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, intervalo, parar):
+        while not parar.is_set():
+            try:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.version != dataset_version(self.path):
+                    self._reload(precalcular=True)
+            except Exception as e:
+                # TTL a medio escribir o con errores: se sigue sirviendo la versión
+                # anterior y se reintenta en la siguiente comprobación
+                self._metrics["errores"] += 1
+                self._metrics["ultimo_error"] = f"{type(e).__name__}: {e}"
+            parar.wait(intervalo)
+
+    def stats(self):
+        """Versión servida, recargas hechas y último error del vigilante."""
+        snapshot = self._snapshot
+        return {
+            **self._metrics,
+            "version": snapshot.version if snapshot is not None else None,
+            "vigilando": self.watching,
+        }
+
+
+# Dataset compartido por todo el proceso
+GRAPH_STORE = GraphStore()
+
 
 def load_graph():
-    g = Graph()
-    g.parse("data/alertas-with-links.ttl", format="turtle")
-    return g
+    """
+    Dataset particionado (ver parse_graph) de la versión actual. Se parsea una
+    sola vez por versión del TTL y se comparte: tratarlo como de solo lectura.
+    """
+    return GRAPH_STORE.current().graph
+
+
+def graph_index(nombre, construir=None):
+    """Índice derivado de la versión actual del grafo (ver register_index)."""
+    snapshot = getattr(_construyendo, "snapshot", None) or GRAPH_STORE.current()
+    return snapshot.index(nombre, construir)
+
+
+def graph_version():
+    """
+    Identificador de la versión del dataset servida (cambia cuando se reescribe
+    el TTL y, con el vigilante activo, cuando se publica la nueva versión).
+    Sin vigilante solo hace un stat del fichero, así que se puede llamar en cada consulta.
+    """
+    return GRAPH_STORE.version()
@@ -0,0 +1,77 @@
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+
+from utils.measurements import HORAS
+
+_INDICE_HORA = {h: i for i, h in enumerate(HORAS)}
+
+
+def _intern(valor):
+    # Estaciones, magnitudes, fechas... se repiten en miles de filas: una sola copia de cada
+    return sys.intern(valor) if valor is not None else None
+
+
+class _Registro(Mapping):
+    """
+    Base de los registros compactos: atributos en __slots__ (sin __dict__ por fila)
+    pero con acceso de solo lectura tipo diccionario (r["estacion"], r.get(...),
+    dict(r), pd.DataFrame(lista)), como los diccionarios que se devolvían antes.
+    """
+
+    __slots__ = ()
+    _CAMPOS = ()
+
+    def __getitem__(self, key):
+        if key in self._CAMPOS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._CAMPOS)
+
+    def __len__(self):
+        return len(self._CAMPOS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Medicion(_Registro):
+    """
+    Medición de calidad del aire con sus 24 valores horarios.
+    Las horas se guardan en un array de doubles (NaN = sin dato) en lugar de
+    24 floats sueltos; r["H05"] sigue devolviendo float o None.
+    """
+
+    __slots__ = ("estacion", "fecha", "magnitud", "puntoMuestreo", "_horas")
+    _CAMPOS = ("estacion", "fecha", "magnitud", "puntoMuestreo") + tuple(HORAS)
+
+    def __init__(self, estacion, fecha, magnitud, puntoMuestreo, horas):
+        self.estacion = _intern(estacion)
+        self.fecha = _intern(fecha)
+        self.magnitud = _intern(magnitud)
+        self.puntoMuestreo = _intern(puntoMuestreo)
+        self._horas = array("d", (math.nan if v is None else v for v in horas))
+
+    def __getitem__(self, key):
+        i = _INDICE_HORA.get(key)
+        if i is None:
+            return super().__getitem__(key)
+        valor = self._horas[i]
+        return None if math.isnan(valor) else valor
+
+
+class EpisodioOzono(_Registro):
+    """Episodio de activación del protocolo por ozono."""
+
+    __slots__ = ("episodio_uri", "fecha_inicio", "fecha_fin", "escenario", "medida_poblacion")
+    _CAMPOS = __slots__
+
+    def __init__(self, episodio_uri, fecha_inicio, fecha_fin, escenario, medida_poblacion):
+        self.episodio_uri = episodio_uri
+        self.fecha_inicio = _intern(fecha_inicio)
+        self.fecha_fin = _intern(fecha_fin)
+        self.escenario = _intern(escenario)
+        self.medida_poblacion = _intern(medida_poblacion)
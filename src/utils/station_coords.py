@@ -0,0 +1,55 @@
+import json
+import os
+
+from queries.links import ESTACION_LINKS
+
+# Caché local de coordenadas: {qid: {"label", "lat", "lon"}}
+COORDS_PATH = "data/estaciones-coords.json"
+
+
+def _qid(url):
+    # "https://www.wikidata.org/wiki/Q8841582" -> "Q8841582"
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def load_station_coordinates(path=COORDS_PATH):
+    """
+    Devuelve las coordenadas de las estaciones a partir de la caché local,
+    sin hacer ninguna llamada a Wikidata.
+
+    Returns:
+        dict: {estacion: {"qid", "label", "lat", "lon"}} solo para las estaciones
+              de ESTACION_LINKS cuyo QID está en la caché. Vacío si no hay caché.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding="utf-8") as f:
+        por_qid = json.load(f)
+
+    coords = {}
+    for estacion, url in ESTACION_LINKS.items():
+        qid = _qid(url)
+        if qid in por_qid:
+            coords[estacion] = {"qid": qid, **por_qid[qid]}
+    return coords
+
+
+def refresh_station_coordinates(path=COORDS_PATH):
+    """
+    Descarga de Wikidata las coordenadas de los QIDs de ESTACION_LINKS y
+    reescribe la caché local. Es la única función que sale a la red.
+
+    Returns:
+        int: Número de QIDs con coordenadas guardados
+    """
+    from queries.wikidata import fetch_station_coordinates
+
+    por_qid = fetch_station_coordinates(_qid(url) for url in ESTACION_LINKS.values())
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(por_qid, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+    return len(por_qid)
@@ -0,0 +1,64 @@
+from utils.alerts import alert_color, classify_alert
+from utils.anomalies import anomaly_flags, mask_anomalies
+from utils.measurements import measurement_frame, station_summary
+from utils.rdf_loader import graph_index, register_index
+
+
+def map_summary(excluir_anomalias=False):
+    """
+    station_summary de las mediciones de la versión actual del grafo (sin las horas
+    anómalas si excluir_anomalias). Es un índice de la versión: el vigilante de
+    recarga lo precalcula antes de publicarla, y las mediciones y sus marcas de
+    anomalías salen siempre de la misma versión.
+    """
+    nombre = "mapa/resumen_sin_anomalias" if excluir_anomalias else "mapa/resumen"
+    return graph_index(nombre)
+
+
+def _summary(excluir_anomalias):
+    df = measurement_frame()
+    if excluir_anomalias:
+        df = mask_anomalies(df, anomaly_flags())
+    return station_summary(df)
+
+
+def build_map_index(summary, coords):
+    """
+    Precalcula los puntos del mapa de estaciones para cada (magnitud, día).
+    Así, cambiar de contaminante o de fecha en la interfaz es solo una búsqueda
+    en un diccionario, sin volver a recorrer el grafo.
+
+    Args:
+        summary (DataFrame): Resultado de station_summary
+        coords (dict): Resultado de load_station_coordinates
+
+    Returns:
+        dict: {(magnitud, dia): [punto, ...]} donde cada punto es un dict listo
+              para pydeck (lat, lon, valores y colores del semáforo)
+    """
+    index = {}
+    for fila in summary.itertuples(index=False):
+        coord = coords.get(fila.estacion)
+        if coord is None or fila.hora_ultimo == 0:
+            continue
+
+        alerta_ultimo = classify_alert(fila.magnitud, fila.ultimo)
+        alerta_media = classify_alert(fila.magnitud, fila.media)
+        index.setdefault((fila.magnitud, fila.dia), []).append({
+            "estacion": fila.estacion,
+            "nombre": coord["label"],
+            "lat": coord["lat"],
+            "lon": coord["lon"],
+            "ultimo": round(float(fila.ultimo), 2),
+            "hora_ultimo": int(fila.hora_ultimo),
+            "media": round(float(fila.media), 2),
+            "alerta_ultimo": alerta_ultimo,
+            "alerta_media": alerta_media,
+            "color_ultimo": alert_color(alerta_ultimo),
+            "color_media": alert_color(alerta_media),
+        })
+    return index
+
+
+register_index("mapa/resumen", lambda grafo: _summary(False))
+register_index("mapa/resumen_sin_anomalias", lambda grafo: _summary(True))
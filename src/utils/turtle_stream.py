@@ -0,0 +1,312 @@
+import re
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph
+
+from utils.measurements import HORAS, measurement_frame
+from utils.rdf_loader import DATASET_PATH
+
+VOCAB = "http://example.org/vocab#"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+CLASES = ("MedicionAire", "MedicionMeteorologica")
+
+BLOQUE = 1 << 16  # caracteres leídos del fichero cada vez
+
+# Literal tal como aparece en el TTL: forma léxica (ya sin escapes), datatype e idioma
+Literal = namedtuple("Literal", ["lexico", "tipo", "idioma"], defaults=(None, None))
+
+# Subconjunto de Turtle que generan RML/rdflib: @prefix, IRIs, nombres con prefijo,
+# literales (con datatype o idioma), números, listas con ";" y ",". Sin [ ] ni ( ).
+_TOKEN = re.compile(r'''
+    (?P<ws>(?:\s+|\#[^\n]*)+)
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<lit3>"""(?:[^"\\]|\\.|"(?!""))*""")
+  | (?P<lit>"(?:[^"\\\n]|\\.)*")
+  | (?P<dt>\^\^)
+  | (?P<at>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<pname>(?:[A-Za-z_][\w-]*)?:(?:[\w%-]|\.(?=[\w%-]))*)
+  | (?P<kw>(?:a|true|false)\b)
+  | (?P<num>[+-]?(?:\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?))
+  | (?P<punct>[;,.])
+''', re.VERBOSE)
+
+_ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(texto):
+    if "\\" not in texto:
+        return texto
+    return _ESCAPE.sub(lambda m: _ESCAPES.get(m.group(1)) or chr(int(m.group(1)[1:], 16)), texto)
+
+
+_MARGEN = 3  # caracteres que el regex puede necesitar ver tras un token (ej: "1e+5")
+
+
+def _cortado(m, buf):
+    # El token puede seguir en el bloque siguiente: toca (casi) el final del bloque
+    # (ej: "1." + "5", "ex:a." + "b") o es el "" inicial de un """...""" sin cerrar
+    if m is None or m.end() + _MARGEN > len(buf):
+        return True
+    return m.lastgroup == "lit" and m.end() - m.start() == 2 and buf[m.end()] == '"'
+
+
+def _tokens(f):
+    # Tokens del fichero leyendo por bloques: solo se guarda el bloque en curso
+    buf, pos, fin = "", 0, False
+    while True:
+        m = _TOKEN.match(buf, pos)
+        # Un token que puede estar cortado al final del bloque: leer más
+        if not fin and _cortado(m, buf):
+            datos = f.read(BLOQUE)
+            if datos:
+                buf, pos = buf[pos:] + datos, 0
+            else:
+                fin = True
+            continue
+        if m is None or (m.group() == '""' and buf[m.end():m.end() + 1] == '"'):
+            if pos >= len(buf):
+                return
+            raise ValueError(f"Turtle no soportado cerca de: {buf[pos:pos + 60]!r}")
+        pos = m.end()
+        if m.lastgroup != "ws":
+            yield m.lastgroup, m.group()
+
+
+def _iri(tipo, valor, prefijos):
+    if tipo == "iri":
+        return valor[1:-1]
+    if tipo == "pname":
+        prefijo, _, local = valor.partition(":")
+        if prefijo == "_":
+            return valor  # nodo en blanco
+        try:
+            return prefijos[prefijo] + local
+        except KeyError:
+            raise ValueError(f"Prefijo no declarado: {prefijo!r}") from None
+    raise ValueError(f"Se esperaba un IRI y se encontró {valor!r}")
+
+
+def _object(tipo, valor, tokens, prefijos):
+    # Devuelve (objeto, siguiente token)
+    if tipo in ("lit", "lit3"):
+        lexico = _unescape(valor[3:-3] if tipo == "lit3" else valor[1:-1])
+        siguiente = next(tokens)
+        if siguiente[0] == "dt":
+            datatype = _iri(*next(tokens), prefijos)
+            return Literal(lexico, datatype), next(tokens)
+        if siguiente[0] == "at":
+            return Literal(lexico, idioma=siguiente[1][1:]), next(tokens)
+        return Literal(lexico), siguiente
+    if tipo == "num":
+        datatype = "double" if "e" in valor.lower() else "decimal" if "." in valor else "integer"
+        return Literal(valor, XSD + datatype), next(tokens)
+    if tipo == "kw" and valor != "a":
+        return Literal(valor, XSD + "boolean"), next(tokens)
+    return _iri(tipo, valor, prefijos), next(tokens)
+
+
+def iter_subjects(path=None):
+    """
+    Lee un TTL sujeto a sujeto sin construir un grafo de rdflib.
+
+    Pensado para la salida de RML/rdflib, donde cada sujeto aparece una sola vez
+    con todas sus propiedades (sujeto ; predicado objeto ; ... .). Solo hay en
+    memoria el bloque de texto en curso y las propiedades de un sujeto.
+
+    Yields:
+        tuple: (sujeto, [(predicado, objeto), ...]) con los IRIs como str y los
+               literales como Literal(lexico, tipo, idioma)
+    """
+    prefijos = {}
+    with open(path or DATASET_PATH, encoding="utf-8") as f:
+        tokens = _tokens(f)
+        for tipo, valor in tokens:
+            if tipo == "at" and valor in ("@prefix", "@base"):
+                if valor == "@prefix":
+                    nombre, iri = next(tokens)[1], next(tokens)[1]
+                    prefijos[nombre[:-1]] = iri[1:-1]
+                else:
+                    next(tokens)
+                next(tokens)  # "."
+                continue
+
+            sujeto = _iri(tipo, valor, prefijos)
+            pares = []
+            tipo, valor = next(tokens)
+            while valor != ".":
+                predicado = RDF_TYPE if (tipo, valor) == ("kw", "a") else _iri(tipo, valor, prefijos)
+                while True:
+                    objeto, (tipo, valor) = _object(*next(tokens), tokens, prefijos)
+                    pares.append((predicado, objeto))
+                    if valor != ",":
+                        break
+                if valor == ";":
+                    tipo, valor = next(tokens)  # puede ser "." (";" final)
+                elif valor != ".":
+                    raise ValueError(f"Se esperaba ';', ',' o '.' y se encontró {valor!r}")
+            yield sujeto, pares
+
+
+# Resolución con la que measurement_frame guarda las fechas (pd.to_datetime de datetime
+# de Python): microsegundos en pandas 3, nanosegundos en pandas 2
+_UNIDAD_FECHA = pd.to_datetime([datetime(2000, 1, 1, tzinfo=timezone.utc)], utc=True).unit
+
+
+def _nanoseconds(lexico):
+    # xsd:dateTime -> ns desde epoch en UTC (sin zona se toma como UTC, igual que pandas)
+    if lexico.endswith("Z"):
+        lexico = lexico[:-1] + "+00:00"  # fromisoformat no acepta "Z" hasta Python 3.11
+    fecha = datetime.fromisoformat(lexico)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    delta = fecha - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class _Columnas:
+    # Arrays tipados de una clase de medición que crecen duplicando su capacidad
+    def __init__(self, capacidad=1024):
+        self.n = 0
+        # Sin dato = NaN, como en measurement_frame
+        self.estacion = np.full(capacidad, np.nan, dtype=object)
+        self.magnitud = np.full(capacidad, np.nan, dtype=object)
+        self.punto = np.full(capacidad, np.nan, dtype=object)
+        self.fecha = np.full(capacidad, np.iinfo(np.int64).min, dtype=np.int64)  # NaT
+        self.horas = np.full((capacidad, len(HORAS)), np.nan)
+
+    def fila(self):
+        if self.n == len(self.fecha):
+            extra = len(self.fecha)
+            for nombre in ("estacion", "magnitud", "punto"):
+                setattr(self, nombre, np.concatenate([getattr(self, nombre), np.full(extra, np.nan, dtype=object)]))
+            self.fecha = np.concatenate([self.fecha, np.full(extra, np.iinfo(np.int64).min, dtype=np.int64)])
+            self.horas = np.concatenate([self.horas, np.full((extra, len(HORAS)), np.nan)])
+        self.n += 1
+        return self.n - 1
+
+    def frame(self):
+        n = self.n
+        df = pd.DataFrame({
+            "estacion": self.estacion[:n],
+            "magnitud": self.magnitud[:n],
+            "fecha": pd.to_datetime(self.fecha[:n], utc=True).as_unit(_UNIDAD_FECHA),
+            "puntoMuestreo": self.punto[:n],
+        }).infer_objects()  # una columna sin ningún dato queda como float, igual que en measurement_frame
+        df[HORAS] = self.horas[:n]
+        return df.sort_values(["fecha", "estacion", "magnitud"], ignore_index=True)
+
+
+# Predicado -> columna, como en measurement_frame (vocab:variable = magnitud)
+_TEXTO = {VOCAB + "estacion": "estacion", VOCAB + "magnitud": "magnitud",
+          VOCAB + "variable": "magnitud", VOCAB + "puntoMuestreo": "punto"}
+_HORA = {VOCAB + h: i for i, h in enumerate(HORAS)}
+_FECHA = VOCAB + "fecha"
+
+
+class ColumnarIngest:
+    """
+    Ingesta de mediciones del TTL directamente a arrays tipados (estación, magnitud,
+    fecha, 24 horas, puntoMuestreo), sujeto a sujeto y sin grafo de rdflib.
+    El resultado es el mismo que measurement_frame para cada clase.
+    """
+
+    def __init__(self, clases=CLASES):
+        self.tripletas = 0
+        self.sujetos = 0
+        self._columnas = {VOCAB + c: _Columnas() for c in clases}
+
+    def feed(self, sujeto, pares):
+        self.sujetos += 1
+        self.tripletas += len(pares)
+        columnas = next((self._columnas[o] for p, o in pares if p == RDF_TYPE and o in self._columnas), None)
+        if columnas is None:
+            return
+        i = columnas.fila()
+        for p, o in pares:
+            hora = _HORA.get(p)
+            if hora is not None:
+                columnas.horas[i, hora] = float(o.lexico)
+            elif p in _TEXTO:
+                getattr(columnas, _TEXTO[p])[i] = sys.intern(o.lexico)
+            elif p == _FECHA:
+                columnas.fecha[i] = _nanoseconds(o.lexico)
+
+    def frames(self):
+        """{clase: DataFrame} con las columnas de measurement_frame."""
+        return {clase[len(VOCAB):]: columnas.frame() for clase, columnas in self._columnas.items()}
+
+
+def ingest_measurements(path=None, clases=CLASES):
+    """
+    Lee las mediciones del TTL en streaming (ver iter_subjects y ColumnarIngest).
+
+    Returns:
+        ColumnarIngest: .frames() con un DataFrame por clase; .tripletas y .sujetos leídos
+    """
+    ingesta = ColumnarIngest(clases)
+    for sujeto, pares in iter_subjects(path):
+        ingesta.feed(sujeto, pares)
+    return ingesta
+
+
+def _rdflib_ingest(path):
+    g = Graph().parse(path or DATASET_PATH, format="turtle")
+    frames = {clase: measurement_frame(g, clase) for clase in CLASES}
+    return frames, len(g)
+
+
+def _streaming_ingest(path):
+    ingesta = ingest_measurements(path)
+    return ingesta.frames(), ingesta.tripletas
+
+
+def compare_ingest(path=None, repeticiones=3):
+    """
+    Compara la ingesta de mediciones con rdflib (parsear el grafo y recorrerlo)
+    y en streaming: tripletas por segundo (mejor de las repeticiones, sin trazar
+    memoria) y pico de memoria (una ejecución aparte con tracemalloc).
+
+    Returns:
+        list: [{"ingesta", "tripletas", "filas", "min_ms", "tripletas_s", "pico_mb"}, ...]
+    """
+    resultado = []
+    for nombre, ingesta in (("rdflib", _rdflib_ingest), ("streaming", _streaming_ingest)):
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            frames, tripletas = ingesta(path)
+            tiempos.append(time.perf_counter() - t0)
+        del frames
+
+        # Si ya se está trazando (ej: modo perfil de la app) se reutiliza la traza
+        # en curso en lugar de cortarla; el pico se mide desde este punto
+        trazando = tracemalloc.is_tracing()
+        if not trazando:
+            tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            frames, _ = ingesta(path)
+            pico = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            if not trazando:
+                tracemalloc.stop()
+
+        resultado.append({
+            "ingesta": nombre,
+            "tripletas": tripletas,
+            "filas": sum(len(df) for df in frames.values()),
+            "min_ms": round(min(tiempos) * 1000, 2),
+            "tripletas_s": round(tripletas / min(tiempos)),
+            "pico_mb": round(pico / 2**20, 2),
+        })
+    return resultado
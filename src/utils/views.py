@@ -0,0 +1,282 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.alerts import exceedance_threshold
+from utils.measurements import HORAS, measurement_frame
+from utils.rdf_loader import DATASET_PATH, dataset_version, graph_index, graph_version, register_index
+
+def views_dir_for(dataset_path):
+    """Directorio de las vistas de un dataset: se guardan junto al TTL."""
+    return os.path.splitext(dataset_path)[0] + ".views"
+
+
+# data/alertas-with-links.views/
+VIEWS_DIR = views_dir_for(DATASET_PATH)
+
+# Se incrementa al cambiar las columnas de las vistas: fuerza a recalcularlas enteras
+VIEWS_VERSION = 2
+
+CLAVE = ["estacion", "magnitud", "fecha"]
+CLAVE_MES = ["estacion", "magnitud", "mes"]
+
+# Vistas ya leídas en este proceso, por directorio: (estado del dataset, vistas)
+_cache = {}
+
+# Un solo refresco a la vez en el proceso (ej: dos sesiones de la app que piden
+# agregados justo después de cambiar el TTL); el resto espera y reutiliza el resultado.
+# Con este cerrojo tomado no se piden índices del grafo (podría cruzarse con el de la versión)
+_lock = threading.RLock()
+
+
+def _served_version(dataset_path):
+    # Del dataset servido, no del fichero: durante una recarga en caliente el
+    # fichero ya es nuevo pero las vistas se calculan con la versión publicada
+    return graph_version() if dataset_path == DATASET_PATH else dataset_version(dataset_path)
+
+
+def _dataset_state(version):
+    mtime_ns, size = (int(x) for x in version.split("-"))
+    return {"mtime_ns": mtime_ns, "size": size, "version": VIEWS_VERSION}
+
+
+def _fingerprints(frame):
+    """Huella de cada medición (clave + 24 horas) para detectar qué ha cambiado."""
+    huellas = pd.DataFrame(frame[CLAVE])
+    huellas["huella"] = pd.util.hash_pandas_object(frame[CLAVE + HORAS], index=False).to_numpy()
+    # Si hubiera varias mediciones con la misma clave, se combinan sus huellas
+    return huellas.groupby(CLAVE, sort=False)["huella"].agg(lambda h: np.bitwise_xor.reduce(h.to_numpy()))
+
+
+def _daily_rows(frame):
+    """Calcula la vista diaria (una fila por estación, magnitud y fecha) de las mediciones dadas."""
+    valores = frame[HORAS].to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    umbrales = frame["magnitud"].map(exceedance_threshold).to_numpy(dtype=float)
+
+    filas = pd.DataFrame(frame[CLAVE])
+    filas["n_mediciones"] = 1
+    filas["n_horas"] = validos.sum(axis=1)
+    filas["suma"] = np.where(validos, valores, 0.0).sum(axis=1)
+    filas["maximo"] = np.where(validos, valores, -np.inf).max(axis=1)
+    filas["minimo"] = np.where(validos, valores, np.inf).min(axis=1)
+    # NaN >= umbral es False, así que las horas sin dato y las magnitudes sin semáforo no suman
+    filas["horas_superacion"] = (valores >= umbrales[:, None]).sum(axis=1)
+    # Último valor horario del día (hora_ultimo = 0 si no hay ningún dato)
+    idx_ultimo = valores.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+    tiene_datos = validos.any(axis=1)
+    filas["ultimo"] = np.where(tiene_datos, valores[np.arange(len(valores)), idx_ultimo], np.nan)
+    filas["hora_ultimo"] = np.where(tiene_datos, idx_ultimo + 1, 0)
+    # Estadísticos de H01, los que usa get_aggregated_statistics
+    h01 = frame["H01"].to_numpy(dtype=float)
+    filas["n_h01"] = (~np.isnan(h01)).astype(int)
+    filas["suma_h01"] = np.nan_to_num(h01)
+    filas["max_h01"] = h01
+    filas["min_h01"] = h01
+
+    diario = filas.groupby(CLAVE, as_index=False, sort=False).agg(
+        n_mediciones=("n_mediciones", "sum"),
+        n_horas=("n_horas", "sum"),
+        suma=("suma", "sum"),
+        maximo=("maximo", "max"),
+        minimo=("minimo", "min"),
+        horas_superacion=("horas_superacion", "sum"),
+        ultimo=("ultimo", "last"),
+        hora_ultimo=("hora_ultimo", "last"),
+        n_h01=("n_h01", "sum"),
+        suma_h01=("suma_h01", "sum"),
+        max_h01=("max_h01", "max"),
+        min_h01=("min_h01", "min"),
+    )
+    con_datos = diario["n_horas"] > 0
+    diario["media"] = np.where(con_datos, diario["suma"] / diario["n_horas"].clip(lower=1), np.nan)
+    diario["maximo"] = diario["maximo"].where(con_datos)
+    diario["minimo"] = diario["minimo"].where(con_datos)
+    return diario
+
+
+def _monthly_rows(diario):
+    """Calcula la vista mensual (conteos y horas de superación) a partir de la diaria."""
+    mes = diario["fecha"].dt.strftime("%Y-%m")
+    return (
+        diario.assign(mes=mes)
+        .groupby(CLAVE_MES, as_index=False)
+        .agg(
+            n_mediciones=("n_mediciones", "sum"),
+            n_horas=("n_horas", "sum"),
+            horas_superacion=("horas_superacion", "sum"),
+        )
+    )
+
+
+def _key_index(df, columnas):
+    return pd.MultiIndex.from_frame(df[columnas])
+
+
+def refresh_views(frame=None, completo=True, views_dir=VIEWS_DIR, dataset_path=DATASET_PATH, version=None):
+    """
+    Actualiza las vistas materializadas recalculando solo las claves que han cambiado.
+    Compara la huella de cada (estación, magnitud, fecha) con la guardada y solo
+    rehace esas filas diarias y los meses a los que pertenecen.
+
+    Args:
+        frame (DataFrame, optional): Mediciones (measurement_frame). Por defecto todo el dataset
+        completo (bool): True si frame es el dataset entero (las claves que falten se borran);
+                         False para ingestas parciales (solo se insertan/actualizan claves)
+        views_dir (str): Directorio donde se persisten las vistas
+        dataset_path (str): Dataset del que proceden (para saber si las vistas están al día)
+        version (str, optional): Versión del dataset a la que corresponde frame
+                                 (por defecto, la servida: graph_version)
+
+    Returns:
+        dict: {"cambiadas": n, "borradas": n} número de claves diarias recalculadas/eliminadas
+    """
+    if version is None:
+        version = _served_version(dataset_path)
+    if frame is None:
+        frame = measurement_frame()
+    with _lock:
+        return _refresh_views(frame, completo, views_dir, version)
+
+
+def _refresh_views(frame, completo, views_dir, version):
+    anterior = _read_views(views_dir)
+    huellas = _fingerprints(frame)
+
+    if anterior is None:
+        diario_prev = None
+        cambiadas = huellas.index
+        borradas = huellas.index[:0]
+    else:
+        diario_prev = anterior["diario"]
+        huellas_prev = pd.Series(diario_prev["huella"].to_numpy(), index=_key_index(diario_prev, CLAVE))
+        comunes = huellas.index.intersection(huellas_prev.index)
+        distintas = comunes[huellas.loc[comunes].to_numpy() != huellas_prev.loc[comunes].to_numpy()]
+        cambiadas = huellas.index.difference(huellas_prev.index).append(distintas)
+        borradas = huellas_prev.index.difference(huellas.index) if completo else huellas.index[:0]
+        if len(cambiadas) == 0 and len(borradas) == 0:
+            # Versión nueva del TTL con las mismas mediciones: solo se actualiza meta.json
+            _write_views(anterior, views_dir, version)
+            return {"cambiadas": 0, "borradas": 0}
+
+    claves_frame = _key_index(frame, CLAVE)
+    nuevas = _daily_rows(frame[claves_frame.isin(cambiadas)])
+    nuevas["huella"] = huellas.loc[_key_index(nuevas, CLAVE)].to_numpy()
+
+    if diario_prev is None:
+        diario = nuevas
+        mensual = _monthly_rows(diario)
+    else:
+        tocadas = cambiadas.append(borradas)
+        claves_prev = _key_index(diario_prev, CLAVE)
+        diario = pd.concat([diario_prev[~claves_prev.isin(tocadas)], nuevas], ignore_index=True)
+
+        # Solo se recalculan los meses que contienen alguna clave tocada
+        tocadas_df = tocadas.to_frame(index=False)
+        meses = _key_index(tocadas_df.assign(mes=tocadas_df["fecha"].dt.strftime("%Y-%m")), CLAVE_MES)
+        mensual_prev = anterior["mensual"]
+        diario_mes = diario.assign(mes=diario["fecha"].dt.strftime("%Y-%m"))
+        recalculadas = _monthly_rows(diario[_key_index(diario_mes, CLAVE_MES).isin(meses)])
+        mensual = pd.concat(
+            [mensual_prev[~_key_index(mensual_prev, CLAVE_MES).isin(meses)], recalculadas],
+            ignore_index=True,
+        )
+
+    vistas = {
+        "diario": diario.sort_values(CLAVE, ignore_index=True),
+        "mensual": mensual.sort_values(CLAVE_MES, ignore_index=True),
+    }
+    _write_views(vistas, views_dir, version)
+    return {"cambiadas": len(cambiadas), "borradas": len(borradas)}
+
+
+def _read_views(views_dir):
+    meta_path = os.path.join(views_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        if json.load(f).get("version") != VIEWS_VERSION:
+            return None  # vistas de una versión anterior: se recalculan enteras
+    return {
+        "diario": pd.read_parquet(os.path.join(views_dir, "diario.parquet")),
+        "mensual": pd.read_parquet(os.path.join(views_dir, "mensual.parquet")),
+    }
+
+
+def _tmp_path(path):
+    # Nombre temporal único por proceso e hilo: varios escritores no se pisan
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def _write_views(vistas, views_dir, version):
+    os.makedirs(views_dir, exist_ok=True)
+    for nombre, df in vistas.items():
+        path = os.path.join(views_dir, nombre + ".parquet")
+        tmp_path = _tmp_path(path)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    # meta.json se escribe al final y también se sustituye de una vez:
+    # si existe, las vistas están completas
+    estado = _dataset_state(version)
+    meta_path = os.path.join(views_dir, "meta.json")
+    tmp_path = _tmp_path(meta_path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(tmp_path, meta_path)
+    _cache[views_dir] = (estado, vistas)
+
+
+def load_views(views_dir=VIEWS_DIR, dataset_path=DATASET_PATH):
+    """
+    Devuelve las vistas materializadas al día con el dataset.
+    Si el TTL ha cambiado desde que se guardaron, se refrescan (incrementalmente) antes.
+    Las del dataset por defecto son un índice de la versión del grafo: el vigilante
+    de recarga las refresca antes de publicar cada versión.
+
+    Returns:
+        dict: {"diario": DataFrame, "mensual": DataFrame}
+              diario: estacion, magnitud, fecha, n_mediciones, n_horas, suma, media, maximo,
+                      minimo, horas_superacion, ultimo, hora_ultimo, n_h01, suma_h01,
+                      max_h01, min_h01, huella
+              mensual: estacion, magnitud, mes, n_mediciones, n_horas, horas_superacion
+    """
+    if views_dir == VIEWS_DIR and dataset_path == DATASET_PATH:
+        return graph_index("vistas")
+    version = _served_version(dataset_path)
+    return _load_views(views_dir, version)
+
+
+def _views_index(grafo, version, dataset_path):
+    # Mientras se construye el índice, measurement_frame() es el de esta misma versión
+    return _load_views(views_dir_for(dataset_path), version)
+
+
+def _load_views(views_dir, version):
+    estado = _dataset_state(version)
+    with _lock:
+        if views_dir in _cache and _cache[views_dir][0] == estado:
+            return _cache[views_dir][1]
+
+        meta_path = os.path.join(views_dir, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f) == estado:
+                    vistas = _read_views(views_dir)
+                    _cache[views_dir] = (estado, vistas)
+                    return vistas
+
+    # Las mediciones se piden sin el cerrojo de las vistas tomado
+    frame = measurement_frame()
+    with _lock:
+        if views_dir in _cache and _cache[views_dir][0] == estado:
+            return _cache[views_dir][1]  # otro hilo las refrescó mientras tanto
+        _refresh_views(frame, True, views_dir, version)
+        return _cache[views_dir][1]
+
+
+# El vigilante de recarga en caliente las refresca antes de publicar cada versión
+register_index("vistas", _views_index, con_version=True)
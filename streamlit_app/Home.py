@@ -1,19 +1,59 @@
 
 import streamlit as st
 import pandas as pd
+import pydeck as pdk
 import sys
 import os
+import time
 # Añadir /src al PYTHONPATH
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
 from queries.internal import (
     get_measurements, 
     get_measurements_by_station_and_date, 
     get_ozone_episodes, 
+    get_episode_index,
+    search_ozone_episodes,
     get_measurements_with_linked_data, 
     get_aggregated_statistics,
+    get_top_stations,
     get_available_stations,
     get_available_magnitudes
 )
+from queries.adhoc import DEFAULT_MAX_ROWS, DEFAULT_TIMEOUT, EXAMPLE_QUERY, GuardedQuery, explain_query
+from queries.cache import QUERY_CACHE
+from utils.profiling import PROFILE_PATH, start_profiling, summarize_profiles
+from utils.ranking import top_k
+from utils.rdf_loader import GRAPH_STORE, graph_version, load_graph
+from utils.station_coords import load_station_coordinates, refresh_station_coordinates
+from utils.station_map import build_map_index, map_summary
+
+
+@st.cache_resource
+def start_hot_reload():
+    # Un único vigilante por proceso: cuando se reescribe el TTL, carga la nueva versión
+    # (y sus índices) en segundo plano y la publica sin pausar a las sesiones abiertas
+    GRAPH_STORE.start_watcher()
+    return GRAPH_STORE
+
+
+start_hot_reload()
+
+
+# Solo las dos variantes (con y sin anomalías) de la versión actual: al recargar
+# el grafo la versión anterior sale de la caché en lugar de acumularse
+@st.cache_resource(show_spinner="Precalculando mapa de estaciones...", max_entries=2)
+def load_map_index(excluir_anomalias=False, version=None):
+    # Se calcula una vez por versión del grafo: cambiar de magnitud o fecha solo consulta el diccionario
+    return build_map_index(map_summary(excluir_anomalias), load_station_coordinates())
+
+
+def load_console_graph():
+    # Versión ya cargada en memoria: los procesos de la consola la heredan con fork,
+    # sin volver a parsear el TTL
+    return load_graph()
+
+# Modo perfil (BESAFE_PROFILE=1, o BESAFE_PROFILE=url y ?perfil=1): tiempo, memoria y consultas de cada ejecución
+perfil = start_profiling(st.query_params)
 
 st.title("BeSafe – Calidad del Aire 🌍")
 
@@ -21,7 +61,7 @@ st.title("BeSafe – Calidad del Aire 🌍")
 st.sidebar.header("⚙️ Configuración de Consulta")
 query_type = st.sidebar.radio(
     "Selecciona el tipo de consulta:",
-    ["📊 Medición básica", "🔍 Medición con filtros", "⚠️ Episodios de Ozono", "🔗 Linked Data", "📈 Estadísticas Agregadas"],
+    ["📊 Medición básica", "🔍 Medición con filtros", "⚠️ Episodios de Ozono", "🔗 Linked Data", "📈 Estadísticas Agregadas", "🏆 Ranking de Estaciones", "🗺️ Mapa de Estaciones", "🧪 Consola SPARQL"],
     index=0
 )
 
@@ -159,18 +199,47 @@ elif query_type == "⚠️ Episodios de Ozono":
             fecha_fin = f"{fecha_fin_input}T23:59:59Z"
             st.sidebar.caption(f"Hasta: `{fecha_fin}`")
     
+    # Búsqueda por texto sobre el índice invertido de episodios (escenario y medidas)
+    episode_index = get_episode_index()
+    col_texto, col_escenario = st.columns([3, 1])
+    with col_texto:
+        texto = st.text_input(
+            "🔎 Buscar en escenario y medidas",
+            placeholder="ej: sms, pagina web, recomendaciones",
+            help="Sin distinguir tildes ni mayúsculas; cada palabra encuentra también las que empiezan por ella"
+        )
+    with col_escenario:
+        facetas = episode_index.facets()
+        escenario = st.selectbox(
+            "Escenario",
+            options=[None] + list(facetas),
+            format_func=lambda e: "Todos" if e is None else f"{e} ({facetas[e]})"
+        )
+    
     if st.button("🔍 Consultar Episodios", key="ozone"):
         with st.spinner("Buscando episodios de ozono..."):
-            data = get_ozone_episodes(
-                fecha_inicio=fecha_inicio if use_fecha_inicio else None,
-                fecha_fin=fecha_fin if use_fecha_fin else None
-            )
+            if texto.strip() or escenario is not None:
+                data = search_ozone_episodes(
+                    texto=texto,
+                    escenario=escenario,
+                    fecha_inicio=fecha_inicio if use_fecha_inicio else None,
+                    fecha_fin=fecha_fin if use_fecha_fin else None
+                )
+            else:
+                data = get_ozone_episodes(
+                    fecha_inicio=fecha_inicio if use_fecha_inicio else None,
+                    fecha_fin=fecha_fin if use_fecha_fin else None
+                )
             
             if data:
                 df = pd.DataFrame(data)
                 
                 # Mostrar resumen de filtros
                 filters_applied = []
+                if texto.strip():
+                    filters_applied.append(f"Texto: {texto.strip()}")
+                if escenario is not None:
+                    filters_applied.append(f"Escenario: {escenario}")
                 if fecha_inicio:
                     filters_applied.append(f"Desde: {fecha_inicio}")
                 if fecha_fin:
@@ -194,17 +263,12 @@ elif query_type == "⚠️ Episodios de Ozono":
                         st.markdown(f"**📅 Fecha Inicio:** {row['fecha_inicio']}")
                         st.markdown(f"**📅 Fecha Fin:** {row['fecha_fin']}")
                         st.markdown(f"**📊 Escenario:** {row['escenario']}")
-                        if row['medida_poblacion']:
+                        # Medidas por separado desde el índice (sin partir el GROUP_CONCAT)
+                        medidas = episode_index.medidas(row['episodio_uri'])
+                        if medidas:
                             st.markdown(f"**👥 Medidas para la Población:**")
-                            # Dividir por el separador " | " que usamos en GROUP_CONCAT
-                            medidas_texto = str(row['medida_poblacion'])
-                            if ' | ' in medidas_texto:
-                                medidas = medidas_texto.split(' | ')
-                                for medida in medidas:
-                                    st.markdown(f"- {medida.strip()}")
-                            else:
-                                # Si es una sola medida, mostrarla directamente
-                                st.markdown(f"- {medidas_texto}")
+                            for medida in medidas:
+                                st.markdown(f"- {medida}")
                 
                 # Estadísticas
                 st.subheader("📈 Estadísticas de Episodios")
@@ -215,6 +279,9 @@ elif query_type == "⚠️ Episodios de Ozono":
                     if 'escenario' in df.columns:
                         escenarios_unicos = df['escenario'].nunique()
                         st.metric("Tipos de Escenario", escenarios_unicos)
+                st.caption("Episodios por escenario: " + ", ".join(
+                    f"{e}: {n}" for e, n in episode_index.facets(data).items()
+                ))
             else:
                 st.warning("⚠️ No se encontraron episodios con los filtros aplicados")
                 st.info("💡 Intenta ampliar el rango de fechas o eliminar filtros")
@@ -370,11 +437,15 @@ elif query_type == "📈 Estadísticas Agregadas":
             key="agg_mag_input"
         )
     
+    excluir_agg = st.sidebar.checkbox("Excluir lecturas anómalas", value=False, key="agg_anomalias",
+                                      help="Ignora ceros, picos aislados y valores atascados")
+    
     if st.button("📊 Calcular Estadísticas", key="aggregated"):
         with st.spinner("Calculando estadísticas agregadas con SPARQL..."):
             data = get_aggregated_statistics(
                 estacion=estacion_agg if use_estacion_agg else None,
-                magnitud=magnitud_agg if use_magnitud_agg else None
+                magnitud=magnitud_agg if use_magnitud_agg else None,
+                excluir_anomalias=excluir_agg
             )
             
             if data:
@@ -412,7 +483,7 @@ elif query_type == "📈 Estadísticas Agregadas":
                 
                 # Análisis por estación
                 st.subheader("🏢 Top 5 Estaciones por Promedio Más Alto")
-                top_stations = df.nlargest(5, 'promedio')[['estacion', 'magnitud', 'promedio', 'maximo', 'minimo']]
+                top_stations = df.iloc[top_k(df['promedio'].to_numpy(dtype=float), 5)][['estacion', 'magnitud', 'promedio', 'maximo', 'minimo']]
                 st.dataframe(top_stations, use_container_width=True)
                 
                 # Gráficos
@@ -431,5 +502,205 @@ elif query_type == "📈 Estadísticas Agregadas":
                 st.warning("⚠️ No se encontraron estadísticas con los filtros aplicados")
                 st.info("💡 Intenta modificar o eliminar los filtros")
 
+elif query_type == "🏆 Ranking de Estaciones":
+    st.subheader("🏆 Ranking de Estaciones")
+    st.info("Las estaciones con valores más altos de una magnitud, calculadas sobre la vista diaria sin ordenar todas las estaciones.")
+
+    with st.spinner("Cargando opciones disponibles..."):
+        available_magnitudes = get_available_magnitudes()
+
+    st.sidebar.subheader("Opciones del Ranking")
+    magnitud_rank = st.sidebar.selectbox("Selecciona Magnitud", options=available_magnitudes, key="rank_magnitud")
+    criterios_rank = {
+        "Último valor horario": "ultimo",
+        "Máximo diario": "max_diario",
+        "Media en la ventana": "media",
+    }
+    criterio_rank = st.sidebar.radio("Criterio", list(criterios_rank), key="rank_criterio")
+    k_rank = st.sidebar.slider("Número de estaciones", min_value=1, max_value=20, value=5, key="rank_k")
+
+    use_ventana = st.sidebar.checkbox("Limitar a una ventana de fechas", value=False, key="rank_ventana")
+    fecha_inicio_rank = fecha_fin_rank = None
+    if use_ventana:
+        fecha_inicio_rank = st.sidebar.date_input("Desde", key="rank_desde").isoformat()
+        fecha_fin_rank = st.sidebar.date_input("Hasta", key="rank_hasta").isoformat()
+
+    data = get_top_stations(
+        magnitud_rank,
+        k=k_rank,
+        criterio=criterios_rank[criterio_rank],
+        fecha_inicio=fecha_inicio_rank,
+        fecha_fin=fecha_fin_rank,
+    )
+
+    if data:
+        df = pd.DataFrame(data)
+        if criterios_rank[criterio_rank] == "media":
+            df = df.drop(columns=["fecha", "hora", "alerta"])
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        st.bar_chart(df.set_index("estacion")[["valor"]])
+    else:
+        st.warning("⚠️ No hay datos de esta magnitud en la ventana seleccionada")
+
+elif query_type == "🗺️ Mapa de Estaciones":
+    st.subheader("🗺️ Mapa de Estaciones - Semáforo de Calidad del Aire")
+    st.info("Mapa de las estaciones coloreadas según el semáforo de alertas. Las coordenadas salen de una caché local de Wikidata y los valores de un agregado precalculado.")
+
+    excluir_mapa = st.sidebar.checkbox("Excluir lecturas anómalas", value=False, key="map_anomalias",
+                                       help="Ignora ceros, picos aislados y valores atascados al calcular el semáforo")
+    with GRAPH_STORE.pin():  # la clave de la caché y el resumen, de la misma versión
+        map_index = load_map_index(excluir_mapa, graph_version())
+
+    if not map_index:
+        st.warning("⚠️ No hay coordenadas en la caché local (data/estaciones-coords.json)")
+        if st.button("🌐 Descargar coordenadas desde Wikidata", key="coords"):
+            with st.spinner("Consultando Wikidata..."):
+                total = refresh_station_coordinates()
+            load_map_index.clear()
+            st.success(f"✅ Se guardaron coordenadas de {total} entidades")
+            st.rerun()
+    else:
+        st.sidebar.subheader("Opciones del Mapa")
+
+        magnitudes_mapa = sorted({m for m, _ in map_index}, key=lambda x: int(x))
+        magnitud_mapa = st.sidebar.selectbox("Selecciona Magnitud", options=magnitudes_mapa, key="map_magnitud")
+
+        dias_mapa = sorted({d for m, d in map_index if m == magnitud_mapa}, reverse=True)
+        dia_mapa = st.sidebar.selectbox("Selecciona Fecha", options=dias_mapa, key="map_dia")
+
+        valor_mapa = st.sidebar.radio("Valor a mostrar", ["Último valor horario", "Media diaria"], key="map_valor")
+        sufijo = "ultimo" if valor_mapa == "Último valor horario" else "media"
+
+        puntos = map_index.get((magnitud_mapa, dia_mapa), [])
+
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=puntos,
+            get_position=["lon", "lat"],
+            get_fill_color=f"color_{sufijo}",
+            get_radius=350,
+            pickable=True,
+        )
+        view_state = pdk.ViewState(latitude=40.42, longitude=-3.70, zoom=10.5)
+        tooltip = {"text": "Estación {estacion} – {nombre}\nÚltimo (H{hora_ultimo}): {ultimo}\nMedia: {media}\n{alerta_" + sufijo + "}"}
+        st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip=tooltip))
+
+        st.caption(f"Magnitud: {magnitud_mapa} | Fecha: {dia_mapa} | {len(puntos)} estaciones con coordenadas")
+
+        if puntos:
+            df = pd.DataFrame(puntos)[["estacion", "nombre", "ultimo", "hora_ultimo", "media", f"alerta_{sufijo}"]]
+            st.dataframe(df, use_container_width=True)
+
+elif query_type == "🧪 Consola SPARQL":
+    st.subheader("🧪 Consola SPARQL (avanzado)")
+    st.info("Ejecuta consultas SPARQL propias sobre el RDF local. Cada consulta corre en un proceso aparte con límite de tiempo, de filas y de memoria, así que una consulta pesada no bloquea la aplicación.")
+
+    st.sidebar.subheader("Límites de la Consulta")
+    timeout_sparql = st.sidebar.slider("Tiempo máximo (segundos)", min_value=1, max_value=60, value=DEFAULT_TIMEOUT, key="sparql_timeout")
+    max_rows_sparql = st.sidebar.number_input("Máximo de filas", min_value=10, max_value=10000, value=DEFAULT_MAX_ROWS, step=10, key="sparql_max_rows")
+
+    query_sparql = st.text_area("Consulta SPARQL", value=EXAMPLE_QUERY, height=260, key="sparql_query")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        ejecutar = st.button("▶️ Ejecutar consulta", key="sparql_run")
+    with col2:
+        # Pulsar cualquier botón relanza el script: la consulta en curso se interrumpe y su proceso se mata
+        st.button("⏹️ Cancelar", key="sparql_cancel")
+
+    if ejecutar:
+        try:
+            plan = explain_query(query_sparql)
+        except Exception as e:
+            plan = None
+            st.error(f"❌ Consulta no válida: {e}")
+
+        if plan:
+            with st.expander("🧭 Plan de la consulta (álgebra SPARQL)"):
+                st.code(plan["algebra"])
+
+            estado = st.empty()
+            tabla = st.empty()
+            columnas, filas, fases = [], [], {}
+            ultimo_render = 0.0
+            t0 = time.perf_counter()
+
+            consulta = GuardedQuery(query_sparql, timeout=timeout_sparql, max_rows=int(max_rows_sparql), graph=load_console_graph())
+            try:
+                for tipo, dato in consulta:
+                    if tipo == "fase":
+                        fases[dato[0]] = dato[1]
+                    elif tipo == "columnas":
+                        columnas = dato
+                    elif tipo == "filas":
+                        filas.extend(dato)
+                        # Refresco de la tabla como mucho cada 0.25 s mientras llegan filas
+                        if time.perf_counter() - ultimo_render > 0.25:
+                            tabla.dataframe(pd.DataFrame(filas, columns=columnas), use_container_width=True)
+                            estado.caption(f"⏳ {len(filas)} filas recibidas...")
+                            ultimo_render = time.perf_counter()
+                    elif tipo == "espera":
+                        # Algo que pintar mientras la consulta no devuelve nada: así Streamlit
+                        # puede interrumpir el script si se pulsa Cancelar
+                        estado.caption(f"⏳ Ejecutando... {dato:.1f} s ({len(filas)} filas recibidas)")
+                    elif tipo == "truncado":
+                        st.warning(f"✂️ Resultado truncado a {dato} filas")
+                    elif tipo == "timeout":
+                        st.error(f"⏱️ La consulta superó el tiempo máximo ({dato} s) y se ha cancelado")
+                    elif tipo == "timeout_carga":
+                        st.error(f"⏱️ El grafo no terminó de cargarse en el proceso de la consulta ({dato} s); se ha cancelado")
+                    elif tipo == "error":
+                        st.error(f"❌ {dato}")
+                    elif tipo == "fin":
+                        estado.success(f"✅ {dato} filas")
+            finally:
+                consulta.cancel()
+
+            t_render = time.perf_counter()
+            if columnas:
+                tabla.dataframe(pd.DataFrame(filas, columns=columnas), use_container_width=True)
+            fases["render_ms"] = (time.perf_counter() - t_render) * 1000
+            fases["total_ms"] = (time.perf_counter() - t0) * 1000
+
+            st.subheader("⏱️ Fases de la Consulta")
+            st.dataframe(
+                pd.DataFrame([{"fase": k, "ms": round(v, 2)} for k, v in fases.items()]),
+                use_container_width=True,
+            )
+
 st.sidebar.markdown("---")
+with st.sidebar.expander("📦 Caché de consultas"):
+    cache_stats = QUERY_CACHE.stats()
+    st.caption(
+        f"Aciertos: {cache_stats['hits'] + cache_stats['disk_hits']} | Fallos: {cache_stats['misses']} | "
+        f"Expulsiones: {cache_stats['evictions']} | {cache_stats['entries']} entradas, "
+        f"{cache_stats['bytes'] / 1024:.0f} KB"
+    )
+    store_stats = GRAPH_STORE.stats()
+    st.caption(f"Versión del grafo: {store_stats['version']} | Recargas: {store_stats['recargas']}")
+    if store_stats["ultimo_error"]:
+        st.caption(f"⚠️ Última recarga fallida: {store_stats['ultimo_error']}")
 st.sidebar.caption("💡 Proyecto BeSafe - Semantic Web")
+
+if perfil:
+    registro = perfil.stop(query_type)
+    with st.expander(f"🩺 Perfil de esta ejecución: {registro['wall_ms']:.0f} ms, RSS {registro['rss_mb']} MB"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Tiempo total", f"{registro['wall_ms']:.0f} ms")
+        with col2:
+            st.metric("RSS", f"{registro['rss_mb']} MB", delta=f"{registro['rss_delta_mb']} MB", delta_color="inverse")
+        with col3:
+            st.metric("Pico tracemalloc", f"{registro['traza_pico_kb'] / 1024:.1f} MB")
+
+        st.markdown("**Consultas de internal.py**")
+        if registro["llamadas"]:
+            st.dataframe(pd.DataFrame(registro["llamadas"]), use_container_width=True)
+        else:
+            st.caption("Ninguna consulta en esta ejecución")
+
+        st.markdown("**Mayores reservas de memoria**")
+        st.dataframe(pd.DataFrame(registro["asignaciones"], columns=["linea", "kb", "bloques"]), use_container_width=True)
+
+        st.markdown(f"**Histórico por página** (`{PROFILE_PATH}`)")
+        st.dataframe(pd.DataFrame(summarize_profiles()), use_container_width=True)
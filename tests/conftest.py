@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+
+
+@pytest.fixture(autouse=True)
+def raiz_del_repo(monkeypatch):
+    # Las rutas de datos (data/...) son relativas a la raíz del repositorio
+    monkeypatch.chdir(RAIZ)
@@ -0,0 +1,33 @@
+import time
+
+from queries import adhoc
+from queries.adhoc import PREFIX, GuardedQuery
+from utils.rdf_loader import load_graph
+
+# Producto cartesiano del grafo consigo mismo: tarda mucho sin devolver nada
+LENTA = PREFIX + "SELECT (COUNT(*) AS ?n) WHERE { ?a ?b ?c . ?d ?e ?f }"
+
+
+def test_latido_mientras_no_hay_resultados_y_cancelacion():
+    consulta = GuardedQuery(LENTA, timeout=30, graph=load_graph())
+    eventos = iter(consulta)
+    for tipo, dato in eventos:
+        if tipo == "espera":
+            break
+    else:
+        raise AssertionError("no llegó ningún latido")
+    eventos.close()  # como cuando Streamlit interrumpe el script
+    assert not consulta._proceso.is_alive()
+
+
+def test_timeout_de_la_consulta():
+    eventos = list(GuardedQuery(LENTA, timeout=1, graph=load_graph()))
+    assert ("espera" in {t for t, _ in eventos}) and eventos[-1] == ("timeout", 1)
+
+
+def test_timeout_de_la_carga(monkeypatch):
+    # El hijo (fork) hereda el parche: la carga del grafo no termina a tiempo
+    monkeypatch.setattr(adhoc, "LOAD_TIMEOUT", 0.3)
+    monkeypatch.setattr(adhoc, "load_graph", lambda: time.sleep(30))
+    eventos = list(GuardedQuery(LENTA, timeout=30, graph=None))
+    assert eventos[-1] == ("timeout_carga", 0.3)
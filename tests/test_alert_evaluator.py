@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from utils import alert_evaluator
+from utils.alert_evaluator import AlertEvaluator
+from utils.anomalies import detect_anomalies
+from utils.measurements import HORAS, measurement_frame
+
+
+def _evaluador(path):
+    return AlertEvaluator(state_path=str(path), salida=None)
+
+
+def _dos_dias():
+    # El dataset trae un solo día: se añade una copia del día anterior, con todas
+    # las horas con dato para que las marcas lleguen al final de ese día
+    frame = measurement_frame().fillna({h: 1.0 for h in HORAS})
+    anterior = frame.assign(fecha=frame["fecha"] - pd.Timedelta(days=1))
+    return pd.concat([anterior, frame], ignore_index=True).sort_values(["fecha", "estacion", "magnitud"], ignore_index=True)
+
+
+def test_sin_cambios_no_vuelve_a_leer_las_mediciones(tmp_path, monkeypatch):
+    evaluador = _evaluador(tmp_path / "estado.json")
+    assert evaluador.tick()
+
+    def no_leer():
+        raise AssertionError("un tick sin cambios no debe leer las mediciones")
+
+    monkeypatch.setattr(alert_evaluator, "measurement_frame", no_leer)
+    assert evaluador.tick() == []
+    assert _evaluador(tmp_path / "estado.json").tick() == []  # la versión evaluada se guarda con el estado
+
+
+def test_solo_lee_los_dias_posteriores_a_las_marcas(tmp_path, monkeypatch):
+    frame = _dos_dias()
+    primer_dia = frame[frame["fecha"] == frame["fecha"].min()]
+
+    completo = _evaluador(tmp_path / "completo.json")
+    transiciones = completo.tick(frame)
+
+    incremental = _evaluador(tmp_path / "incremental.json")
+    primeras = incremental.tick(primer_dia)
+    leidas = []
+    pending = incremental._pending
+    monkeypatch.setattr(incremental, "_pending", lambda f: leidas.append(pending(f)) or leidas[-1])
+    monkeypatch.setattr(alert_evaluator, "measurement_frame", lambda: frame)
+    monkeypatch.setattr(alert_evaluator, "anomaly_flags", lambda: np.zeros((len(frame), len(HORAS)), dtype=np.int8))
+    segundas = incremental.tick()
+
+    assert len(leidas[0]) == len(frame) - len(primer_dia)  # el primer día no se vuelve a leer
+    assert sorted(primeras + segundas, key=str) == sorted(transiciones, key=str)
+    assert incremental.state() == completo.state()
+
+
+def test_las_horas_anomalas_no_disparan_transiciones(tmp_path, monkeypatch):
+    # Una serie de NO2 estable con un pico aislado a las 12: el detector lo marca
+    # y el evaluador lo trata como hora sin dato
+    fila = {"estacion": "99", "magnitud": "8", "fecha": pd.Timestamp("2025-05-08", tz="UTC"), "puntoMuestreo": None}
+    fila.update({h: 40.0 + (i % 3) for i, h in enumerate(HORAS)})
+    fila["H12"] = 400.0
+    frame = pd.DataFrame([fila])
+    assert detect_anomalies(frame)[0, HORAS.index("H12")]
+
+    monkeypatch.setattr(alert_evaluator, "measurement_frame", lambda: frame)
+    monkeypatch.setattr(alert_evaluator, "anomaly_flags", lambda: detect_anomalies(frame))
+    monkeypatch.setattr(alert_evaluator, "graph_version", lambda: "v1")
+    transiciones = _evaluador(tmp_path / "estado.json").tick()
+
+    assert [t["hacia"] for t in transiciones] == ["🟢 BUENO"]
+    assert _evaluador(tmp_path / "otro.json").tick(frame)[1]["hacia"] == "🔴 MUY ALTO"  # con frame, tal cual
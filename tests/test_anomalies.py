@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import anomalies
+from utils.anomalies import (CERO, CONSTANTE, HORAS_CONSTANTE, NORMAL, PICO, IncrementalFlags, anomaly_flags,
+                             detect_anomalies, mask_anomalies)
+from utils.measurements import HORAS, measurement_frame
+from utils.rdf_loader import GRAPH_STORE, GraphStore, dataset_version
+
+
+def test_marcas_calculadas_una_vez_por_version():
+    marcas = anomaly_flags()
+    assert anomaly_flags() is marcas
+    assert not marcas.flags.writeable
+    np.testing.assert_array_equal(marcas, detect_anomalies(measurement_frame()))
+
+
+def test_precalculo_usa_las_mediciones_de_la_misma_version():
+    # Como hace el vigilante: la versión nueva aún no está publicada
+    store = GraphStore()
+    snapshot = store._build(dataset_version(), precalcular=True)
+    frame = snapshot.index("mediciones/MedicionAire")
+    assert frame is not GRAPH_STORE.current().index("mediciones/MedicionAire")
+    np.testing.assert_array_equal(snapshot.index("anomalias/MedicionAire"), detect_anomalies(frame))
+
+
+def test_mask_con_marcas_guardadas():
+    frame = measurement_frame()
+    limpio = mask_anomalies(frame, anomaly_flags())
+    assert limpio[HORAS].isna().to_numpy().sum() == frame[HORAS].isna().to_numpy().sum() + (anomaly_flags() != 0).sum()
+    with pytest.raises(ValueError):
+        anomaly_flags()[0, 0] = 1
+
+
+def _serie(valores, fecha="2025-05-08", estacion="1", magnitud="8"):
+    fila = {"estacion": estacion, "magnitud": magnitud, "fecha": pd.Timestamp(fecha, tz="UTC"), "puntoMuestreo": None}
+    fila.update({h: float(v) for h, v in zip(HORAS, valores)})
+    return fila
+
+
+def _frame(*filas):
+    return pd.DataFrame(list(filas), columns=["estacion", "magnitud", "fecha", "puntoMuestreo", *HORAS])
+
+
+def test_racha_de_ceros_no_arrastra_la_media():
+    normales = [48, 52, 50, 49, 51, 50, 53, 47, 50, 52]
+    motivos = detect_anomalies(_frame(_serie(normales + [0] * 12 + [np.nan] * 2)))[0]
+    assert (motivos[10:22] == CERO).all()
+    assert (motivos[:10] == NORMAL).all()
+
+
+def test_valor_atascado():
+    normales = [48, 52, 50, 49, 51, 50, 53, 47, 50, 52]
+    motivos = detect_anomalies(_frame(_serie(normales + [60] * 12 + [49, 51])))[0]
+    # Las primeras HORAS_CONSTANTE - 1 repeticiones todavía no son sospechosas
+    assert list(motivos[10:22]) == [NORMAL] * (HORAS_CONSTANTE - 1) + [CONSTANTE] * (12 - HORAS_CONSTANTE + 1)
+    assert (motivos[22:] == NORMAL).all()
+
+
+def _dos_dias():
+    hoy = measurement_frame()
+    ayer = hoy.assign(fecha=hoy["fecha"] - pd.Timedelta(days=1))
+    ayer[HORAS] = ayer[HORAS].to_numpy()[:, ::-1]  # otros valores, mismas series
+    return pd.concat([ayer, hoy], ignore_index=True).sort_values(["fecha", "estacion", "magnitud"], ignore_index=True)
+
+
+def test_incremental_igual_que_todo_el_historico(monkeypatch):
+    frame = _dos_dias()
+    primer_dia = frame[frame["fecha"] == frame["fecha"].min()]
+    esperado = detect_anomalies(frame)
+
+    incremental = IncrementalFlags()
+    previas = incremental.flags(primer_dia)
+    copia = previas.copy()
+
+    procesadas = []
+    feed = anomalies._feed
+    monkeypatch.setattr(anomalies, "_feed", lambda d, f, *a: procesadas.append(len(f)) or feed(d, f, *a))
+    todas = incremental.flags(frame)
+
+    assert procesadas == [len(frame) - len(primer_dia)]  # solo las mediciones nuevas
+    np.testing.assert_array_equal(todas, esperado)
+    np.testing.assert_array_equal(previas, copia)  # la versión anterior no cambia
+
+    np.testing.assert_array_equal(incremental.flags(frame), esperado)  # misma versión: nada que procesar
+    assert procesadas == [len(frame) - len(primer_dia)]
+
+
+def test_pico_pendiente_se_confirma_en_la_version_siguiente():
+    base = [50, 51, 49, 50, 52, 48, 50, 51, 49, 50, 52, 48, 50, 51, 49, 50, 52, 48, 50, 51, 49, 50, 52]
+    ayer = _serie(base + [400], fecha="2025-05-07")
+    hoy = _serie([50] * 24, fecha="2025-05-08")
+
+    incremental = IncrementalFlags()
+    assert incremental.flags(_frame(ayer))[0, 23] == NORMAL  # todavía pendiente
+    assert incremental.flags(_frame(ayer, hoy))[0, 23] == PICO
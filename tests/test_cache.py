@@ -0,0 +1,96 @@
+import pytest
+
+from queries import cache
+from queries.cache import QueryCache, cached_query
+
+
+class Version:
+    # Versión del grafo controlada por el test
+    def __init__(self):
+        self.actual = "v1"
+
+    def __call__(self):
+        return self.actual
+
+
+@pytest.fixture
+def version(monkeypatch):
+    v = Version()
+    monkeypatch.setattr(cache, "graph_version", v)
+    return v
+
+
+def _contador():
+    llamadas = []
+
+    def compute():
+        llamadas.append(1)
+        return {"n": len(llamadas)}
+
+    return compute, llamadas
+
+
+def test_acierto_con_la_misma_version(version):
+    qc = QueryCache(max_bytes=1 << 20)
+    compute, llamadas = _contador()
+    assert qc.get_or_compute("q", (("a", 1),), compute) == {"n": 1}
+    assert qc.get_or_compute("q", (("a", 1),), compute) == {"n": 1}
+    assert qc.get_or_compute("q", (("a", 2),), compute) == {"n": 2}
+    assert len(llamadas) == 2 and qc.stats()["hits"] == 1
+
+
+def test_cambio_de_version_invalida(version):
+    qc = QueryCache(max_bytes=1 << 20)
+    compute, llamadas = _contador()
+    qc.get_or_compute("q", (), compute)
+    version.actual = "v2"
+    assert qc.get_or_compute("q", (), compute) == {"n": 2}
+    stats = qc.stats()
+    assert stats["invalidations"] == 1 and stats["entries"] == 1 and stats["graph_version"] == "v2"
+
+
+def test_no_guarda_si_la_version_cambia_durante_el_calculo(version):
+    qc = QueryCache(max_bytes=1 << 20)
+
+    def compute():
+        version.actual = "v2"  # se publica otra versión mientras se calcula
+        return "viejo"
+
+    assert qc.get_or_compute("q", (), compute) == "viejo"
+    assert qc.get_or_compute("q", (), lambda: "nuevo") == "nuevo"
+
+
+def test_disco_sobrevive_y_se_purga_al_cambiar_de_version(version, tmp_path):
+    compute, llamadas = _contador()
+    QueryCache(max_bytes=1 << 20, disk_dir=str(tmp_path)).get_or_compute("q", (), compute)
+    otra = QueryCache(max_bytes=1 << 20, disk_dir=str(tmp_path))
+    assert otra.get_or_compute("q", (), compute) == {"n": 1}
+    assert otra.stats()["disk_hits"] == 1
+
+    version.actual = "v2"
+    otra.get_or_compute("q", (), compute)
+    assert all(p.name.startswith("v2-") for p in tmp_path.glob("*.pkl"))
+
+
+def test_expulsion_lru_por_bytes(version):
+    qc = QueryCache(max_bytes=600)
+    for i in range(10):
+        qc.get_or_compute("q", (("i", i),), lambda i=i: "x" * 100 + str(i))
+    stats = qc.stats()
+    assert stats["bytes"] <= 600 and stats["evictions"] > 0
+    assert qc.get_or_compute("q", (("i", 9),), lambda: "recalculado") == "x" * 100 + "9"
+
+
+def test_decorador_normaliza_parametros(version, monkeypatch):
+    monkeypatch.setattr(cache, "QUERY_CACHE", QueryCache(max_bytes=1 << 20))
+    llamadas = []
+
+    @cached_query
+    def consulta(estacion=None, limite=10):
+        llamadas.append((estacion, limite))
+        return len(llamadas)
+
+    assert consulta() == consulta(estacion=None) == consulta(None, 10) == 1
+    version.actual = "v2"
+    assert consulta() == 2
+    assert consulta.uncached() == 3
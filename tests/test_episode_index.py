@@ -0,0 +1,14 @@
+import pytest
+
+from queries.internal import get_ozone_episodes, search_ozone_episodes
+
+
+@pytest.mark.parametrize("fecha", ["2025-05-01", "2025-05-08T15:00:00", "2025-05-08T17:00:00+02:00", "2030-01-01T00:00:00Z"])
+def test_filtro_de_fechas_como_get_ozone_episodes(fecha):
+    # Fechas sin zona o con otra zona se comparan en UTC, sin TypeError
+    assert search_ozone_episodes(fecha_inicio=fecha) == get_ozone_episodes(fecha_inicio=fecha)
+
+
+def test_busqueda_sin_tildes_con_fecha():
+    episodios = search_ozone_episodes("pagina", fecha_inicio="2025-05-01")
+    assert episodios and all("PÁGINA" in e.medida_poblacion for e in episodios)
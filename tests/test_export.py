@@ -0,0 +1,60 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from utils.export import export_parquet, read_parquet
+from utils.measurements import measurement_frame
+
+
+@pytest.fixture(scope="module")
+def export_dir(tmp_path_factory):
+    out = tmp_path_factory.mktemp("parquet")
+    export_parquet(str(out))
+    return out
+
+
+def _utc(fecha):
+    ts = pd.Timestamp(fecha)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"estacion": "11"},
+    {"magnitud": "10"},
+    {"estacion": "11", "magnitud": "12"},
+    {"fecha_inicio": "2025-05-08T00:00:00Z"},
+    {"fecha_inicio": "2025-05-09"},
+    {"fecha_fin": "2025-05-07T23:59:59Z"},
+    {"fecha_inicio": "2025-05-01", "fecha_fin": "2025-05-31", "magnitud": "8"},
+])
+def test_filtros_igual_que_measurement_frame(export_dir, filtros):
+    frame = measurement_frame()
+    mask = pd.Series(True, index=frame.index)
+    if "estacion" in filtros:
+        mask &= frame["estacion"] == filtros["estacion"]
+    if "magnitud" in filtros:
+        mask &= frame["magnitud"] == filtros["magnitud"]
+    if "fecha_inicio" in filtros:
+        mask &= frame["fecha"] >= _utc(filtros["fecha_inicio"])
+    if "fecha_fin" in filtros:
+        mask &= frame["fecha"] <= _utc(filtros["fecha_fin"])
+
+    tabla = read_parquet(str(export_dir), **filtros).to_pandas()
+    assert len(tabla) == mask.sum()
+    assert sorted(zip(tabla["estacion"], tabla["magnitud"])) == sorted(zip(frame[mask]["estacion"], frame[mask]["magnitud"]))
+
+
+def test_reexport_borra_particiones_que_ya_no_existen(tmp_path, export_dir):
+    out = tmp_path / "export"
+    shutil.copytree(export_dir, out)
+    particion = next((out / "medicion_aire").glob("mes=*/magnitud=*"))
+    antigua = out / "medicion_aire" / "mes=1999-01" / particion.name
+    shutil.copytree(particion, antigua)
+    assert len(read_parquet(str(out))) > len(measurement_frame())
+
+    export_parquet(str(out))
+    assert not antigua.exists()
+    assert len(read_parquet(str(out))) == len(measurement_frame())
+    assert not list(out.glob("*.tmp-*")) and not list(out.glob("*.old-*"))
@@ -0,0 +1,24 @@
+import pytest
+
+from queries.internal import ESTRATEGIAS_HORARIAS, get_measurements_by_station_and_date
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"estacion": "11"},
+    {"fecha": "2025-05-08T00:00:00Z"},
+    {"estacion": "11", "fecha": "2025-05-08T00:00:00Z"},
+    {"estacion": "no-existe"},
+])
+def test_pivot_igual_que_optional(filtros):
+    pivot = get_measurements_by_station_and_date.uncached(estrategia="pivot", **filtros)
+    optional = get_measurements_by_station_and_date.uncached(estrategia="optional", **filtros)
+    assert pivot == optional
+    if filtros.get("estacion") != "no-existe":
+        assert pivot
+
+
+def test_estrategia_desconocida():
+    with pytest.raises(ValueError, match="Estrategia desconocida"):
+        get_measurements_by_station_and_date(estrategia="nope")
+    assert "pivot" in ESTRATEGIAS_HORARIAS
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from queries.internal import get_aggregated_statistics
+from utils.measurements import HORAS, measurement_frame
+from utils.parallel import SKETCH_SIZE, aggregate, merge_quantiles, quantile_sketch
+
+
+@pytest.mark.parametrize("filtros", [{}, {"estacion": "11"}, {"magnitud": "10"}])
+def test_paralelo_igual_que_sparql(filtros):
+    assert get_aggregated_statistics(workers=2, **filtros) == get_aggregated_statistics(usar_vistas=False, **filtros)
+
+
+def test_mismo_resultado_con_cualquier_numero_de_procesos():
+    frame = measurement_frame()
+    uno = aggregate(frame, workers=1, cuantiles=(0.5, 0.95))
+    pd.testing.assert_frame_equal(aggregate(frame, workers=3, cuantiles=(0.5, 0.95)), uno)
+    pd.testing.assert_frame_equal(aggregate(frame, workers=2, particion="estacion_mes", cuantiles=(0.5, 0.95)), uno)
+
+
+def test_cuantiles_exactos_en_grupos_pequenos():
+    frame = measurement_frame()
+    resultado = aggregate(frame, workers=1, cuantiles=(0, 0.5, 0.95, 1))
+    valores = frame.groupby(["estacion", "magnitud"])[HORAS].apply(lambda d: d.to_numpy().ravel())
+    for _, fila in resultado.iterrows():
+        datos = valores[(fila["estacion"], fila["magnitud"])]
+        datos = datos[~np.isnan(datos)]
+        assert len(datos) <= SKETCH_SIZE
+        for q in (0, 0.5, 0.95, 1):
+            assert fila[f"q{q:g}"] == pytest.approx(np.quantile(datos, q), rel=1e-12)
+
+
+def test_resumen_de_tamano_fijo():
+    rng = np.random.default_rng(0)
+    particiones = [rng.gamma(2.0, 20.0, size=n) for n in (5_000, 20_000, 300)]
+    todos = np.sort(np.concatenate(particiones))
+    resumenes = [quantile_sketch(p) for p in particiones]
+    assert all(len(v) <= SKETCH_SIZE and p.sum() == len(d) for (v, p), d in zip(resumenes, particiones))
+
+    estimados = merge_quantiles(resumenes, len(todos), todos[0], todos[-1], (0, 0.05, 0.5, 0.95, 1))
+    assert estimados[0] == todos[0] and estimados[1] == todos[-1]
+    for q, valor in estimados.items():
+        # Error de rango acotado por medio tramo de cada partición
+        rango = np.searchsorted(todos, valor)
+        assert abs(rango - q * (len(todos) - 1)) <= sum(len(p) / SKETCH_SIZE for p in particiones)
@@ -0,0 +1,32 @@
+import tracemalloc
+
+from utils import profiling
+
+
+def test_url_solo_con_variable_de_entorno(monkeypatch):
+    monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+    assert not profiling.profiling_enabled({"perfil": "1"})
+    monkeypatch.setenv(profiling.PROFILE_ENV, "url")
+    assert profiling.profiling_enabled({"perfil": "1"})
+    assert not profiling.profiling_enabled({})
+    monkeypatch.setenv(profiling.PROFILE_ENV, "1")
+    assert profiling.profiling_enabled({})
+
+
+def test_traza_se_para_con_el_ultimo_perfil():
+    assert not tracemalloc.is_tracing()
+    a = profiling.RerunProfiler(salida=None).start()
+    b = profiling.RerunProfiler(salida=None).start()
+    a.stop("a")
+    assert tracemalloc.is_tracing()
+    b.stop("b")
+    assert not tracemalloc.is_tracing()
+
+
+def test_respeta_una_traza_ajena():
+    tracemalloc.start()
+    try:
+        profiling.RerunProfiler(salida=None).start().stop("a")
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+from datetime import datetime, timezone
+
+import pytest
+from rdflib import RDF, Graph
+
+from utils.export import export_parquet
+from utils.measurements import measurement_frame
+from utils.rdf_loader import DATASET_PATH, GraphStore, graph_partitions, load_graph, parse_graph, partition_view
+
+TTL = """@prefix ex: <http://example.org/> .
+ex:s{i} ex:p "{i}" .
+"""
+
+
+def _escribir(path, n, texto=None):
+    contenido = texto if texto is not None else "".join(TTL.format(i=i) for i in range(n))
+    path.write_text(contenido, encoding="utf-8")
+    # mtime distinto aunque el sistema de ficheros tenga poca resolución
+    t = time.time_ns() + n * 1_000_000_000
+    os.utime(path, ns=(t, t))
+
+
+def _esperar(condicion, limite=10.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "el vigilante no publicó la versión nueva"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def ttl(tmp_path):
+    path = tmp_path / "datos.ttl"
+    _escribir(path, 1)
+    return path
+
+
+def test_sin_vigilante_recarga_al_cambiar_el_fichero(ttl):
+    store = GraphStore(str(ttl))
+    antiguo = store.current()
+    assert store.current() is antiguo  # sin cambios no se vuelve a parsear
+
+    _escribir(ttl, 3)
+    nuevo = store.current()
+    assert nuevo is not antiguo and nuevo.version != antiguo.version
+    assert len(antiguo.graph) == 1 and len(nuevo.graph) == 3  # la versión anterior queda intacta
+
+
+def test_pin_mantiene_la_version_mientras_el_vigilante_publica_otra(ttl):
+    store = GraphStore(str(ttl))
+    store.start_watcher(intervalo=0.01)
+    try:
+        _esperar(lambda: store.stats()["version"] is not None)
+        with store.pin() as fijada:
+            _escribir(ttl, 2)
+            _esperar(lambda: not store.is_latest(fijada))
+            assert store.current() is fijada and len(store.current().graph) == 1
+        assert len(store.current().graph) == 2
+    finally:
+        store.stop_watcher()
+
+
+def test_pin_sin_vigilante(ttl):
+    store = GraphStore(str(ttl))
+    with store.pin() as fijada:
+        _escribir(ttl, 2)
+        assert store.current() is fijada and store.version() == fijada.version
+        with store.pin() as anidada:
+            assert anidada is fijada
+    assert len(store.current().graph) == 2  # fuera del pin, el siguiente acceso recarga
+
+
+def test_ttl_roto_sigue_sirviendo_la_version_anterior(ttl):
+    store = GraphStore(str(ttl))
+    store.start_watcher(intervalo=0.01)
+    try:
+        _esperar(lambda: store.stats()["version"] is not None)
+        servida = store.current()
+        _escribir(ttl, 2, texto="@prefix ex: <http://example.org/> .\nex:s ex:p \n")
+        _esperar(lambda: store.stats()["errores"] > 0)
+        assert store.current() is servida
+    finally:
+        store.stop_watcher()
+
+
+def test_lectores_siempre_ven_una_version_completa(ttl):
+    store = GraphStore(str(ttl))
+    store.start_watcher(intervalo=0.005)
+    vistas, parar = [], threading.Event()
+
+    def leer():
+        while not parar.is_set():
+            snapshot = store.current()
+            vistas.append((snapshot.version, len(snapshot.graph)))
+
+    try:
+        _esperar(lambda: store.stats()["version"] is not None)
+        lectores = [threading.Thread(target=leer) for _ in range(4)]
+        for t in lectores:
+            t.start()
+        for n in range(2, 6):
+            _escribir(ttl, n)
+            _esperar(lambda: len(store.current().graph) == n)
+        parar.set()
+        for t in lectores:
+            t.join()
+    finally:
+        parar.set()
+        store.stop_watcher()
+
+    # Cada versión se vio siempre con el mismo número de tripletas (nunca a medias)
+    tamanos = {}
+    for version, n in vistas:
+        assert tamanos.setdefault(version, n) == n
+    assert 5 in tamanos.values()
+
+
+def test_export_no_modifica_el_indice_compartido(tmp_path):
+    compartido = measurement_frame()
+    columnas = list(compartido.columns)
+    export_parquet(str(tmp_path), g=load_graph())
+    export_parquet(str(tmp_path))
+    assert measurement_frame() is compartido
+    assert list(compartido.columns) == columnas
+
+
+PARTICIONADO = """@prefix v: <http://example.org/vocab#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+<urn:m1> a v:MedicionAire ; v:estacion "1" ; v:fecha "2025-05-08T00:00:00Z"^^xsd:dateTime .
+<urn:m2> a v:MedicionAire ; v:estacion "2" ; v:fecha "2025-06-08T00:00:00Z"^^xsd:dateTime .
+<urn:m3> a v:MedicionAire ; v:estacion "3" .
+<urn:e1> owl:sameAs <https://www.wikidata.org/entity/Q1> .
+"""
+
+ESTACIONES = "SELECT DISTINCT ?e WHERE { ?m a <http://example.org/vocab#MedicionAire> ; <http://example.org/vocab#estacion> ?e }"
+
+
+def _contar(g):
+    return int(next(iter(g.query("SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }")))[0])
+
+
+def test_la_union_solo_ve_las_tripletas_del_fichero():
+    g = load_graph()
+    esperado = len(Graph().parse(DATASET_PATH, format="turtle"))
+    assert len(g) == _contar(g) == esperado
+    clases = {str(c) for c in g.objects(None, RDF.type)}
+    assert all(c.startswith("http://example.org/vocab#") for c in clases)  # sin metadatos de particiones
+
+
+def test_las_mediciones_sin_fecha_no_se_pierden(tmp_path):
+    path = tmp_path / "particionado.ttl"
+    path.write_text(PARTICIONADO, encoding="utf-8")
+    ds = parse_graph(str(path))
+
+    assert _contar(ds) == len(Graph().parse(str(path), format="turtle"))
+    particiones = {p["id"].split(":")[-1]: p for p in graph_partitions(ds)}
+    assert set(particiones) == {"MedicionAire/2025-05", "MedicionAire/2025-06", "MedicionAire/sin-fecha"}
+    assert particiones["MedicionAire/sin-fecha"]["desde"] is None
+
+    def estaciones(g):
+        return sorted(str(r[0]) for r in g.query(ESTACIONES))
+
+    assert estaciones(partition_view(ds, "MedicionAire")) == estaciones(ds) == ["1", "2", "3"]
+    junio = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    assert estaciones(partition_view(ds, "MedicionAire", desde=junio)) == ["2", "3"]
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from rdflib import Graph
+
+from utils import turtle_stream
+from utils.measurements import measurement_frame
+from utils.turtle_stream import _nanoseconds, _rdflib_ingest, ingest_measurements, iter_subjects
+
+PREFIJOS = "@prefix ex: <http://example.org/> .\n"
+
+
+@pytest.mark.parametrize("bloque", [7, 64, turtle_stream.BLOQUE])
+def test_streaming_igual_que_rdflib(monkeypatch, bloque):
+    monkeypatch.setattr(turtle_stream, "BLOQUE", bloque)
+    esperado, tripletas = _rdflib_ingest(None)
+    ingesta = ingest_measurements()
+
+    assert ingesta.tripletas == tripletas
+    for clase, df in ingesta.frames().items():
+        pd.testing.assert_frame_equal(df, esperado[clase])
+
+
+@pytest.mark.parametrize("desplazamiento", range(12))
+def test_literal_largo_cortado_entre_bloques(tmp_path, monkeypatch, desplazamiento):
+    # El """ de apertura cae en distintas posiciones respecto al final del bloque
+    monkeypatch.setattr(turtle_stream, "BLOQUE", 32)
+    ttl = PREFIJOS + " " * desplazamiento + 'ex:s ex:p """hola\nmundo""" .\n'
+    path = tmp_path / "largo.ttl"
+    path.write_text(ttl, encoding="utf-8")
+
+    assert len(Graph().parse(path, format="turtle")) == 1
+    [(sujeto, [(predicado, objeto)])] = iter_subjects(path)
+    assert (sujeto, predicado) == ("http://example.org/s", "http://example.org/p")
+    assert objeto.lexico == "hola\nmundo"
+
+
+@pytest.mark.parametrize("desplazamiento", range(8))
+def test_numero_cortado_entre_bloques(tmp_path, monkeypatch, desplazamiento):
+    monkeypatch.setattr(turtle_stream, "BLOQUE", 32)
+    path = tmp_path / "numero.ttl"
+    path.write_text(PREFIJOS + " " * desplazamiento + "ex:s ex:p 1.5, 2e+10 .\n", encoding="utf-8")
+
+    [(_, pares)] = iter_subjects(path)
+    assert [o.lexico for _, o in pares] == ["1.5", "2e+10"]
+
+
+def test_literal_largo_sin_cerrar(tmp_path):
+    path = tmp_path / "roto.ttl"
+    path.write_text(PREFIJOS + 'ex:s ex:p """hola .\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Turtle no soportado"):
+        list(iter_subjects(path))
+
+
+@pytest.mark.parametrize("lexico", ["2025-05-08T01:02:03Z", "2025-05-08T03:02:03+02:00", "2025-05-08T01:02:03"])
+def test_fechas_en_utc(lexico):
+    assert _nanoseconds(lexico) == pd.Timestamp("2025-05-08T01:02:03", tz="UTC").value
+
+
+def test_misma_resolucion_que_measurement_frame():
+    assert ingest_measurements().frames()["MedicionAire"]["fecha"].dtype == measurement_frame()["fecha"].dtype
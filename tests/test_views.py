@@ -0,0 +1,49 @@
+import json
+import shutil
+import threading
+
+import pandas as pd
+
+from utils import station_map, views
+from utils.rdf_loader import DATASET_PATH, GraphStore, dataset_version
+
+
+def test_refrescos_concurrentes(tmp_path):
+    errores = []
+
+    def refrescar():
+        for _ in range(3):
+            try:
+                views.refresh_views(views_dir=str(tmp_path))
+                views._cache.pop(str(tmp_path), None)  # obliga a releer meta.json y los Parquet
+                views.load_views(views_dir=str(tmp_path))
+            except Exception as e:
+                errores.append(e)
+
+    hilos = [threading.Thread(target=refrescar) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert errores == []
+    assert not list(tmp_path.glob("*.tmp"))
+    vistas = views.load_views(views_dir=str(tmp_path))
+    completas = views._daily_rows(views.measurement_frame())
+    assert len(vistas["diario"]) == len(completas)
+    pd.testing.assert_series_equal(vistas["diario"]["suma"].sort_values(ignore_index=True),
+                                   completas["suma"].sort_values(ignore_index=True))
+
+
+def test_el_vigilante_precalcula_vistas_y_mapa(tmp_path):
+    ttl = tmp_path / "datos.ttl"
+    shutil.copy(DATASET_PATH, ttl)
+    store = GraphStore(str(ttl))
+    snapshot = store._build(dataset_version(str(ttl)), precalcular=True)
+
+    assert {"vistas", "mapa/resumen", "mapa/resumen_sin_anomalias"} <= set(snapshot._indices)
+    # Las vistas son las de ese TTL y su versión, aunque no esté publicada todavía
+    with open(tmp_path / "datos.views" / "meta.json", encoding="utf-8") as f:
+        assert views._dataset_state(snapshot.version) == json.load(f)
+    assert len(snapshot.index("vistas")["diario"]) == len(views._daily_rows(views.measurement_frame()))
+    assert snapshot.index("mapa/resumen").equals(station_map.station_summary(views.measurement_frame()))